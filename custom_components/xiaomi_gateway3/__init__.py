@@ -83,6 +83,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     gw = MultiGateway(**entry.options)
     handle_add_entities(hass, entry, gw)
+    await hass_utils.store_inventory(hass, gw)
+    await gw.warm_start()
     gw.start()
 
     hass.data[DOMAIN][entry.entry_id] = gw
@@ -116,6 +118,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    if entry.data:
+        return  # skip remove for cloud config entry
+
+    await hass_utils.remove_inventory(hass, entry)
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
     await hass.config_entries.async_reload(entry.entry_id)
 
@@ -32,6 +32,8 @@ class XBinarySensor(XEntity, BinarySensorEntity, RestoreEntity):
 class XGatewaySensor(XEntity, BinarySensorEntity):
     """Gateway connection available sensor with useful extra attributes."""
 
+    _unrecorded_attributes = {"timing"}
+
     def on_init(self):
         self.listen_attrs.add("available")
         self._attr_is_on = True
@@ -250,11 +250,18 @@ class OptionsFlowHandler(OptionsFlow):
                         "binary_sensor": "Binary sensors",
                     }
                 ),
+                vol.Optional("poll_rate"): vol.All(
+                    vol.Coerce(float), vol.Range(min=0.1)
+                ),
+                vol.Optional("poll_concurrency"): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
                 vol.Optional("debug"): cv.multi_select(
                     {
                         "true": "Basic logs",
                         "mqtt": "MQTT logs",
                         "zigbee": "Zigbee logs",
+                        "timing": "Timing stats",
                     }
                 ),
             },
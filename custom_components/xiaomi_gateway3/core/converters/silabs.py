@@ -1,40 +1,111 @@
+import importlib
 import logging
+import struct
+from collections import OrderedDict
+from functools import cache
+from typing import TYPE_CHECKING
 
-from zigpy.zcl import Cluster
-from zigpy.zcl.foundation import (
-    CommandSchema,
-    GENERAL_COMMANDS,
-    GeneralCommand,
-    TypeValue,
-    ZCLCommandDef,
-    ZCLHeader,
-)
-from zigpy.zdo import ZDO
-from zigpy.zdo.types import (
-    Neighbors,
-    NodeDescriptor,
-    SizePrefixedSimpleDescriptor,
-    Status as ZDOStatus,
-    ZDOCmd,
-)
-
-try:
-    # for https://github.com/zigpy/zigpy/blob/0.66.0/zigpy/zcl/foundation.py
-    from zigpy.zcl.foundation import DataType
-
-    DATA_TYPES = {
-        int(d.type_id): (d.description, d.python_type, d.type_class) for d in DataType
-    }
-except ImportError:
-    # for https://github.com/zigpy/zigpy/blob/0.65.4/zigpy/zcl/foundation.py
-    from zigpy.zcl.foundation import DATA_TYPES
+# zigpy is heavy, so it imported only on first ZCL/ZDO encode or decode
+if TYPE_CHECKING:
+    from zigpy.zcl import Cluster
+    from zigpy.zcl.foundation import ZCLCommandDef
 
 _LOGGER = logging.getLogger(__name__)
 
+# zigpy names, that external converters can import from this module
+_ZIGPY_NAMES = {
+    "Cluster": ("zigpy.zcl", "Cluster"),
+    "CommandSchema": ("zigpy.zcl.foundation", "CommandSchema"),
+    "GENERAL_COMMANDS": ("zigpy.zcl.foundation", "GENERAL_COMMANDS"),
+    "GeneralCommand": ("zigpy.zcl.foundation", "GeneralCommand"),
+    "TypeValue": ("zigpy.zcl.foundation", "TypeValue"),
+    "ZCLCommandDef": ("zigpy.zcl.foundation", "ZCLCommandDef"),
+    "ZCLHeader": ("zigpy.zcl.foundation", "ZCLHeader"),
+    "ZDO": ("zigpy.zdo", "ZDO"),
+    "Neighbors": ("zigpy.zdo.types", "Neighbors"),
+    "NodeDescriptor": ("zigpy.zdo.types", "NodeDescriptor"),
+    "SizePrefixedSimpleDescriptor": ("zigpy.zdo.types", "SizePrefixedSimpleDescriptor"),
+    "ZDOStatus": ("zigpy.zdo.types", "Status"),
+    "ZDOCmd": ("zigpy.zdo.types", "ZDOCmd"),
+}
+
+
+def __getattr__(name: str):
+    """Lazy import of zigpy names on first access."""
+    if name == "DATA_TYPES":
+        return data_types()
+    if name in _ZIGPY_NAMES:
+        module, attr = _ZIGPY_NAMES[name]
+        return getattr(importlib.import_module(module), attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+REPORT_ATTRIBUTES = 0x0A
+READ_ATTRIBUTES_RSP = 0x01
+
 CLUSTERS = {}
 
+# decoded ZCL payloads, key: (clusterId, sourceEndpoint, APSPlayload without TSN)
+DECODE_CACHE: OrderedDict[tuple, dict] = OrderedDict()
+DECODE_CACHE_SIZE = 1000
+DECODE_STATS = {"hits": 0, "misses": 0}
+
 
 def decode(payload: dict) -> dict | None:
+    """Decode Silabs MQTT message. Same ZCL frames (except sequence number) are
+    decoded only once. Each call returns new dict, so it can be changed safely.
+    """
+    aps: str = payload["APSPlayload"]
+    ep = payload.get("sourceEndpoint")
+    if ep == "0x00" or len(aps) < 8:
+        return decode_payload(payload)  # don't cache ZDO
+
+    # 0xFCSSCC or 0xFCMMMMSSCC, skip SS (sequence number)
+    pos = 8 if int(aps[2:4], 16) & 0b100 else 4
+    key = (payload["clusterId"], ep, aps[:pos] + aps[pos + 2 :])
+
+    if (value := DECODE_CACHE.get(key)) is not None:
+        DECODE_STATS["hits"] += 1
+        DECODE_CACHE.move_to_end(key)
+        return value_copy(value)
+
+    DECODE_STATS["misses"] += 1
+    value = decode_payload(payload)
+    if value is not None and is_immutable(value):
+        DECODE_CACHE[key] = value_copy(value)
+        if len(DECODE_CACHE) > DECODE_CACHE_SIZE:
+            DECODE_CACHE.popitem(last=False)
+    return value
+
+
+def decode_stats() -> dict:
+    hits, misses = DECODE_STATS["hits"], DECODE_STATS["misses"]
+    return {
+        "size": len(DECODE_CACHE),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits else 0,
+    }
+
+
+def value_copy(value: dict) -> dict:
+    return {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+
+
+def is_immutable(value: dict, nested: bool = True) -> bool:
+    """Only simple values or dicts with simple values (Xiaomi 0xFF01 attribute).
+    Lists and zigpy objects are not cached.
+    """
+    for v in value.values():
+        if isinstance(v, dict):
+            if not nested or not is_immutable(v, False):
+                return False
+        elif v is not None and not isinstance(v, (int, float, str, bytes)):
+            return False
+    return True
+
+
+def decode_payload(payload: dict) -> dict | None:
     try:
         cluster_id = int(payload["clusterId"], 0)
         data = bytes.fromhex(payload["APSPlayload"][2:])  # 0xAABBCCDDEEFF
@@ -45,13 +116,24 @@ def decode(payload: dict) -> dict | None:
         if cluster_id == 0 and (basic := xiaomi_deserialize(data)):
             return basic
 
-        return zcl_deserialize(cluster_id, data)
+        return zcl_fast_deserialize(cluster_id, data) or zcl_deserialize(
+            cluster_id, data
+        )
     except Exception as e:
         _LOGGER.debug("Error while parsing zigbee", exc_info=e)
         return None
 
 
 def zdo_deserialize(cluster_id: int, payload: bytes):
+    from zigpy.zdo import ZDO
+    from zigpy.zdo.types import (
+        Neighbors,
+        NodeDescriptor,
+        SizePrefixedSimpleDescriptor,
+        Status as ZDOStatus,
+        ZDOCmd,
+    )
+
     if (zdo := CLUSTERS.get("zdo")) is None:
         zdo = CLUSTERS["zdo"] = ZDO(None)
 
@@ -164,14 +246,166 @@ def zdo_deserialize(cluster_id: int, payload: bytes):
         raise NotImplemented
 
 
-def zcl_deserialize(cluster_id: int, data: bytes) -> dict:
-    """Decode Silabs Z3 GatewayHost MQTT message using zigpy library. Supports
-    ZDO payload and ZCL payload.
-    """
+def get_cluster(cluster_id: int) -> "Cluster":
     if not (cluster := CLUSTERS.get(cluster_id)):
+        from zigpy.zcl import Cluster
+
         # noinspection PyTypeChecker
         cluster = CLUSTERS[cluster_id] = Cluster.from_id(None, cluster_id)
         cluster._log = lambda *_, **__: None
+    return cluster
+
+
+# fast path clusters: cluster_id => zigpy ep_attribute, other clusters use zigpy
+ZCL_CLUSTERS = {
+    0x0000: "basic",
+    0x0001: "power",
+    0x0002: "device_temperature",
+    0x0003: "identify",
+    0x0004: "groups",
+    0x0005: "scenes",
+    0x0006: "on_off",
+    0x0007: "on_off_config",
+    0x0008: "level",
+    0x0009: "alarms",
+    0x000A: "time",
+    0x000C: "analog_input",
+    0x000D: "analog_output",
+    0x000E: "analog_value",
+    0x000F: "binary_input",
+    0x0010: "binary_output",
+    0x0011: "binary_value",
+    0x0012: "multistate_input",
+    0x0013: "multistate_output",
+    0x0014: "multistate_value",
+    0x0019: "ota",
+    0x0020: "poll_control",
+    0x0101: "door_lock",
+    0x0102: "window_covering",
+    0x0201: "thermostat",
+    0x0202: "fan",
+    0x0204: "thermostat_ui",
+    0x0300: "light_color",
+    0x0301: "light_ballast",
+    0x0400: "illuminance",
+    0x0401: "illuminance_level",
+    0x0402: "temperature",
+    0x0403: "pressure",
+    0x0404: "flow",
+    0x0405: "humidity",
+    0x0406: "occupancy",
+    0x040D: "carbon_dioxide_concentration",
+    0x042A: "pm25",
+    0x042B: "formaldehyde_concentration",
+    0x0500: "ias_zone",
+    0x0702: "smartenergy_metering",
+    0x0B04: "electrical_measurement",
+    0x0B05: "diagnostic",
+}
+
+# fast path data types: type_id => size
+ZCL_UINTS = {0x10: 1, 0x30: 1, 0x31: 2, 0xE2: 4, 0xE8: 2, 0xE9: 2, 0xEA: 4}
+ZCL_UINTS.update({0x18 + i: i + 1 for i in range(8)})  # bitmap8..bitmap64
+ZCL_UINTS.update({0x20 + i: i + 1 for i in range(8)})  # uint8..uint64
+ZCL_SINTS = {0x28 + i: i + 1 for i in range(8)}  # int8..int64
+# float type_id => (size, format, exponent mask, fraction mask)
+ZCL_FLOATS = {
+    0x38: (2, "<e", 0x7C00, 0x03FF),
+    0x39: (4, "<f", 0x7F800000, 0x007FFFFF),
+    0x3A: (8, "<d", 0x7FF0000000000000, 0x000FFFFFFFFFFFFF),
+}
+# string type_id => (length prefix size, is text)
+ZCL_STRINGS = {0x41: (1, False), 0x42: (1, True), 0x43: (2, False), 0x44: (2, True)}
+
+
+def zcl_fast_value(data: bytes, pos: int, type_id: int) -> tuple:
+    """Decode simple ZCL data type same as zigpy TypeValue + value_decode.
+    Raises KeyError for unsupported types and IndexError for short data.
+    """
+    if size := ZCL_UINTS.get(type_id):
+        end = pos + size
+        if end > len(data):
+            raise IndexError
+        return int.from_bytes(data[pos:end], "little"), end
+
+    if size := ZCL_SINTS.get(type_id):
+        end = pos + size
+        if end > len(data):
+            raise IndexError
+        return int.from_bytes(data[pos:end], "little", signed=True), end
+
+    if type_id in ZCL_FLOATS:
+        size, fmt, exp_mask, frac_mask = ZCL_FLOATS[type_id]
+        end = pos + size
+        if end > len(data):
+            raise IndexError
+        n = int.from_bytes(data[pos:end], "little")
+        if n & exp_mask == 0 and n & frac_mask:
+            raise KeyError  # zigpy converts subnormal numbers in its own way
+        return struct.unpack_from(fmt, data, pos)[0], end
+
+    prefix, text = ZCL_STRINGS[type_id]
+    pos += prefix
+    if pos > len(data):
+        raise IndexError
+    length = int.from_bytes(data[pos - prefix : pos], "little")
+    if type_id == 0x42 and length == 0xFF:
+        return "", pos  # invalid string, zigpy fails on invalid long string
+    end = pos + length
+    if end > len(data):
+        raise IndexError
+    if text:
+        return data[pos:end].split(b"\x00")[0].decode("utf8", errors="replace"), end
+    return data[pos:end], end
+
+
+def zcl_fast_deserialize(cluster_id: int, data: bytes) -> dict | None:
+    """Decode Report_Attributes and Read_Attributes_rsp with simple data types
+    from known clusters without zigpy. Returns None for any other payload.
+    """
+    if (name := ZCL_CLUSTERS.get(cluster_id)) is None:
+        return None
+
+    try:
+        fc = data[0]
+        if fc & 0b11 != 0:
+            return None  # not general command
+
+        pos = 5 if fc & 0b100 else 3  # manufacturer specific header
+        command_id = data[pos - 1]
+        if command_id == REPORT_ATTRIBUTES:
+            attrs = {}
+            size = len(data)
+            while pos < size:
+                attr_id = data[pos] | data[pos + 1] << 8
+                attrs[attr_id], pos = zcl_fast_value(data, pos + 3, data[pos + 2])
+        elif command_id == READ_ATTRIBUTES_RSP:
+            attrs = {}
+            size = len(data)
+            while pos < size:
+                attr_id = data[pos] | data[pos + 1] << 8
+                if data[pos + 2] == 0:  # status success
+                    value, pos = zcl_fast_value(data, pos + 4, data[pos + 3])
+                else:
+                    value, pos = None, pos + 3
+                attrs[attr_id] = value
+        else:
+            return None
+    except (IndexError, KeyError):
+        return None
+
+    payload: dict = {"cluster": name, "general_command_id": command_id}
+    payload.update(attrs)
+    return payload
+
+
+def zcl_deserialize(cluster_id: int, data: bytes) -> dict:
+    """Decode Silabs Z3 GatewayHost MQTT message using zigpy library. Supports
+    ZDO payload and ZCL payload.
+    """
+    from zigpy.zcl.foundation import CommandSchema, GeneralCommand
+
+    cluster = get_cluster(cluster_id)
 
     try:
         hdr, resp = cluster.deserialize(data)
@@ -218,6 +452,8 @@ def zcl_deserialize(cluster_id: int, data: bytes) -> dict:
 
 
 def value_decode(value) -> bool | int | float | bytes | str:
+    from zigpy.zcl.foundation import TypeValue
+
     if isinstance(value, TypeValue):
         return value_decode(value.value)
     if isinstance(value, bool):
@@ -234,11 +470,10 @@ def value_decode(value) -> bool | int | float | bytes | str:
 
 
 def xiaomi_deserialize(data: bytes) -> dict | None:
+    from zigpy.zcl.foundation import TypeValue, ZCLHeader
+
     hdr, data = ZCLHeader.deserialize(data)
-    if (
-        not hdr.frame_control.is_general
-        or hdr.command_id != GeneralCommand.Report_Attributes
-    ):
+    if not hdr.frame_control.is_general or hdr.command_id != REPORT_ATTRIBUTES:
         return None
 
     payload = {
@@ -267,13 +502,30 @@ def xiaomi_deserialize(data: bytes) -> dict | None:
     return payload
 
 
+@cache
+def data_types() -> dict[int, tuple]:
+    try:
+        # for https://github.com/zigpy/zigpy/blob/0.66.0/zigpy/zcl/foundation.py
+        from zigpy.zcl.foundation import DataType
+
+        return {
+            int(d.type_id): (d.description, d.python_type, d.type_class)
+            for d in DataType
+        }
+    except ImportError:
+        # for https://github.com/zigpy/zigpy/blob/0.65.4/zigpy/zcl/foundation.py
+        from zigpy.zcl.foundation import DATA_TYPES
+
+        return DATA_TYPES
+
+
 def get_type_id(cluster_id: int, attr_id: int) -> int:
     attr = XCluster(cluster_id).attributes[attr_id]
-    return next(k for k, v in DATA_TYPES.items() if issubclass(attr.type, v[1]))
+    return next(k for k, v in data_types().items() if issubclass(attr.type, v[1]))
 
 
 def attr_encode(type_id: int, value: int) -> bytes:
-    cls = DATA_TYPES[type_id][1]
+    cls = data_types()[type_id][1]
     return cls(value).serialize()
 
 
@@ -313,9 +565,11 @@ def zcl_color_hs(nwk: str, ep: int, h: int, s: int, tr: float) -> list:
 
 # noinspection PyProtectedMember
 class XCluster:
-    cluster: Cluster
+    cluster: "Cluster"
 
     def __init__(self, cluster_id: int):
+        from zigpy.zcl import Cluster
+
         self.cluster = Cluster._registry[cluster_id]
 
     @property
@@ -331,10 +585,14 @@ class XCluster:
         return self.request(False, command, *args, **kwargs)
 
     def read_attrs(self, *args) -> bytes:
+        from zigpy.zcl.foundation import GENERAL_COMMANDS, GeneralCommand
+
         command = GENERAL_COMMANDS[GeneralCommand.Read_Attributes]
         return self.request(True, command, args)
 
-    def request(self, general: bool, command: ZCLCommandDef, *args, **kwargs) -> bytes:
+    def request(
+        self, general: bool, command: "ZCLCommandDef", *args, **kwargs
+    ) -> bytes:
         # noinspection PyArgumentList
         hdr, request = self.cluster._create_request(
             None,  # self
@@ -1,26 +1,8 @@
+import importlib
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-from zigpy.zcl.clusters.closures import WindowCovering
-from zigpy.zcl.clusters.general import (
-    AnalogInput,
-    Basic,
-    LevelControl,
-    MultistateInput,
-    OnOff,
-    PowerConfiguration,
-)
-from zigpy.zcl.clusters.homeautomation import ElectricalMeasurement
-from zigpy.zcl.clusters.lighting import Color
-from zigpy.zcl.clusters.measurement import (
-    IlluminanceMeasurement,
-    OccupancySensing,
-    RelativeHumidity,
-    TemperatureMeasurement,
-)
-from zigpy.zcl.clusters.security import IasZone
-from zigpy.zcl.clusters.smartenergy import Metering
-
+from . import silabs
 from .base import BaseConv, decode_time
 from .const import BUTTON_DOUBLE, BUTTON_HOLD, BUTTON_SINGLE
 from .silabs import *
@@ -28,7 +10,35 @@ from .silabs import *
 if TYPE_CHECKING:
     from ..device import XDevice
 
-assert DATA_TYPES
+# zigpy clusters, that external converters can import from this module
+_ZIGPY_CLUSTERS = {
+    "WindowCovering": "zigpy.zcl.clusters.closures",
+    "AnalogInput": "zigpy.zcl.clusters.general",
+    "Basic": "zigpy.zcl.clusters.general",
+    "LevelControl": "zigpy.zcl.clusters.general",
+    "MultistateInput": "zigpy.zcl.clusters.general",
+    "OnOff": "zigpy.zcl.clusters.general",
+    "PowerConfiguration": "zigpy.zcl.clusters.general",
+    "ElectricalMeasurement": "zigpy.zcl.clusters.homeautomation",
+    "Color": "zigpy.zcl.clusters.lighting",
+    "IlluminanceMeasurement": "zigpy.zcl.clusters.measurement",
+    "OccupancySensing": "zigpy.zcl.clusters.measurement",
+    "RelativeHumidity": "zigpy.zcl.clusters.measurement",
+    "TemperatureMeasurement": "zigpy.zcl.clusters.measurement",
+    "IasZone": "zigpy.zcl.clusters.security",
+    "Metering": "zigpy.zcl.clusters.smartenergy",
+}
+
+
+def __getattr__(name: str):
+    """Lazy import of zigpy clusters and silabs zigpy names on first access.
+    Star import doesn't trigger it, so import these names explicitly.
+    """
+    if name in _ZIGPY_CLUSTERS:
+        return getattr(importlib.import_module(_ZIGPY_CLUSTERS[name]), name)
+    return getattr(silabs, name)
+
+
 TYPE_BOOL = 0x10  # t.Bool
 TYPE_UINT8 = 0x20  # t.uint8_t
 TYPE_UINT32 = 0x23  # t.uint32_t
@@ -145,8 +155,8 @@ class ZMathConv(ZConverter):
 
 
 class ZOnOffConv(ZBoolConv):
-    cluster_id = OnOff.cluster_id
-    attr_id = OnOff.AttributeDefs.on_off.id
+    cluster_id = 0x0006  # OnOff
+    attr_id = 0x0000  # on_off
 
     def encode(self, device: "XDevice", payload: dict, value: bool):
         cmd = zcl_on_off(device.nwk, self.ep or 1, value)
@@ -154,8 +164,8 @@ class ZOnOffConv(ZBoolConv):
 
 
 class ZBrightnessConv(ZConverter):
-    cluster_id = LevelControl.cluster_id
-    attr_id = LevelControl.AttributeDefs.current_level.id
+    cluster_id = 0x0008  # LevelControl
+    attr_id = 0x0000  # current_level
 
     def encode(self, device: "XDevice", payload: dict, value: int | float):
         transition = payload.get("transition", 0)
@@ -165,8 +175,8 @@ class ZBrightnessConv(ZConverter):
 
 @dataclass
 class ZColorTempConv(ZConverter):
-    cluster_id = Color.cluster_id
-    attr_id = Color.AttributeDefs.color_temperature.id
+    cluster_id = 0x0300  # Color
+    attr_id = 0x0007  # color_temperature
 
     min: int = 153
     max: int = 500
@@ -178,9 +188,9 @@ class ZColorTempConv(ZConverter):
 
 
 class ZColorHSConv(ZConverter):
-    cluster_id = Color.cluster_id
-    attr_id1 = Color.AttributeDefs.current_hue.id
-    attr_id2 = Color.AttributeDefs.current_saturation.id
+    cluster_id = 0x0300  # Color
+    attr_id1 = 0x0000  # current_hue
+    attr_id2 = 0x0001  # current_saturation
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
         if self.attr_id1 in data and self.attr_id2 in data:
@@ -202,8 +212,8 @@ class ZColorHSConv(ZConverter):
 
 
 class ZColorModeConv(ZConverter):
-    cluster_id = Color.cluster_id
-    attr_id = Color.AttributeDefs.color_mode.id
+    cluster_id = 0x0300  # Color
+    attr_id = 0x0008  # color_mode
     map = {0: "hs", 1: "xy", 2: "color_temp"}
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
@@ -218,38 +228,38 @@ class ZTransitionConv(BaseConv):
 
 @dataclass
 class ZVoltageConv(ZMathConv):
-    cluster_id = ElectricalMeasurement.cluster_id
-    attr_id = ElectricalMeasurement.AttributeDefs.rms_voltage.id
+    cluster_id = 0x0B04  # ElectricalMeasurement
+    attr_id = 0x0505  # rms_voltage
 
 
 @dataclass
 class ZCurrentConv(ZMathConv):
-    cluster_id = ElectricalMeasurement.cluster_id
-    attr_id = ElectricalMeasurement.AttributeDefs.rms_current.id
+    cluster_id = 0x0B04  # ElectricalMeasurement
+    attr_id = 0x0508  # rms_current
     multiply: float = 0.001
 
 
 class ZPowerConv(ZConverter):
-    cluster_id = ElectricalMeasurement.cluster_id
-    attr_id = ElectricalMeasurement.AttributeDefs.active_power.id
+    cluster_id = 0x0B04  # ElectricalMeasurement
+    attr_id = 0x050B  # active_power
 
 
 @dataclass
 class ZEnergyConv(ZMathConv):
-    cluster_id = Metering.cluster_id
-    attr_id = Metering.AttributeDefs.current_summ_delivered.id
+    cluster_id = 0x0702  # Metering
+    attr_id = 0x0000  # current_summ_delivered
     multiply: float = 0.01
 
 
 class ZOccupancyConv(ZBoolConv):
-    cluster_id = OccupancySensing.cluster_id
-    attr_id = OccupancySensing.AttributeDefs.occupancy.id
+    cluster_id = 0x0406  # OccupancySensing
+    attr_id = 0x0000  # occupancy
 
 
 @dataclass
 class ZOccupancyTimeoutConv(ZConverter):
-    cluster_id = OccupancySensing.cluster_id
-    attr_id = OccupancySensing.AttributeDefs.pir_o_to_u_delay.id
+    cluster_id = 0x0406  # OccupancySensing
+    attr_id = 0x0010  # pir_o_to_u_delay
 
     min: int = 0
     max: int = 65535
@@ -262,18 +272,18 @@ class ZOccupancyTimeoutConv(ZConverter):
 
 
 class ZAnalogInput(ZMathConv):
-    cluster_id = AnalogInput.cluster_id
-    attr_id = AnalogInput.AttributeDefs.present_value.id
+    cluster_id = 0x000C  # AnalogInput
+    attr_id = 0x0055  # present_value
 
 
 class ZMultistateInput(ZConverter):
-    cluster_id = MultistateInput.cluster_id
-    attr_id = MultistateInput.AttributeDefs.present_value.id
+    cluster_id = 0x0012  # MultistateInput
+    attr_id = 0x0055  # present_value
 
 
 class ZIASZoneConv(ZConverter):
-    cluster_id = IasZone.cluster_id
-    command_id = IasZone.ClientCommandDefs.status_change_notification.id
+    cluster_id = 0x0500  # IasZone
+    command_id = 0x00  # status_change_notification
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
         if data.get("cluster_command_id") == self.command_id:
@@ -285,34 +295,34 @@ class ZIASZoneConv(ZConverter):
 
 @dataclass
 class ZIlluminanceConv(ZConverter):
-    cluster_id = IlluminanceMeasurement.cluster_id
-    attr_id = IlluminanceMeasurement.AttributeDefs.measured_value.id
+    cluster_id = 0x0400  # IlluminanceMeasurement
+    attr_id = 0x0000  # measured_value
 
 
 @dataclass
 class ZTemperatureConv(ZMathConv):
-    cluster_id = TemperatureMeasurement.cluster_id
-    attr_id = TemperatureMeasurement.AttributeDefs.measured_value.id
+    cluster_id = 0x0402  # TemperatureMeasurement
+    attr_id = 0x0000  # measured_value
     multiply: float = 0.01
 
 
 @dataclass
 class ZHumidityConv(ZMathConv):
-    cluster_id = RelativeHumidity.cluster_id
-    attr_id = RelativeHumidity.AttributeDefs.measured_value.id
+    cluster_id = 0x0405  # RelativeHumidity
+    attr_id = 0x0000  # measured_value
     multiply: float = 0.01
 
 
 @dataclass
 class ZBatteryPercConv(ZMathConv):
-    cluster_id = PowerConfiguration.cluster_id
-    attr_id = PowerConfiguration.AttributeDefs.battery_percentage_remaining.id
+    cluster_id = 0x0001  # PowerConfiguration
+    attr_id = 0x0021  # battery_percentage_remaining
 
 
 @dataclass
 class ZBatteryVoltConv(ZMathConv):
-    cluster_id = PowerConfiguration.cluster_id
-    attr_id = PowerConfiguration.AttributeDefs.battery_voltage.id
+    cluster_id = 0x0001  # PowerConfiguration
+    attr_id = 0x0020  # battery_voltage
     multiply: float = 100
 
 
@@ -322,12 +332,12 @@ class ZBatteryVoltConv(ZMathConv):
 
 
 class ZTuyaChildModeConv(ZBoolConv):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     attr_id = 0x8000
 
 
 class ZTuyaLEDModeConv(ZMapConv):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     attr_id = 0x8001
     map = {0: "off", 1: "off/on", 2: "on/off", 3: "on"}
 
@@ -336,13 +346,13 @@ class ZTuyaLEDModeConv(ZMapConv):
 # https://github.com/Koenkk/zigbee-herdsman/blob/master/src/zcl/definition/cluster.ts
 # moesStartUpOnOff: {ID: 0x8002, type: DataType.enum8},
 class ZTuyaPowerOnConv(ZMapConv):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     attr_id = 0x8002
     map = {0: "off", 1: "on", 2: "previous"}
 
 
 class ZTuyaButtonModeConv(ZMapConv):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     attr_id = 0x8004
     map = {0: "command", 1: "event"}
 
@@ -370,8 +380,8 @@ class ZTuyaButtonConfig(ZConverter):
 
 
 class ZTuyaButtonConv(ZConverter):
-    cluster_id = OnOff.cluster_id
-    attr_id = OnOff.AttributeDefs.on_off.id
+    cluster_id = 0x0006  # OnOff
+    attr_id = 0x0000  # on_off
     map = {0: BUTTON_SINGLE, 1: BUTTON_DOUBLE, 2: BUTTON_HOLD}
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
@@ -384,35 +394,35 @@ class ZTuyaButtonConv(ZConverter):
 
 @dataclass
 class ZLifeControlHumidity(ZMathConv):
-    cluster_id = TemperatureMeasurement.cluster_id
-    attr_id = TemperatureMeasurement.AttributeDefs.min_measured_value.id
+    cluster_id = 0x0402  # TemperatureMeasurement
+    attr_id = 0x0001  # min_measured_value
     multiply: float = 0.01
 
 
 @dataclass
 class ZLifeControlECO2(ZMathConv):
-    cluster_id = TemperatureMeasurement.cluster_id
-    attr_id = TemperatureMeasurement.AttributeDefs.max_measured_value.id
+    cluster_id = 0x0402  # TemperatureMeasurement
+    attr_id = 0x0002  # max_measured_value
 
 
 @dataclass
 class ZLifeControlVOC(ZMathConv):
-    cluster_id = TemperatureMeasurement.cluster_id
-    attr_id = TemperatureMeasurement.AttributeDefs.tolerance.id
+    cluster_id = 0x0402  # TemperatureMeasurement
+    attr_id = 0x0003  # tolerance
 
 
 # Thanks to zigbee2mqtt:
 # https://github.com/Koenkk/zigbee-herdsman/blob/528b7626f2970ba87a0792920590926105a3cb48/src/zcl/definition/cluster.ts#LL460C32-L460C37
 # https://github.com/Koenkk/zigbee-herdsman-converters/blob/f9115000807b21dcaa06e58c5b8e69baa4e626fe/converters/fromZigbee.js#L867
 class ZPowerOnConv(ZMapConv):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     attr_id = 0x4003
     map = {0: "off", 1: "on", 2: "toggle", 255: "previous"}
 
 
 class ZLumiCubeMain(ZConverter):
-    cluster_id = MultistateInput.cluster_id
-    attr_id = MultistateInput.AttributeDefs.present_value.id
+    cluster_id = 0x0012  # MultistateInput
+    attr_id = 0x0055  # present_value
     childs = {"side", "from_side", "to_side"}
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
@@ -443,8 +453,8 @@ class ZLumiCubeMain(ZConverter):
 
 
 class ZLumiCubeRotate(ZConverter):
-    cluster_id = AnalogInput.cluster_id
-    attr_id = AnalogInput.AttributeDefs.present_value.id
+    cluster_id = 0x000C  # AnalogInput
+    attr_id = 0x0055  # present_value
     childs = {"duration"}
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
@@ -461,7 +471,7 @@ class ZLumiCubeRotate(ZConverter):
 
 @dataclass
 class ZLumiBasicAlarm(ZConverter):
-    cluster_id = Basic.cluster_id
+    cluster_id = 0x0000  # Basic
     basic_attr: int = None
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
@@ -483,7 +493,7 @@ class ZLumiBasicAlarm(ZConverter):
 
 
 class ZLumiSensConv(ZConverter):
-    cluster_id = IasZone.cluster_id
+    cluster_id = 0x0500  # IasZone
     attr_id = 0xFFF0  # read attr
     map = {"1": "low", "2": "medium", "3": "high"}  # read_map
     write_map = {"low": 0x04010000, "medium": 0x04020000, "high": 0x04030000}
@@ -514,7 +524,7 @@ class ZLumiSensConv(ZConverter):
 
 
 class ZSonoffButtonConv(ZConverter):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
     map = {0: "hold", 1: "double", 2: "single"}
 
     def decode(self, device: "XDevice", payload: dict, value: dict):
@@ -524,7 +534,7 @@ class ZSonoffButtonConv(ZConverter):
 
 
 class ZHueDimmerOnConv(ZConverter):
-    cluster_id = OnOff.cluster_id
+    cluster_id = 0x0006  # OnOff
 
     def decode(self, device: "XDevice", payload: dict, value: dict):
         command_id = value.get("cluster_command_id")
@@ -545,8 +555,8 @@ class ZHueDimmerOnConv(ZConverter):
 
 
 class ZHueDimmerLevelConv(ZConverter):
-    cluster_id = LevelControl.cluster_id
-    command_id = LevelControl.ServerCommandDefs.step.id
+    cluster_id = 0x0008  # LevelControl
+    command_id = 0x0002  # step
 
     def decode(self, device: "XDevice", payload: dict, value: dict):
         if self.command_id == value.get("cluster_command_id"):
@@ -642,11 +652,11 @@ class ZLumiOppleMode(ZConverter):
 
 
 class ZCoverCmd(ZConverter):
-    cluster_id = WindowCovering.cluster_id
+    cluster_id = 0x0102  # WindowCovering
     map = {
-        "open": WindowCovering.ServerCommandDefs.up_open.id,
-        "close": WindowCovering.ServerCommandDefs.down_close.id,
-        "stop": WindowCovering.ServerCommandDefs.stop.id,
+        "open": 0x00,  # up_open
+        "close": 0x01,  # down_close
+        "stop": 0x02,  # stop
     }
 
     def encode(self, device: "XDevice", payload: dict, value: str):
@@ -656,9 +666,9 @@ class ZCoverCmd(ZConverter):
 
 
 class ZCoverPos(ZConverter):
-    cluster_id = WindowCovering.cluster_id  # 258
-    command_id = WindowCovering.ServerCommandDefs.go_to_lift_percentage.id
-    attr_id = WindowCovering.AttributeDefs.current_position_lift_percentage.id
+    cluster_id = 0x0102  # WindowCovering
+    command_id = 0x0005  # go_to_lift_percentage
+    attr_id = 0x0008  # current_position_lift_percentage
 
     def decode(self, device: "XDevice", payload: dict, data: dict):
         if (value := data.get(self.attr_id)) is not None:
@@ -673,5 +683,5 @@ class ZCoverPos(ZConverter):
 
 
 class ZModelConv(ZConverter):
-    cluster_id = Basic.cluster_id
-    attr_id = Basic.AttributeDefs.model.id
+    cluster_id = 0x0000  # Basic
+    attr_id = 0x0005  # model
@@ -7,7 +7,7 @@ import socket
 
 from .const import PID_BLE, SUPPORTED_MODELS
 from .mini_miio import AsyncMiIO
-from .shell.session import Session
+from .shell.session import SessionPool
 from .xiaomi_cloud import MiCloud
 
 
@@ -30,7 +30,7 @@ async def gateway_info(host: str, token: str = None, key: str = None) -> dict |
     # 3. Check open telnet again
     # 4. Return error
     try:
-        async with Session(host) as sh:
+        async with SessionPool.get(host) as sh:
             info = await sh.get_miio_info()
         info["host"] = host
         return info
@@ -2,7 +2,6 @@ import asyncio
 import logging
 import re
 import time
-from functools import cached_property
 from typing import Callable, Optional, TYPE_CHECKING, TypedDict
 
 from .const import BLE, GATEWAY, GROUP, MATTER, MESH, ZIGBEE
@@ -11,6 +10,7 @@ from .converters.base import BaseConv, decode_time, encode_time
 from .converters.lumi import LUMI_GLOBALS
 from .converters.zigbee import ZConverter
 from .devices import DEVICES
+from .timing import TIMING, handler_name
 
 if TYPE_CHECKING:
     from .gate.base import XGateway
@@ -35,6 +35,72 @@ RE_UID = re.compile(r"^(0x[0-9a-f]{16}|[0-9a-f]{12}|[0-9a-f]{16}|[0-9]{19})$")
 POWER_POLL = 10 * 60  # 10 minutes
 
 
+class SpecIndex:
+    """Converters lookup tables, shared between all devices with the same spec."""
+
+    def __init__(self, spec: list[BaseConv]):
+        self.spec = spec
+        # key is conv.mi (lumi, miot, mibeacon and matter formats)
+        self.mi: dict[str | int, list[BaseConv]] = {}
+        # key is (cluster_id, endpoint), filled on demand
+        self.zigbee: dict[tuple[int, int], list[ZConverter]] = {}
+
+        for conv in spec:
+            if conv.mi is not None:
+                self.mi.setdefault(conv.mi, []).append(conv)
+
+    def get_zigbee(self, cluster_id: int, endpoint: int) -> list[ZConverter]:
+        key = (cluster_id, endpoint)
+        if (convs := self.zigbee.get(key)) is None:
+            convs = self.zigbee[key] = [
+                conv
+                for conv in self.spec
+                if isinstance(conv, ZConverter)
+                and conv.cluster_id == cluster_id
+                and (conv.ep is None or conv.ep == endpoint)
+            ]
+        return convs
+
+
+SPEC_INDEXES: dict[int, SpecIndex] = {}  # key is id(spec)
+
+
+def get_spec_index(spec: list[BaseConv]) -> SpecIndex:
+    # index keeps a link to spec, so spec id can't be reused by another list
+    if not (index := SPEC_INDEXES.get(id(spec))):
+        index = SPEC_INDEXES[id(spec)] = SpecIndex(spec)
+    return index
+
+
+# lazy lookup tables for DEVICES, value is (position in DEVICES, desc)
+MODELS_INDEX: dict[str | int, tuple[int, dict]] = {}
+DEFAULTS_INDEX: dict[str, tuple[int, dict]] = {}
+
+
+def get_model_desc(model: str | int, type: str) -> tuple[list | None, dict | None]:
+    """Find market info and spec desc for device model or device type (default).
+    Same result as the first match in DEVICES list, but without scanning it.
+    """
+    if not MODELS_INDEX:
+        # build index on first use, so external converters are already loaded
+        for i, desc in enumerate(DEVICES):
+            for k, v in desc.items():
+                if k == "default":
+                    DEFAULTS_INDEX.setdefault(v, (i, desc))
+                elif k != "spec" and isinstance(v, list):
+                    MODELS_INDEX.setdefault(k, (i, desc))
+
+    by_model = MODELS_INDEX.get(model)
+    by_type = DEFAULTS_INDEX.get(type)
+
+    # model spec has priority only if it placed before default spec
+    if by_model and (by_type is None or by_model[0] <= by_type[0]):
+        return by_model[1][model], by_model[1]
+    if by_type:
+        return None, by_type[1]
+    return None, None
+
+
 def hex_to_ieee(hex: str) -> str:
     s = hex[2:].rjust(16, "0")
     return (
@@ -58,10 +124,6 @@ class XDeviceExtra(TypedDict, total=False):
     seq: int  # BLE duplicate event check
     lqi: int  # for ZIGBEE
     rssi: int  # for GATEWAY, ZIGBEE, BLE, MESH
-    # from DEVICES
-    market_brand: str  # from DEVICES
-    market_name: str  # from DEVICES
-    market_model: str  # from DEVICES
     # from Cloud
     cloud_name: str  # device name from cloud
     cloud_fw: str  # device firmware from cloud
@@ -76,10 +138,35 @@ class XDeviceExtra(TypedDict, total=False):
 
 
 class XDevice:
+    # no per-instance __dict__: thousands of devices on big setups
+    __slots__ = (
+        "available",
+        "gateways",
+        "extra",
+        "listeners",
+        "model",
+        "market",
+        "uid",
+        "type",
+        "did",
+        "last_report_gw",
+        "last_report_ts",
+        "last_request_ts",
+        "last_report",
+        "last_seen",
+        "params",
+        "available_timeout",
+        "poll_timeout",
+        "converters",
+        "index",
+    )
+
     configs: dict[str, dict] = {}  # key is device.uid
     restore: dict[str, dict] = {}  # key is device.cloud_did
+    dirty: set["XDevice"] = set()  # devices with new last_seen or last_report_ts
 
-    converters: list[BaseConv]
+    converters: list[BaseConv]  # shared between all devices with the same spec
+    index: SpecIndex  # shared between all devices with the same spec
 
     def __init__(self, model: str | int, **kwargs):
         self.available: bool = False
@@ -87,6 +174,12 @@ class XDevice:
         self.extra: XDeviceExtra = kwargs
         self.listeners: list[Callable] = []
         self.model = model
+        # brand, name, models from DEVICES, shared between all devices of this model
+        self.market: list[str] | None = None
+
+        self.type: str = kwargs.get("type") or "none"
+        self.did: str = kwargs.get("did")
+        self.uid: str = self.init_uid()
 
         # int for time.time() will be enough
         self.last_report_gw: Optional["XGateway"] = None
@@ -103,8 +196,7 @@ class XDevice:
         self.init_defaults()
         self.init_converters()
 
-    @cached_property
-    def uid(self) -> str:
+    def init_uid(self) -> str:
         """Universal Hass UID for devices."""
         if "mac" in self.extra:
             return self.extra["mac"].replace(":", "")
@@ -115,37 +207,38 @@ class XDevice:
         if self.type == MATTER:
             return self.did[2:]
 
-    @cached_property
-    def type(self) -> str:
-        return self.extra.get("type") or "none"
-
-    @cached_property
-    def did(self) -> str:
-        return self.extra.get("did")
-
-    @cached_property
+    @property
     def cloud_did(self) -> str | None:
         """Cloud DID same as DID for most devices except new ZIGBEE."""
-        return self.extra.get("cloud_did") or self.extra.get("did")
+        return self.extra.get("cloud_did") or self.did
 
-    @cached_property
+    @property
     def nwk(self) -> str:
         return self.extra.get("nwk") or "0x0000"  # 0 - for GATEWAY
 
-    @cached_property
+    @property
     def ieee(self) -> str:
         return self.extra["ieee"]
 
-    @cached_property
+    @property
+    def market_brand(self) -> str | None:
+        return self.market[0] if self.market else None
+
+    @property
     def market_name(self) -> str:
-        return f"{self.extra['market_brand']} {self.extra['market_name']}"
+        return f"{self.market[0]} {self.market[1]}"
+
+    @property
+    def market_model(self) -> str | None:
+        if self.market and len(self.market) > 2:
+            return ", ".join(self.market[2:])
 
-    @cached_property
+    @property
     def miot_model(self) -> str | None:
         """Get device model for Xiaomi MiOT cloud."""
         if isinstance(self.model, str) and self.model.startswith("lumi."):
             return self.model  # for GATEWAY and ZIGBEE
-        model = self.extra.get("market_model") or str(self.model)
+        model = self.market_model or str(self.model)
         if m := re.search(r"[a-z0-9]+\.[a-z0-9_.]+", model):
             return m[0]
 
@@ -154,22 +247,22 @@ class XDevice:
         return (
             self.extra.get("name")  # from yaml
             or self.extra.get("cloud_name")  # from cloud
-            or self.extra.get("market_name")  # from DEVICES
+            or (self.market and self.market[1])  # from DEVICES
             or "Unknown " + self.type
         )
 
     @property
     def human_model(self) -> str:
         s = self.type.upper() if self.type == BLE else self.type.capitalize()
-        if "market_model" in self.extra:
-            s += ": " + self.extra["market_model"]
+        if market_model := self.market_model:
+            s += ": " + market_model
             if isinstance(self.model, str):
                 s += ", " + self.model  # for GATEWAY and ZIGBEE
         else:
             s += f": {self.model}"
         return s
 
-    @cached_property
+    @property
     def firmware(self) -> str | None:
         return self.extra.get("fw_ver") or self.extra.get("cloud_fw")
 
@@ -185,6 +278,7 @@ class XDevice:
                 for gw, last_seen in self.last_seen.items()
             },
             "listeners": len(self.listeners),
+            "market": self.market,
             "model": self.model,
             "params": self.params,
             "ttl": encode_time(self.available_timeout),
@@ -207,6 +301,11 @@ class XDevice:
 
     def dispatch(self, data: dict):
         """Notify all listeners with new data."""
+        if TIMING.enabled:
+            for handler in self.listeners:
+                TIMING.call("device." + handler_name(handler), handler, data)
+            return
+
         for handler in self.listeners:
             handler(data)
 
@@ -267,22 +366,16 @@ class XDevice:
         # support custom model from yaml
         model = self.extra.get("model") or self.model
 
-        for desc in DEVICES:
-            # if this spec for current model
-            if info := desc.get(model):
-                self.extra["market_brand"] = info[0]
-                self.extra["market_name"] = info[1]
-                if len(info) > 2:
-                    self.extra["market_model"] = ", ".join(info[2:])
-                break
-            # if this spec for current type
-            if self.type == desc.get("default"):
-                break
-        else:
+        info, desc = get_model_desc(model, self.type)
+        self.market = info
+
+        if desc is None:
             self.converters = []
+            self.index = SpecIndex(self.converters)
             return
 
         self.converters = desc["spec"]
+        self.index = get_spec_index(self.converters)
 
         # ABOUT. Set available_timeout = 3 * keep_alive + 5 min
         if self.type == ZIGBEE:
@@ -360,9 +453,8 @@ class XDevice:
         if conv := LUMI_GLOBALS.get(mi):
             conv.decode(self, payload, v)
 
-        for conv in self.converters:
-            if conv.mi == mi:
-                conv.decode(self, payload, v)
+        for conv in self.index.mi.get(mi, ()):
+            conv.decode(self, payload, v)
 
     def decode_miot(self, payload: dict, value: dict):
         if value.get("code", 0) != 0:
@@ -372,24 +464,21 @@ class XDevice:
         if "piid" in value:
             # process property
             mi = f"{value['siid']}.p.{value['piid']}"
-            for conv in self.converters:
-                if conv.mi == mi:
-                    conv.decode(self, payload, value["value"])
+            for conv in self.index.mi.get(mi, ()):
+                conv.decode(self, payload, value["value"])
         elif "eiid" in value:
             # process event
             mi = f"{value['siid']}.e.{value['eiid']}"
-            for conv in self.converters:
-                if conv.mi == mi:
-                    conv.decode(self, payload, None)
+            for conv in self.index.mi.get(mi, ()):
+                conv.decode(self, payload, None)
             # process event arguments properties
             for item in value["arguments"]:
                 item.setdefault("siid", mi)
                 self.decode_miot(payload, item)
 
     def decode_mibeacon(self, payload: dict, value: dict):
-        for conv in self.converters:
-            if conv.mi == value["eid"]:
-                conv.decode(self, payload, value["edata"])
+        for conv in self.index.mi.get(value["eid"], ()):
+            conv.decode(self, payload, value["edata"])
 
     def decode_silabs(self, payload: dict, value: dict):
         """Internal func for unpack Silabs MQTT message."""
@@ -397,21 +486,15 @@ class XDevice:
         endpoint = int(value["sourceEndpoint"], 0)
         v: dict = value.get("decode")  # maybe we decode payload earlier for logs
 
-        for conv in self.converters:
-            if (
-                isinstance(conv, ZConverter)
-                and conv.cluster_id == cluster_id
-                and (conv.ep is None or conv.ep == endpoint)
-            ):
-                # decode payload on demand
-                if v is None and not (v := silabs.decode(value)):
-                    return
-                conv.decode(self, payload, v)
+        for conv in self.index.get_zigbee(cluster_id, endpoint):
+            # decode payload on demand
+            if v is None and not (v := silabs.decode(value)):
+                return
+            conv.decode(self, payload, v)
 
     def decode_matter(self, payload: dict, value: dict):
-        for conv in self.converters:
-            if conv.mi == value["iid"]:
-                conv.decode(self, payload, value["value"])
+        for conv in self.index.mi.get(value["iid"], ()):
+            conv.decode(self, payload, value["value"])
 
     def encode(self, value: dict) -> dict:
         """Encode payload to supported spec, depends on attrs.
@@ -444,6 +527,12 @@ class XDevice:
         if gw not in self.gateways:
             gw.add_device(self)
         self.last_seen[gw.device] = ts
+        XDevice.dirty.add(self)
+        if not self.available:
+            gw.expiry.schedule(self, ts)  # update available on next timer tick
+        elif self not in gw.expiry:
+            # new keep alive only moves deadline later, so no need to reschedule
+            gw.schedule_update(self)
         return ts
 
     def on_report(self, data: dict | list, gw: "XGateway", ts: int) -> dict:
@@ -452,6 +541,7 @@ class XDevice:
             self.last_report_gw = gw
             self.last_report_ts = ts
             self.last_report = payload
+            XDevice.dirty.add(self)
             self.params.update(payload)
 
             if not self.available:
@@ -519,5 +609,17 @@ class XDevice:
             self.poll_timeout
             and ts - self.last_report_ts > self.poll_timeout
             and ts - self.last_request_ts > self.poll_timeout
+            and (gw := self.send_gateway)
         ):
-            self.read()
+            gw.poll_queue.add(self, ts)
+
+    def next_update_ts(self) -> float | None:
+        """Nearest time when update() may change available or poll device."""
+        deadline = None
+        if self.available_timeout != 0 and self.last_seen:
+            deadline = max(self.last_seen.values()) + self.available_timeout
+        if self.poll_timeout:
+            ts = max(self.last_report_ts, self.last_request_ts) + self.poll_timeout + 1
+            if deadline is None or ts < deadline:
+                deadline = ts
+        return deadline
@@ -1,26 +1,35 @@
 import asyncio
 import logging
 import time
+from fnmatch import fnmatch
 from functools import cached_property
 from logging import DEBUG, Logger
-from typing import Callable
+from typing import Awaitable, Callable
 
 from ..const import GATEWAY
 from ..device import XDevice, XDeviceExtra
 from ..mini_mqtt import MQTTMessage, MiniMQTT
+from ..scheduler import ExpiryQueue, PollQueue
+from ..timing import TIMING, handler_name
 
 EVENT_ADD_DEVICE = "add_device"
 EVENT_REMOVE_DEVICE = "remove_device"
+EVENT_STALE_DEVICE = "stale_device"
 EVENT_MQTT_CONNECT = "mqtt_connect"
 EVENT_MQTT_PUBLISH = "mqtt_publish"
 EVENT_TIMER = "timer"
+EVENT_INVENTORY = "inventory"
+
+GATEWAY_INFO = ("did", "mac", "model", "version", "lan_mac")
 
 
 class XGateway:
     devices: dict[str, XDevice] = {}  # key is device.did
+    expiry: ExpiryQueue = ExpiryQueue()  # devices update deadlines, for all gateways
 
     device: XDevice = None
     listeners: dict[str, list[Callable]]
+    topic_listeners: dict[str, list[tuple[Callable, bytes | None]]]
     base_log: Logger = None
     timer_task: asyncio.Task
 
@@ -29,8 +38,18 @@ class XGateway:
 
         self.available = False
         self.listeners = {}
+        self.topic_listeners = {}
         self.mqtt = MiniMQTT()
         self.options: dict = kwargs
+        # parsed gateway files, restored from Hass storage, key is cache name
+        self.inventory: dict[str, dict] = {}
+        # gateway files stat (size, mtime, MD5), key is filename
+        self.inventory_stat: dict[str, str] = {}
+        # devices added from inventory cache and not confirmed by gateway yet
+        self.warm_dids: set[str] = set()
+        self.poll_queue = PollQueue(
+            self.options.get("poll_rate", 5), self.options.get("poll_concurrency", 4)
+        )
 
         # setup smart loggers
         prefix = __package__[:-10]  # .core.gate
@@ -45,6 +64,8 @@ class XGateway:
                 self.mqtt_log.setLevel(DEBUG)
             if "zigbee" in debug:
                 self.zigb_log.setLevel(DEBUG)
+            if "timing" in debug:
+                TIMING.enable(self)
 
     @cached_property
     def stats_domain(self) -> str | None:
@@ -87,6 +108,12 @@ class XGateway:
     def dispatch_event(self, event: str, *args, **kwargs):
         try:
             if listeners := self.listeners.get(event):
+                if TIMING.enabled:
+                    for handler in listeners:
+                        key = f"event.{event}.{handler_name(handler)}"
+                        TIMING.call(key, handler, *args, **kwargs)
+                    return
+
                 for handler in listeners:
                     handler(*args, **kwargs)
         except Exception as e:
@@ -94,6 +121,45 @@ class XGateway:
 
     def remove_all_event_listners(self):
         self.listeners.clear()
+        self.topic_listeners.clear()
+
+    def add_topic_listener(self, topic: str, handler: Callable, key: bytes = None):
+        """Add MQTT message handler for exact topic (`miio/report`) or for topic
+        from any Silabs gateway (`gw/+/heartbeat`). Handler with optional key will
+        be called only if payload contains this key (usually method name).
+        """
+        listeners = self.topic_listeners.setdefault(topic, [])
+        # protection from adding handler two times
+        if (handler, key) in listeners:
+            return
+        listeners.append((handler, key))
+
+    def mqtt_topics(self) -> list[str]:
+        """Union of topics from all mixins topic listeners. All topics (`#`) for
+        MQTT debug logs or for EVENT_MQTT_PUBLISH listeners.
+        """
+        if (
+            not self.topic_listeners
+            or EVENT_MQTT_PUBLISH in self.listeners
+            or self.mqtt_log.isEnabledFor(DEBUG)
+        ):
+            return ["#"]
+        return sorted(self.topic_listeners)
+
+    def dispatch_topic(self, msg: MQTTMessage):
+        listeners = self.topic_listeners.get(msg.topic)
+        if listeners is None and msg.topic.startswith("gw/"):
+            # gw/<ieee>/heartbeat => gw/+/heartbeat
+            suffix = msg.topic.split("/", 2)[-1]
+            listeners = self.topic_listeners.get("gw/+/" + suffix)
+        if not listeners:
+            return
+        for handler, key in listeners:
+            if key is None or key in msg.payload:
+                try:
+                    handler(msg)
+                except Exception as e:
+                    self.error(f"dispatch_topic: {msg.topic} {msg.payload}", exc_info=e)
 
     def init_device(self, model: str | int | None, **kwargs) -> XDevice:
         device = XDevice(model, **kwargs)
@@ -103,14 +169,22 @@ class XGateway:
 
     def add_device(self, device: XDevice):
         if self in device.gateways:
+            self.warm_dids.discard(device.did)
             return
 
         device.restore_last_seen(self)
 
         self.debug("add_device", device=device)
         device.gateways.append(self)
+        self.schedule_update(device)
         self.dispatch_event(EVENT_ADD_DEVICE, device)
 
+    def keep_warm_devices(self, *types: str):
+        """Keep devices from inventory cache, when gateway read has failed."""
+        self.warm_dids = {
+            i for i in self.warm_dids if self.devices[i].type not in types
+        }
+
     def remove_device(self, device: XDevice):
         if self not in device.gateways:
             return
@@ -136,12 +210,49 @@ class XGateway:
             self.device = self.init_device(info["model"], **extra)
         self.add_device(self.device)
 
+        # save gateway info without secrets (token and key) for warm start
+        data = {k: v for k, v in info.items() if k in GATEWAY_INFO}
+        if (cache := self.inventory.get("gateway")) is None or cache["data"] != data:
+            self.inventory["gateway"] = {"key": "", "data": data}
+            self.dispatch_event(EVENT_INVENTORY, self.inventory)
+
+    async def read_inventory(
+        self, name: str, files: tuple[str, ...], read: Callable[[], Awaitable]
+    ):
+        """Return parsed data from cache if gateway files has not changed."""
+        key = "|".join(
+            f"{k} {v}"
+            for k, v in sorted(self.inventory_stat.items())
+            if any(fnmatch(k, i) for i in files if i)
+        )
+        if key and (cache := self.inventory.get(name)) and cache["key"] == key:
+            self.debug("read_inventory: from cache", data=name)
+            return cache["data"]
+
+        data = await read()
+        if key:
+            self.inventory[name] = {"key": key, "data": data}
+            self.dispatch_event(EVENT_INVENTORY, self.inventory)
+        return data
+
+    def inventory_changed(self, *filenames: str) -> list[str]:
+        """Return files that will be read, because they are not in inventory cache."""
+        if not self.inventory_stat:
+            return [i for i in filenames if i]
+        cached = {j for i in self.inventory.values() for j in i["key"].split("|")}
+        return [
+            i
+            for i in filenames
+            if i in self.inventory_stat
+            and f"{i} {self.inventory_stat[i]}" not in cached
+        ]
+
     async def handle_mqtt_messages(self):
         if not await self.mqtt.connect(self.host):
             return
 
         try:
-            await self.mqtt.subscribe("#")
+            await self.mqtt.subscribe(*self.mqtt_topics())
             self.on_mqtt_connect()
             async for msg in self.mqtt:
                 self.on_mqtt_message(msg)
@@ -174,19 +285,47 @@ class XGateway:
         if self.mqtt_log.isEnabledFor(DEBUG):
             self.mqtt_log.debug({"topic": msg.topic, "data": msg.payload})
 
+        if TIMING.enabled:
+            TIMING.call("topic." + msg.topic, self.dispatch_topic, msg)
+        else:
+            self.dispatch_topic(msg)
         self.dispatch_event(EVENT_MQTT_PUBLISH, msg)
 
     async def timer(self):
+        # full update on connect, because gateway available changed
+        self.update_devices(int(time.time()))
+
+        timer_ts = 0
         while True:
             ts = time.time()
-            self.update_devices(int(ts))
-            self.dispatch_event(EVENT_TIMER, ts)
-            await asyncio.sleep(30)
+            self.update_expired(int(ts))
+            self.poll_queue.process(ts)
+            if ts >= timer_ts:
+                timer_ts = ts + 30
+                self.dispatch_event(EVENT_TIMER, ts)
+                if TIMING.enabled:
+                    self.device.dispatch({GATEWAY: {"timing": TIMING.as_dict(10)}})
+            await asyncio.sleep(1)
 
     def update_devices(self, ts: int):
         for device in self.devices.values():
             if self in device.gateways:
                 device.update(ts)
+                self.schedule_update(device, ts)
+
+    def update_expired(self, ts: int):
+        """Update only devices with expired deadline. Shared for all gateways."""
+        for device in self.expiry.pop_expired(ts):
+            if device.gateways:
+                device.update(ts)
+                self.schedule_update(device, ts)
+
+    def schedule_update(self, device: XDevice, ts: int = None):
+        if (deadline := device.next_update_ts()) is None:
+            return
+        if ts is not None and deadline <= ts:
+            deadline = ts + 30  # poll failed, no available gateway, retry later
+        self.expiry.schedule(device, deadline)
 
     async def send(self, device: XDevice, data: dict):
         pass
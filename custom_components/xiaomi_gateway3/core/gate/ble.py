@@ -9,23 +9,31 @@ from ..shell.shell_mgw import ShellMGW
 # noinspection PyMethodMayBeStatic,PyUnusedLocal
 class BLEGateway(XGateway):
     async def ble_read_devices(self, sh: ShellMGW):
-        db = await sh.read_db_bluetooth()
-        rows = db.read_table("gateway_authed_table")
-        for row in rows:
-            did = row[4]
+        async def read() -> list:
+            db = await sh.read_db_bluetooth()
+            # did, mac, product_id
+            return db.read_table("gateway_authed_table", (4, 1, 2))
+
+        rows = await self.read_inventory("ble", (sh.db_bluetooth_file,), read)
+        self.ble_add_devices(rows)
+
+    def ble_add_devices(self, rows: list[list]):
+        for did, mac, model in rows:
             device = self.devices.get(did)
             if not device:
-                mac = reverse_mac(row[1])  # aa:bb:cc:dd:ee:ff
-                model = row[2]
+                mac = reverse_mac(mac)  # aa:bb:cc:dd:ee:ff
                 device = self.init_device(model, did=did, type=BLE, mac=mac)
             self.add_device(device)
 
-    def ble_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic in ("miio/report", "central/report"):
-            if b'"_async.ble_event"' in msg.payload:
-                self.ble_process_event(msg.json["params"])
-            elif b'"_sync.ble_keep_alive"' in msg.payload:
-                self.ble_process_keepalive(msg.json["params"])
+    def ble_add_topic_listeners(self):
+        for topic in ("miio/report", "central/report"):
+            self.add_topic_listener(topic, self.ble_on_report)
+
+    def ble_on_report(self, msg: MQTTMessage):
+        if b'"_async.ble_event"' in msg.payload:
+            self.ble_process_event(msg.json["params"])
+        elif b'"_sync.ble_keep_alive"' in msg.payload:
+            self.ble_process_keepalive(msg.json["params"])
 
     def ble_process_event(self, data: dict):
         """
@@ -11,12 +11,22 @@ from ..shell.shell_mgw2 import ShellMGW2
 
 class LumiGateway(XGateway):
     async def lumi_read_devices(self, sh: ShellMGW | ShellMGW2):
-        raw = await sh.read_file("/data/zigbee/device.info")
-        lumi = json.loads(raw)["devInfo"]
+        async def read() -> dict:
+            raw = await sh.read_file("/data/zigbee/device.info")
+            return {
+                "lumi": json.loads(raw)["devInfo"],
+                "xiaomi_did": await sh.read_xiaomi_did(),
+            }
 
-        xiaomi_did = await sh.read_xiaomi_did()
+        data = await self.read_inventory(
+            "lumi", ("/data/zigbee/device.info", sh.xiaomi_did_files), read
+        )
+        self.lumi_add_devices(data)
 
-        for item in lumi:
+    def lumi_add_devices(self, data: dict):
+        xiaomi_did = data["xiaomi_did"]
+
+        for item in data["lumi"]:
             did = item["did"]
             device = self.devices.get(did)
             if not device:
@@ -34,9 +44,11 @@ class LumiGateway(XGateway):
 
             self.add_device(device)
 
+    def lumi_add_topic_listeners(self):
+        self.add_topic_listener("zigbee/send", self.lumi_on_mqtt_publish)
+
     def lumi_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic == "zigbee/send":
-            self.lumi_process_lumi(msg.json)
+        self.lumi_process_lumi(msg.json)
 
     def lumi_process_lumi(self, data: dict):
         cmd: str = data["cmd"]
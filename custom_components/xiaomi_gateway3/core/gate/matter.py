@@ -7,13 +7,20 @@ from ..device import XDevice
 from ..mini_mqtt import MQTTMessage
 from ..shell.shell_mgw2 import ShellMGW2
 
+MATTER_DEVICES_FILE = "/data/matter/certification/device.json"
+
 
 class MatterGateway(XGateway):
     async def matter_read_devices(self, sh: ShellMGW2):
-        raw = await sh.read_file("/data/matter/certification/device.json")
-        if not raw.startswith(b"["):
-            return
-        for item in json.loads(raw):
+        async def read() -> list:
+            raw = await sh.read_file(MATTER_DEVICES_FILE)
+            return json.loads(raw) if raw and raw.startswith(b"[") else []
+
+        items = await self.read_inventory("matter", (MATTER_DEVICES_FILE,), read)
+        self.matter_add_devices(items)
+
+    def matter_add_devices(self, items: list[dict]):
+        for item in items:
             did = item["did"]
             device = self.devices.get(did)
             if not device:
@@ -22,17 +29,25 @@ class MatterGateway(XGateway):
                 )
             self.add_device(device)
 
-    def matter_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic == "local/matter/response":
-            if b'"properties_changed_v3"' in msg.payload:
-                data = decode(msg.payload)
-                self.matter_process_properties(data["result"][0]["RPC"]["params"])
-        elif msg.topic == "local/ot/rpcReq":
-            # {"method":"_sync.matter_dev_status","params":{"dev_list":null}}
-            if b'"_sync.matter_dev_status"' in msg.payload:
-                data = decode(msg.payload)
-                if dev_list := data["params"].get("dev_list"):
-                    self.matter_process_dev_status(dev_list)
+    def matter_add_topic_listeners(self):
+        self.add_topic_listener(
+            "local/matter/response",
+            self.matter_on_properties_changed,
+            b'"properties_changed_v3"',
+        )
+        self.add_topic_listener(
+            "local/ot/rpcReq", self.matter_on_dev_status, b'"_sync.matter_dev_status"'
+        )
+
+    def matter_on_properties_changed(self, msg: MQTTMessage):
+        data = decode(msg.payload)
+        self.matter_process_properties(data["result"][0]["RPC"]["params"])
+
+    def matter_on_dev_status(self, msg: MQTTMessage):
+        # {"method":"_sync.matter_dev_status","params":{"dev_list":null}}
+        data = decode(msg.payload)
+        if dev_list := data["params"].get("dev_list"):
+            self.matter_process_dev_status(dev_list)
 
     def matter_process_properties(self, params: list[dict]):
         devices: dict[str, list] = {}
@@ -9,49 +9,57 @@ from ..shell.shell_mgw import ShellMGW
 # noinspection PyMethodMayBeStatic,PyUnusedLocal
 class MeshGateway(XGateway):
     async def mesh_read_devices(self, sh: ShellMGW):
-        try:
+        async def read() -> dict:
             # prevent read database two times
             db = await sh.read_db_bluetooth()
+            return {
+                # did, mac, product_id, group address
+                "devices": db.read_table("mesh_device_v3", (0, 1, 2, 5)),
+                # group did, group address, product_id
+                "groups": db.read_table("mesh_group_v3", (0, 1, 2)),
+            }
 
-            childs = {}
+        try:
+            data = await self.read_inventory("mesh", (sh.db_bluetooth_file,), read)
+            self.mesh_add_devices(data)
+        except Exception as e:
+            self.debug("Can't read mesh DB", exc_info=e)
+            self.keep_warm_devices(MESH, GROUP)
 
-            # load Mesh bulbs
-            rows = sh.db.read_table("mesh_device_v3")
-            for row in rows:
-                did = row[0]
-                device = self.devices.get(did)
-                if not device:
-                    mac = row[1].lower()  # aa:bb:cc:dd:ee:ff
-                    model = row[2]
-                    device = self.init_device(model, did=did, mac=mac, type=MESH)
-                self.add_device(device)
+    def mesh_add_devices(self, data: dict):
+        childs = {}
 
-                # add bulb to group address
-                childs.setdefault(row[5], []).append(did)
+        # load Mesh bulbs
+        for did, mac, model, group in data["devices"]:
+            device = self.devices.get(did)
+            if not device:
+                mac = mac.lower()  # aa:bb:cc:dd:ee:ff
+                device = self.init_device(model, did=did, mac=mac, type=MESH)
+            self.add_device(device)
 
-            # load Mesh groups
-            rows = sh.db.read_table("mesh_group_v3")
-            for row in rows:
-                did = "group." + row[0]
-                device = self.devices.get(did)
-                if not device:
-                    model = row[2]
-                    device = self.init_device(model, did=did, type=GROUP)
-                # update childs of device
-                device.extra["childs"] = childs.get(row[1])
-                self.add_device(device)
+            # add bulb to group address
+            childs.setdefault(group, []).append(did)
 
-        except Exception as e:
-            self.debug("Can't read mesh DB", exc_info=e)
+        # load Mesh groups
+        for group_id, group, model in data["groups"]:
+            did = "group." + group_id
+            device = self.devices.get(did)
+            if not device:
+                device = self.init_device(model, did=did, type=GROUP)
+            # update childs of device
+            device.extra["childs"] = childs.get(group)
+            self.add_device(device)
+
+    def mesh_add_topic_listeners(self):
+        self.add_topic_listener("miio/report", self.mesh_on_report)
 
-    def mesh_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic == "miio/report":
-            if b'"_sync.ble_mesh_keep_alive"' in msg.payload:
-                self.mesh_process_keepalive(msg.json["params"])
-            elif b'"_sync.ble_mesh_offline"' in msg.payload:
-                self.mesh_process_offline(msg.json["params"]["list"])
-            # elif b'"_sync.ble_mesh_query_dev"' in msg.payload:
-            #     self.mesh_process_query_dev(msg.json["params"])
+    def mesh_on_report(self, msg: MQTTMessage):
+        if b'"_sync.ble_mesh_keep_alive"' in msg.payload:
+            self.mesh_process_keepalive(msg.json["params"])
+        elif b'"_sync.ble_mesh_offline"' in msg.payload:
+            self.mesh_process_offline(msg.json["params"]["list"])
+        # elif b'"_sync.ble_mesh_query_dev"' in msg.payload:
+        #     self.mesh_process_query_dev(msg.json["params"])
 
     def mesh_process_keepalive(self, data: list):
         # "params":[{"did":"123","rssi":-52,"hops":0,"ts":123}],
@@ -9,21 +9,26 @@ from ..mini_mqtt import MQTTMessage
 
 # noinspection PyMethodMayBeStatic,PyUnusedLocal
 class MIoTGateway(XGateway):
-    def miot_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic in ("miio/report", "central/report"):
-            if b'"properties_changed"' in msg.payload:
-                self.miot_process_properties(msg.json["params"], from_cache=False)
-            elif b'"event_occured"' in msg.payload:
-                self.miot_process_event(msg.json["params"])
-        elif msg.topic == "miio/command_ack":
-            # check if it is response from `get_properties` command
-            result = msg.json.get("result")
-            if isinstance(result, list) and any(
-                "did" in i and "siid" in i and "value" in i
-                for i in result
-                if isinstance(i, dict)
-            ):
-                self.miot_process_properties(result, from_cache=True)
+    def miot_add_topic_listeners(self):
+        for topic in ("miio/report", "central/report"):
+            self.add_topic_listener(topic, self.miot_on_report)
+        self.add_topic_listener("miio/command_ack", self.miot_on_command_ack)
+
+    def miot_on_report(self, msg: MQTTMessage):
+        if b'"properties_changed"' in msg.payload:
+            self.miot_process_properties(msg.json["params"], from_cache=False)
+        elif b'"event_occured"' in msg.payload:
+            self.miot_process_event(msg.json["params"])
+
+    def miot_on_command_ack(self, msg: MQTTMessage):
+        # check if it is response from `get_properties` command
+        result = msg.json.get("result")
+        if isinstance(result, list) and any(
+            "did" in i and "siid" in i and "value" in i
+            for i in result
+            if isinstance(i, dict)
+        ):
+            self.miot_process_properties(result, from_cache=True)
 
     def miot_process_properties(self, params: list, from_cache: bool):
         """Can receive multiple properties from multiple devices.
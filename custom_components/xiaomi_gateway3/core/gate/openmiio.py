@@ -7,7 +7,7 @@ from .. import core_utils
 from ..const import GATEWAY
 from ..converters.base import encode_time
 from ..mini_mqtt import MQTTMessage
-from ..shell.session import Session
+from ..shell.session import SessionPool
 from ..shell.shell_mgw import ShellMGW
 from ..shell.shell_mgw2 import ShellMGW2
 
@@ -60,18 +60,24 @@ class OpenMiioGateway(XGateway):
 
         return fut.result()
 
-    def openmiio_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic == "openmiio/report":
-            self.openmiio_last_ts = time.time()
-            self.device.dispatch({GATEWAY: msg.json})
+    def openmiio_add_topic_listeners(self):
+        self.add_topic_listener("openmiio/report", self.openmiio_on_report)
+        self.add_topic_listener("miio/command_ack", self.openmiio_on_command_ack)
+        self.add_topic_listener(
+            "miio/report", self.openmiio_on_gw_heartbeat, b'"event.gw.heartbeat"'
+        )
 
-        elif msg.topic == "miio/command_ack":
-            if ack := self.miio_ack.get(msg.json["id"]):
-                ack.set_result(msg.json)
+    def openmiio_on_report(self, msg: MQTTMessage):
+        self.openmiio_last_ts = time.time()
+        self.device.dispatch({GATEWAY: msg.json})
+
+    def openmiio_on_command_ack(self, msg: MQTTMessage):
+        data = msg.json
+        if ack := self.miio_ack.get(data["id"]):
+            ack.set_result(data)
 
-        elif msg.topic == "miio/report":
-            if b'"event.gw.heartbeat"' in msg.payload:
-                self.openmiio_process_gw_heartbeat(msg.json["params"][0])
+    def openmiio_on_gw_heartbeat(self, msg: MQTTMessage):
+        self.openmiio_process_gw_heartbeat(msg.json["params"][0])
 
     def openmiio_on_timer(self, ts: float):
         if ts - self.openmiio_last_ts < 60:
@@ -83,7 +89,7 @@ class OpenMiioGateway(XGateway):
 
     async def openmiio_restart(self):
         try:
-            async with Session(self.host) as sh:
+            async with SessionPool.get(self.host) as sh:
                 if await sh.only_one():
                     await self.openmiio_prepare_gateway(sh)
         except Exception as e:
@@ -1,7 +1,9 @@
 import asyncio
 import json
 import time
+from functools import cached_property
 from logging import DEBUG
+from typing import Awaitable, Callable
 
 from .base import XGateway
 from ..const import GATEWAY, ZIGBEE
@@ -10,7 +12,83 @@ from ..converters.zigbee import ZConverter
 from ..device import XDevice, hex_to_ieee
 from ..mini_mqtt import MQTTMessage
 from ..shell.base import ShellBase
-from ..shell.session import Session
+from ..shell.session import SessionPool
+
+
+class CommandsBatch:
+    """Collect commands from many devices for a short window and publish them with
+    fewer MQTT messages. Commands of one device are never split between messages.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[list[dict]], Awaitable],
+        window: float = 0.05,
+        limit: int = 32,  # commands per message, Z3GatewayHost process them one by one
+    ):
+        self.publish = publish
+        self.window = window
+        self.limit = limit
+
+        self.batch: list[list[dict]] = []
+        self.batch_ts: float = 0
+        self.fut: asyncio.Future | None = None
+
+        self.publishes = 0
+        self.commands = 0
+        self.latency = 0.0
+        self.latency_max = 0.0
+
+    async def send(self, commands: list[dict]):
+        if self.fut is None:
+            loop = asyncio.get_running_loop()
+            self.fut = loop.create_future()
+            self.batch_ts = time.monotonic()
+            loop.call_later(self.window, self.flush)
+        self.batch.append(commands)
+        # all devices from batch wait for real publish, like without batching
+        await asyncio.shield(self.fut)
+
+    def flush(self):
+        batch, fut, ts = self.batch, self.fut, self.batch_ts
+        self.batch, self.fut = [], None
+        asyncio.create_task(self.flush_batch(batch, fut, ts))
+
+    async def flush_batch(self, batch: list[list[dict]], fut: asyncio.Future, ts):
+        try:
+            commands = []
+            for item in batch:
+                if commands and len(commands) + len(item) > self.limit:
+                    await self.publish_commands(commands)
+                    commands = []
+                commands += item
+            await self.publish_commands(commands)
+
+            self.latency = time.monotonic() - ts
+            self.latency_max = max(self.latency_max, self.latency)
+            fut.set_result(None)
+        except Exception as e:
+            fut.set_exception(e)
+        finally:
+            # task cancelled, devices from batch shouldn't wait forever
+            if not fut.done():
+                fut.cancel()
+
+    async def publish_commands(self, commands: list[dict]):
+        self.publishes += 1
+        self.commands += len(commands)
+        await self.publish(commands)
+
+    def as_dict(self) -> dict:
+        return {
+            "publishes": self.publishes,
+            "commands": self.commands,
+            "commands_per_publish": (
+                round(self.commands / self.publishes, 1) if self.publishes else 0
+            ),
+            "latency_ms": round(self.latency * 1000),
+            "latency_max_ms": round(self.latency_max * 1000),
+        }
 
 
 class SilabsGateway(XGateway):
@@ -26,8 +104,12 @@ class SilabsGateway(XGateway):
 
     async def silabs_read_device(self, sh: ShellBase):
         # 1. Read coordinator info
-        raw = await sh.read_file("/data/zigbee/coordinator.info")
-        info = json.loads(raw)
+        async def read() -> dict:
+            return json.loads(await sh.read_file("/data/zigbee/coordinator.info"))
+
+        info = await self.read_inventory(
+            "coordinator", ("/data/zigbee/coordinator.info",), read
+        )
         self.ieee = info["mac"][2:].upper()
         assert len(self.ieee) == 16
 
@@ -54,23 +136,34 @@ class SilabsGateway(XGateway):
         #
         #         self.add_device(device)
 
-    def silabs_on_mqtt_publish(self, msg: MQTTMessage):
-        if msg.topic.endswith("/MessageReceived"):
-            self.silabs_process_recv(msg.json)
-        # elif msg.topic.endswith("/MessagePreSentCallback"):
-        #     self.silabs_process_send(msg.json)
-        elif msg.topic == "zigbee/send" and b"8.0.2084" in msg.payload:
-            data: dict = msg.json["params"][0]["value"]
-            coro = self.silabs_process_join(data)
-            asyncio.create_task(coro)
-        elif msg.topic.endswith("/heartbeat"):
-            self.silabs_process_heartbeat(msg.json)
-        elif msg.topic.endswith("/commands"):
-            self.commands_ts = time.time()
-        elif msg.topic.endswith("/executed"):
-            self.commands_ts = 0
-        elif msg.topic.endswith("/deviceleft"):
-            self.silabs_process_deviceleft(msg.json)
+    def silabs_add_topic_listeners(self):
+        self.add_topic_listener("gw/+/MessageReceived", self.silabs_on_recv)
+        # self.add_topic_listener("gw/+/MessagePreSentCallback", self.silabs_on_send)
+        self.add_topic_listener("zigbee/send", self.silabs_on_join, b"8.0.2084")
+        self.add_topic_listener("gw/+/heartbeat", self.silabs_on_heartbeat)
+        self.add_topic_listener("gw/+/commands", self.silabs_on_commands)
+        self.add_topic_listener("gw/+/executed", self.silabs_on_executed)
+        self.add_topic_listener("gw/+/deviceleft", self.silabs_on_deviceleft)
+
+    def silabs_on_recv(self, msg: MQTTMessage):
+        self.silabs_process_recv(msg.json)
+
+    def silabs_on_join(self, msg: MQTTMessage):
+        data: dict = msg.json["params"][0]["value"]
+        coro = self.silabs_process_join(data)
+        asyncio.create_task(coro)
+
+    def silabs_on_heartbeat(self, msg: MQTTMessage):
+        self.silabs_process_heartbeat(msg.json)
+
+    def silabs_on_commands(self, msg: MQTTMessage):
+        self.commands_ts = time.time()
+
+    def silabs_on_executed(self, msg: MQTTMessage):
+        self.commands_ts = 0
+
+    def silabs_on_deviceleft(self, msg: MQTTMessage):
+        self.silabs_process_deviceleft(msg.json)
 
     def silabs_process_recv(self, data: dict):
         uid = data["eui64"].lower()
@@ -78,7 +171,8 @@ class SilabsGateway(XGateway):
 
         if self.zigb_log.isEnabledFor(DEBUG):
             # store decoded message, so we can use it later
-            data["decode"] = silabs.decode(data)
+            # copy, because MQTT message payload shared between handlers
+            data = {**data, "decode": silabs.decode(data)}
             self.zigb_log.debug({"uid": uid, "nwk": nwk, "data": data["decode"]})
 
         ts = int(time.time())
@@ -161,7 +255,7 @@ class SilabsGateway(XGateway):
     async def silabs_process_join(self, data: dict):
         self.debug("silabs_process_join", data=data)
         try:
-            async with Session(self.host) as sh:
+            async with SessionPool.get(self.host) as sh:
                 # check if model should be prevented from unpairing
                 if self.force_pair or not data["model"].startswith(("lumi.", "ikea.")):
                     self.force_pair = False
@@ -206,8 +300,8 @@ class SilabsGateway(XGateway):
         await self.mqtt.publish(f"gw/{self.ieee}/devicejoined", payload)
 
     async def silabs_leave(self, device: XDevice):
-        cmd = silabs.zdo_leave(device.nwk)
-        await self.mqtt.publish(f"gw/{self.ieee}/commands", {"commands": cmd})
+        # same batch as other commands, so leave sent after previous commands
+        await self.silabs_batch.send(silabs.zdo_leave(device.nwk))
 
     async def silabs_send(self, device: XDevice, payload: dict):
         assert "commands" in payload, payload
@@ -220,7 +314,14 @@ class SilabsGateway(XGateway):
                 if item["commandcli"].startswith("send "):
                     item["commandcli"] += " 65535 {0000000000000000}"
 
-        await self.mqtt.publish(f"gw/{self.ieee}/commands", payload)
+        await self.silabs_batch.send(payload["commands"])
+
+    @cached_property
+    def silabs_batch(self) -> CommandsBatch:
+        return CommandsBatch(self.silabs_publish)
+
+    async def silabs_publish(self, commands: list[dict]):
+        await self.mqtt.publish(f"gw/{self.ieee}/commands", {"commands": commands})
 
     def silabs_on_timer(self, ts: float):
         # periodic scanning only when the stats sensors are enabled
@@ -287,7 +388,7 @@ class SilabsGateway(XGateway):
 
     async def silabs_restart(self):
         try:
-            async with Session(self.host) as sh:
+            async with SessionPool.get(self.host) as sh:
                 # names for all supported gateway models
                 await sh.exec("killall Lumi_Z3GatewayHost_MQTT mZ3GatewayHost_MQTT")
         except Exception as e:
@@ -1,17 +1,19 @@
 import asyncio
+import time
 
 from . import core_utils
 from .const import GATEWAY, GROUP, MATTER, MESH, ZIGBEE
 from .device import XDevice
-from .gate.base import EVENT_MQTT_PUBLISH, EVENT_TIMER
+from .gate.base import EVENT_STALE_DEVICE, EVENT_TIMER
 from .gate.ble import BLEGateway
 from .gate.lumi import LumiGateway
-from .gate.matter import MatterGateway
+from .gate.matter import MATTER_DEVICES_FILE, MatterGateway
 from .gate.mesh import MeshGateway
 from .gate.miot import MIoTGateway
 from .gate.openmiio import OpenMiioGateway
 from .gate.silabs import SilabsGateway
-from .shell.session import Session
+from .shell.session import SessionPool
+from .timing import TIMING
 
 
 class MultiGateway(
@@ -32,6 +34,8 @@ class MultiGateway(
         self.main_task = asyncio.create_task(self.run_forever())
 
     async def stop(self):
+        TIMING.disable(self)
+
         if not self.main_task:
             return
 
@@ -43,6 +47,51 @@ class MultiGateway(
             await asyncio.sleep(0.1)
         self.main_task = None
 
+        # close shell session and stop its idle timer
+        if pool := SessionPool.pools.pop(self.host, None):
+            await pool.close()
+
+    async def warm_start(self):
+        """Add devices from inventory cache, so entities are created before
+        gateway connected. Gateway read will remove devices that no longer exist.
+        """
+        data = {k: v["data"] for k, v in self.inventory.items()}
+        if "gateway" not in data:
+            return
+
+        ts = time.monotonic()
+        try:
+            await self.base_read_device(data["gateway"])
+            if "lumi" in data:
+                self.lumi_add_devices(data["lumi"])
+            if "ble" in data:
+                self.ble_add_devices(data["ble"])
+            if "mesh" in data:
+                self.mesh_add_devices(data["mesh"])
+            if "matter" in data:
+                self.matter_add_devices(data["matter"])
+        except Exception as e:
+            self.debug("Can't warm start", exc_info=e)
+
+        self.warm_dids = {k for k, v in self.devices.items() if self in v.gateways}
+        self.debug(
+            "warm_start",
+            data={
+                "devices": len(self.warm_dids),
+                "time": round(time.monotonic() - ts, 3),
+            },
+        )
+
+    def remove_stale_devices(self):
+        """Remove devices from inventory cache, not found on gateway read."""
+        for did in self.warm_dids:
+            device = self.devices[did]
+            self.remove_device(device)
+            if not device.gateways:
+                # device removed while Hass was stopped, so remove its entities
+                self.dispatch_event(EVENT_STALE_DEVICE, device)
+        self.warm_dids.clear()
+
     async def run_forever(self):
         while True:
             # check if telnet port OK
@@ -72,12 +121,47 @@ class MultiGateway(
             return False
 
     async def prepare_gateway(self) -> bool:
+        # time of each phase for debug logs
+        times = {}
+        ts = time.monotonic()
+
+        def phase(name: str):
+            nonlocal ts
+            now = time.monotonic()
+            times[name] = round(now - ts, 3)
+            ts = now
+
         try:
-            async with Session(self.host) as sh:
+            async with SessionPool.get(self.host) as sh:
                 if not await sh.only_one():
                     self.debug("Connection from a second Hass detected")
                     return False
 
+                # skip read and parse for not changed files
+                self.inventory_stat = await sh.get_files_stat(
+                    "/data/zigbee/device.info",
+                    "/data/zigbee/coordinator.info",
+                    sh.xiaomi_did_files,
+                    sh.db_bluetooth_file,
+                    MATTER_DEVICES_FILE,
+                )
+                # pooled shell may keep Bluetooth DB from previous connect
+                sh.db = None
+                phase("stat")
+
+                # read all needed files with one command, instead of one command
+                # and one wait for each file
+                await sh.prefetch_files(
+                    *sh.startup_files,
+                    *self.inventory_changed(
+                        "/data/zigbee/device.info",
+                        "/data/zigbee/coordinator.info",
+                        sh.db_bluetooth_file,
+                        MATTER_DEVICES_FILE,
+                    ),
+                )
+                phase("files")
+
                 info = await sh.get_miio_info()
                 model, fw = info["model"], info["version"]
 
@@ -92,35 +176,49 @@ class MultiGateway(
                 support_matter = model == "lumi.gateway.mgl001" and fw >= "1.0.7_0019"
 
                 await self.base_read_device(info)
+                phase("info")
                 await self.lumi_read_devices(sh)
+                phase("lumi")
                 await self.silabs_read_device(sh)
+                phase("silabs")
                 await self.openmiio_prepare_gateway(sh)
+                phase("openmiio")
 
                 if support_ble_mesh:
                     await self.ble_read_devices(sh)
                     await self.mesh_read_devices(sh)
+                    phase("ble_mesh")
 
                 if support_matter:
                     await self.matter_read_devices(sh)
+                    phase("matter")
+
+                # not used files shouldn't stay in pooled shell
+                sh.prefetched.clear()
 
-            self.add_event_listener(EVENT_MQTT_PUBLISH, self.lumi_on_mqtt_publish)
-            self.add_event_listener(EVENT_MQTT_PUBLISH, self.miot_on_mqtt_publish)
-            self.add_event_listener(EVENT_MQTT_PUBLISH, self.openmiio_on_mqtt_publish)
-            self.add_event_listener(EVENT_MQTT_PUBLISH, self.silabs_on_mqtt_publish)
+            self.remove_stale_devices()
+
+            self.lumi_add_topic_listeners()
+            self.miot_add_topic_listeners()
+            self.openmiio_add_topic_listeners()
+            self.silabs_add_topic_listeners()
 
             if support_ble_mesh:
-                self.add_event_listener(EVENT_MQTT_PUBLISH, self.ble_on_mqtt_publish)
-                self.add_event_listener(EVENT_MQTT_PUBLISH, self.mesh_on_mqtt_publish)
+                self.ble_add_topic_listeners()
+                self.mesh_add_topic_listeners()
 
             if support_matter:
-                self.add_event_listener(EVENT_MQTT_PUBLISH, self.matter_on_mqtt_publish)
+                self.matter_add_topic_listeners()
 
             self.add_event_listener(EVENT_TIMER, self.openmiio_on_timer)
             self.add_event_listener(EVENT_TIMER, self.silabs_on_timer)
 
+            times["total"] = round(sum(times.values()), 3)
+            self.debug("prepare_gateway", data=times)
+
             return True
         except Exception as e:
-            self.debug("Can't prepare gateway", exc_info=e)
+            self.debug("Can't prepare gateway", exc_info=e, data=times)
             return False
 
     async def send(self, device: XDevice, data: dict):
@@ -167,7 +265,7 @@ class MultiGateway(
     async def telnet_command(self, cmd: str) -> bool | None:
         self.debug("telnet_command", data=cmd)
         try:
-            async with Session(self.host) as sh:
+            async with SessionPool.get(self.host) as sh:
                 if cmd == "run_ftp":
                     await sh.run_ftp()
                     return True
@@ -5,9 +5,26 @@ import asyncio
 import json
 import logging
 import random
+import time
 from asyncio import StreamReader, StreamWriter
+from collections import deque
+from functools import cached_property
 from typing import Optional
 
+try:
+    # faster JSON backend, shipped with Hass
+    import orjson
+
+    def json_loads(data: bytes):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson doesn't support NaN and Infinity values
+            return json.loads(data)
+
+except ImportError:
+    json_loads = json.loads
+
 _LOGGER = logging.getLogger(__package__ + ".mqtt")
 
 CONNECT = 1
@@ -30,13 +47,22 @@ class MQTTMessage:
     topic: str
     payload: bytes
 
+    # total number of JSON decodes, each message payload is decoded only once
+    json_decodes: int = 0
+    # JSON backend can be replaced with any function: bytes -> object
+    json_loads = staticmethod(json_loads)
+
     @property
     def text(self) -> str:
         return self.payload.decode()
 
-    @property
+    @cached_property
     def json(self) -> dict:
-        return json.loads(self.payload)
+        """Decoded payload, shared between all topic handlers, so handlers
+        shouldn't change it.
+        """
+        MQTTMessage.json_decodes += 1
+        return self.json_loads(self.payload)
 
     def __str__(self):
         return f"{self.topic} {self.payload.decode()}"
@@ -145,22 +171,53 @@ class MiniMQTT:
     reader: StreamReader = None
     writer: StreamWriter = None
 
-    def __init__(self, keepalive=15, timeout=5):
+    connected: bool = False
+
+    def __init__(
+        self,
+        keepalive=15,
+        timeout=5,
+        read_size=0x10000,
+        high_water=0x10000,
+        buffer_size=100,
+        buffer_ttl=60,
+        buffer_rate=50,
+    ):
         self.keepalive = keepalive
         self.timeout = timeout
-        self.pub_buffer = []
-
-    async def read_varlen(self) -> int:
-        var = 0
-        for i in range(4):
-            b = await self.reader.read(1)
-            var += (b[0] & 0x7F) << (7 * i)
-            if (b[0] & 0x80) == 0:
-                break
-        return var
-
-    async def _connect(self, host: str) -> bool:
-        self.reader, self.writer = await asyncio.open_connection(host, 1883)
+        self.read_size = read_size
+        self.high_water = high_water
+
+        # messages published while offline: (ts, topic, payload, retain)
+        self.pub_buffer: deque[tuple[float, str, bytes | dict | str, bool]] = deque()
+        self.buffer_size = buffer_size
+        self.buffer_ttl = buffer_ttl
+        self.buffer_rate = buffer_rate  # max replayed messages per second
+        self.buffer_task: asyncio.Task | None = None
+
+        self.recv_buffer = bytearray()
+        self.recv_bytes = 0
+        self.recv_messages: deque[MQTTMessage] = deque()
+
+        # outgoing frames from one loop tick, will be sent with one write
+        self.send_frames: list[bytes] = []
+        self.send_size = 0
+        self.send_ts = 0.0
+        self.send_handle: asyncio.Handle | None = None
+        self.send_stats = {
+            "flushes": 0,
+            "frames": 0,
+            "queue_max": 0,
+            "latency": 0.0,
+            "latency_max": 0.0,
+            "dropped": 0,
+            "replayed": 0,
+        }
+
+    async def _connect(self, host: str, port: int) -> bool:
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.recv_buffer.clear()
+        self.recv_messages.clear()
 
         # keepalive can't be 0 for mosquitto v2
         msg = RawMessage.connect(60 * 60 * 18)
@@ -172,13 +229,14 @@ class MiniMQTT:
         raw = await self.reader.readexactly(4)
         assert raw[0] == CONNACK << 4
         assert raw[1] == 2
-        return raw[3] == 0
+        self.connected = raw[3] == 0
+        return self.connected
 
-    async def connect(self, host: str) -> bool:
+    async def connect(self, host: str, port: int = 1883) -> bool:
         try:
-            resp = await asyncio.wait_for(self._connect(host), self.timeout)
+            resp = await asyncio.wait_for(self._connect(host, port), self.timeout)
             if resp and self.pub_buffer:
-                _ = asyncio.create_task(self.empty_buffer())
+                self.buffer_task = asyncio.create_task(self.empty_buffer())
             return resp
         except:
             return False
@@ -186,24 +244,39 @@ class MiniMQTT:
     async def disconnect(self):
         msg = RawMessage.disconnect()
         try:
+            self.send_flush()
             self.writer.write(msg)
             await asyncio.wait_for(self.writer.drain(), self.timeout)
         except:
             _LOGGER.debug("Can't disconnect")
 
-    async def subscribe(self, topic: str):
+    async def subscribe(self, *topics: str):
+        """Subscribe to one or multiple topic filters with one SUBSCRIBE."""
         self.msg_id += 1
-        msg = RawMessage.subscribe(self.msg_id, topic)
+        msg = RawMessage.subscribe(self.msg_id, *topics)
         try:
             self.writer.write(msg)
             await asyncio.wait_for(self.writer.drain(), self.timeout)
         except:
-            _LOGGER.debug(f"Can't subscribe to {topic}")
-
-    async def publish(self, topic: str, payload: bytes | dict | str, retain=False):
-        if self.writer is None:
-            self.pub_buffer.append([topic, payload, retain])
+            _LOGGER.debug(f"Can't subscribe to {topics}")
+
+    async def publish(
+        self, topic: str, payload: bytes | dict | str, retain=False, flush=False
+    ):
+        """Queue message and return immediately. All messages from one loop tick
+        will be sent with one write. Waits for the network only if `flush` is set
+        or when outgoing data is over the high water mark.
+        """
+        if not self.connected or self.pub_buffer or self.writer.is_closing():
+            # keep messages order until the buffer is replayed
+            self.buffer_add(topic, payload, retain)
             return
+
+        await self._publish(topic, payload, retain, flush)
+
+    async def _publish(
+        self, topic: str, payload: bytes | dict | str, retain=False, flush=False
+    ):
         if isinstance(payload, str):
             payload = payload.encode()
         elif isinstance(payload, dict):
@@ -211,46 +284,153 @@ class MiniMQTT:
 
         # no response for QoS 0
         msg = RawMessage.publish(topic, payload, retain)
+        self.send(msg)
+
         try:
-            self.writer.write(msg)
-            await asyncio.wait_for(self.writer.drain(), self.timeout)
+            if (
+                flush
+                or self.send_size + self.writer.transport.get_write_buffer_size()
+                > self.high_water
+            ):
+                self.send_flush()
+                await asyncio.wait_for(self.writer.drain(), self.timeout)
         except:
             _LOGGER.debug(f"Can't publish {payload} to {topic}")
 
-    async def read(self) -> Optional[MQTTMessage]:
-        raw = await self.reader.read(1)
-        if raw == b"":
-            # disconnected
-            return None
+    def buffer_add(self, topic: str, payload: bytes | dict | str, retain: bool):
+        buf = self.pub_buffer
+        stats = self.send_stats
 
-        msg = RawMessage.read_header(raw[0])
-        if msg.type == PUBLISH:
-            varlen = await self.read_varlen()
-            raw = await self.reader.readexactly(varlen)
+        # drop expired and oldest messages
+        ts = time.monotonic()
+        expired = ts - self.buffer_ttl
+        while buf and (buf[0][0] < expired or len(buf) >= self.buffer_size):
+            buf.popleft()
+            stats["dropped"] += 1
 
-            pr = RawMessage(raw)
-            msg.topic = pr.read_str()
+        buf.append((ts, topic, payload, retain))
 
-            if msg.qos > 0:
-                _ = pr.read_int(2)  # msg ID
-                raise NotImplementedError
+    def send(self, frame: bytes):
+        if not self.send_frames:
+            self.send_ts = time.monotonic()
+            self.send_handle = asyncio.get_event_loop().call_soon(self.send_flush)
 
-            msg.payload = pr.read_all()
+        self.send_frames.append(frame)
+        self.send_size += len(frame)
 
-        elif msg.type == PINGRESP:
-            await self.reader.readexactly(1)
+    def send_flush(self):
+        """Write all queued frames to the network with one write."""
+        if self.send_handle:
+            self.send_handle.cancel()
+            self.send_handle = None
 
-        elif msg.type == SUBACK:
-            # 1b header, 1b len, 2b msgID, 1b QOS
-            varlen = await self.reader.readexactly(1)
-            await self.reader.readexactly(varlen[0])
+        if not self.send_frames:
+            return
 
-        else:
-            raise NotImplementedError
+        frames = self.send_frames
+        self.send_frames = []
+        self.send_size = 0
 
-        return msg
+        try:
+            self.writer.write(b"".join(frames))
+        except Exception as e:
+            _LOGGER.debug(f"Can't send {len(frames)} frames", exc_info=e)
+
+        latency = time.monotonic() - self.send_ts
+
+        stats = self.send_stats
+        stats["flushes"] += 1
+        stats["frames"] += len(frames)
+        stats["latency"] = latency
+        if len(frames) > stats["queue_max"]:
+            stats["queue_max"] = len(frames)
+        if latency > stats["latency_max"]:
+            stats["latency_max"] = latency
+
+    @property
+    def send_queue(self) -> int:
+        return len(self.send_frames)
+
+    def as_dict(self) -> dict:
+        stats = self.send_stats
+        return {
+            "recv_bytes": self.recv_bytes,
+            "send_queue": self.send_queue,
+            "send_queue_max": stats["queue_max"],
+            "send_flushes": stats["flushes"],
+            "send_frames": stats["frames"],
+            "send_latency_ms": round(stats["latency"] * 1000, 1),
+            "send_latency_max_ms": round(stats["latency_max"] * 1000, 1),
+            "buffer": len(self.pub_buffer),
+            "buffer_dropped": stats["dropped"],
+            "buffer_replayed": stats["replayed"],
+        }
+
+    async def read(self) -> Optional[MQTTMessage]:
+        while not self.recv_messages:
+            raw = await self.reader.read(self.read_size)
+            if raw == b"":
+                # disconnected
+                return None
+
+            self.recv_bytes += len(raw)
+            self.recv_buffer += raw
+            self.read_frames()
+
+        return self.recv_messages.popleft()
+
+    def read_frames(self):
+        """Parse all complete frames from the receive buffer. Incomplete frame
+        stays in the buffer until next data.
+        """
+        buf = self.recv_buffer
+        size = len(buf)
+        pos = 0
+
+        view = memoryview(buf)
+        try:
+            while pos + 2 <= size:
+                # variable remaining length, up to 4 bytes
+                i = pos + 1
+                varlen = shift = 0
+                while i < size:
+                    b = buf[i]
+                    i += 1
+                    varlen |= (b & 0x7F) << shift
+                    if b < 0x80:
+                        break
+                    shift += 7
+                    if shift > 21:
+                        raise NotImplementedError
+                else:
+                    break  # length not fully received
+
+                end = i + varlen
+                if end > size:
+                    break  # payload not fully received
+
+                msg = RawMessage.read_header(buf[pos])
+                if msg.type == PUBLISH:
+                    if msg.qos > 0:
+                        raise NotImplementedError
+                    topic_end = i + 2 + (buf[i] << 8 | buf[i + 1])
+                    msg.topic = str(view[i + 2 : topic_end], "utf-8")
+                    msg.payload = bytes(view[topic_end:end])
+                elif msg.type not in (PINGRESP, SUBACK):
+                    raise NotImplementedError
+
+                self.recv_messages.append(msg)
+                pos = end
+        finally:
+            view.release()
+
+        del buf[:pos]
 
     async def close(self):
+        self.connected = False
+        if self.buffer_task:
+            self.buffer_task.cancel()
+            self.buffer_task = None
         if not self.writer:
             return
         try:
@@ -260,10 +440,27 @@ class MiniMQTT:
             _LOGGER.debug("Can't close connection")
 
     async def empty_buffer(self):
-        for args in self.pub_buffer:
-            await self.publish(*args)
+        """Replay buffered messages with rate limit, skip expired messages."""
+        buf = self.pub_buffer
+        stats = self.send_stats
+        batch = max(1, self.buffer_rate // 10)
+
+        while buf and self.connected:
+            expired = time.monotonic() - self.buffer_ttl
+            for _ in range(min(batch, len(buf))):
+                ts, topic, payload, retain = buf.popleft()
+                if ts < expired:
+                    stats["dropped"] += 1
+                    continue
+                await self._publish(topic, payload, retain)
+                stats["replayed"] += 1
+
+            self.send_flush()
+
+            if buf:
+                await asyncio.sleep(0.1)
 
-        self.pub_buffer.clear()
+        self.buffer_task = None
 
     def __aiter__(self):
         return self
@@ -273,7 +470,11 @@ class MiniMQTT:
 
         while True:
             try:
-                msg: MQTTMessage = await asyncio.wait_for(self.read(), self.keepalive)
+                if self.recv_messages:
+                    # burst of already received frames, without waiting for data
+                    msg = self.recv_messages.popleft()
+                else:
+                    msg = await asyncio.wait_for(self.read(), self.keepalive)
                 if msg is None:
                     raise StopAsyncIteration
 
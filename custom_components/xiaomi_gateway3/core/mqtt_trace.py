@@ -0,0 +1,97 @@
+"""
+Record and replay gateway MQTT traffic, for load tests without real gateway.
+
+Record (EVENT_MQTT_PUBLISH listener also enables subscription to all topics):
+
+```python
+recorder = MQTTRecorder("mqtt.trace")
+gw.add_event_listener(EVENT_MQTT_PUBLISH, recorder)
+```
+
+Replay with real speed (1) or max speed (0):
+
+```python
+await replay(gw.on_mqtt_message, read_trace("mqtt.trace"), speed=1)
+```
+
+File format: magic, then records: timestamp (double), topic length (uint16),
+payload length (uint32), topic, payload.
+"""
+
+import asyncio
+import struct
+import time
+from typing import Callable, Iterable, Iterator
+
+from .mini_mqtt import PUBLISH, MQTTMessage
+
+MAGIC = b"XGT1"
+HEADER = struct.Struct(">dHI")
+
+
+class MQTTRecorder:
+    def __init__(self, filename: str):
+        self.file = open(filename, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.count = 0
+
+    def __call__(self, msg: MQTTMessage):
+        self.write(time.time(), msg)
+
+    def write(self, ts: float, msg: MQTTMessage):
+        topic = msg.topic.encode()
+        header = HEADER.pack(ts, len(topic), len(msg.payload))
+        self.file.write(header + topic + msg.payload)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(filename: str) -> Iterator[tuple[float, MQTTMessage]]:
+    """Read all records from trace file. Incomplete last record is skipped."""
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    if data[:4] != MAGIC:
+        raise ValueError("Wrong MQTT trace file")
+
+    size = len(data)
+    pos = 4
+    while pos + HEADER.size <= size:
+        ts, topic_len, payload_len = HEADER.unpack_from(data, pos)
+        pos += HEADER.size
+        if pos + topic_len + payload_len > size:
+            break
+
+        msg = MQTTMessage()
+        msg.type = PUBLISH
+        msg.dup = msg.retain = False
+        msg.qos = 0
+        msg.topic = data[pos : pos + topic_len].decode()
+        pos += topic_len
+        msg.payload = data[pos : pos + payload_len]
+        pos += payload_len
+
+        yield ts, msg
+
+
+async def replay(
+    handler: Callable, records: Iterable[tuple[float, MQTTMessage]], speed: float = 0
+) -> int:
+    """Feed messages to handler with original timing (speed 1), faster (speed 2)
+    or without delays (speed 0). Returns number of messages.
+    """
+    count = 0
+    trace_ts = start_ts = None
+    for ts, msg in records:
+        if speed:
+            if trace_ts is None:
+                trace_ts, start_ts = ts, time.monotonic()
+            delay = (ts - trace_ts) / speed - (time.monotonic() - start_ts)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        handler(msg)
+        count += 1
+    return count
@@ -0,0 +1,133 @@
+"""
+Deadline queue for devices availability and poll checks. Instead of scanning all
+devices on each timer tick, device checked only when its nearest deadline comes.
+
+Deadline may only be moved to earlier time. If real deadline moves to later time
+(new keep alive or report), device just wakes up early, recalculates its next
+deadline and goes back to queue. So keep alive messages cost one dict lookup.
+
+Polls of powered devices go through per gateway queue with rate limits.
+"""
+
+import asyncio
+import heapq
+import random
+import time
+from typing import Hashable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .device import XDevice
+
+
+class ExpiryQueue:
+    def __init__(self):
+        self.heap: list[tuple[float, int, Hashable]] = []
+        self.deadlines: dict[Hashable, float] = {}
+        self.seq = 0  # items can't be compared, so heap sorted by deadline and seq
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.deadlines
+
+    def schedule(self, item: Hashable, deadline: float):
+        """Schedule item on deadline, if it earlier than current item deadline."""
+        if (current := self.deadlines.get(item)) is not None and current <= deadline:
+            return
+
+        self.deadlines[item] = deadline
+        self.seq += 1
+        heapq.heappush(self.heap, (deadline, self.seq, item))
+
+        # old entries of rescheduled items stay in heap until popped
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.compact()
+
+    def remove(self, item: Hashable):
+        self.deadlines.pop(item, None)
+
+    def pop_expired(self, ts: float, limit: int = None) -> list[Hashable]:
+        """Remove and return items with deadline less or equal to ts."""
+        items = []
+        heap = self.heap
+        while heap and heap[0][0] <= ts and len(items) != limit:
+            deadline, _, item = heapq.heappop(heap)
+            if self.deadlines.get(item) == deadline:
+                del self.deadlines[item]
+                items.append(item)
+        return items
+
+    def next_deadline(self) -> float | None:
+        while self.heap:
+            deadline, _, item = self.heap[0]
+            if self.deadlines.get(item) == deadline:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def compact(self):
+        self.heap = [i for i in self.heap if self.deadlines.get(i[2]) == i[0]]
+        heapq.heapify(self.heap)
+
+
+class PollQueue:
+    """Devices polls for one gateway. Polls are spread with random jitter and limited
+    by commands per second and by number of unfinished commands. So all powered
+    devices won't be polled at once after gateway reconnect.
+    """
+
+    def __init__(self, rate: float = 5, concurrency: int = 4, jitter: float = 30):
+        self.rate = rate  # commands per second
+        self.concurrency = concurrency
+        self.jitter = jitter  # seconds
+
+        self.queue = ExpiryQueue()
+        self.pending: set[asyncio.Task] = set()  # unfinished poll commands
+        self.tokens = max(rate, 1)
+        self.tokens_ts = 0
+
+        self.polled = 0
+        self.skipped = 0  # device reported while waited in queue
+        self.lag_max = 0
+
+    def add(self, device: "XDevice", ts: float):
+        if device not in self.queue:
+            self.queue.schedule(device, ts + random.uniform(0, self.jitter))
+
+    def process(self, ts: float):
+        # token bucket with max burst one second
+        self.tokens = min(
+            self.tokens + (ts - self.tokens_ts) * self.rate, max(self.rate, 1)
+        )
+        self.tokens_ts = ts
+
+        while self.tokens >= 1 and len(self.pending) < self.concurrency:
+            deadline = self.queue.next_deadline()
+            if deadline is None or deadline > ts:
+                break
+
+            device = self.queue.pop_expired(deadline, 1)[0]
+            if ts - device.last_report_ts <= device.poll_timeout:
+                self.skipped += 1
+                continue
+
+            if task := device.read():
+                self.pending.add(task)
+                task.add_done_callback(self.pending.discard)
+
+            self.tokens -= 1
+            self.polled += 1
+            self.lag_max = max(self.lag_max, ts - deadline)
+
+    def as_dict(self) -> dict:
+        deadline = self.queue.next_deadline()
+        lag = time.time() - deadline if deadline is not None else 0
+        return {
+            "queue": len(self.queue),
+            "pending": len(self.pending),
+            "polled": self.polled,
+            "skipped": self.skipped,
+            "lag": round(max(lag, 0), 1),
+            "lag_max": round(self.lag_max, 1),
+        }
@@ -1,13 +1,27 @@
 import asyncio
 import base64
+import gzip
+import hashlib
+import logging
+import time
+import zlib
 
 import aiohttp
 
+_LOGGER = logging.getLogger(__package__)
+
 
 class ShellBase:
+    xiaomi_did_files: str = None
+    db_bluetooth_file: str = None
+    startup_files: tuple[str, ...] = ()  # small files read on each gateway start
+    only_one_ok = False
+    gzip_ok: bool = None  # gateway support gzip transfer, unknown before first try
+
     def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         self.reader = reader
         self.writer = writer
+        self.prefetched: dict[str, bytes] = {}
 
     async def close(self):
         if not self.writer:
@@ -27,7 +41,67 @@ class ShellBase:
         raw = await asyncio.wait_for(coro, timeout=timeout)
         return raw[:-2] if as_bytes else raw[:-2].decode()
 
+    async def exec_pipeline(self, commands: list[str], window=3, timeout=10):
+        """Run many commands without output. Send next commands before previous
+        finished. Window should be small, because terminal input buffer is 4 KB.
+        """
+        for i, command in enumerate(commands):
+            if i >= window:
+                coro = self.reader.readuntil(b"# ")
+                await asyncio.wait_for(coro, timeout=timeout)
+            self.writer.write(command.encode() + b"\n")
+
+        for _ in range(min(window, len(commands))):
+            coro = self.reader.readuntil(b"# ")
+            await asyncio.wait_for(coro, timeout=timeout)
+
+    async def get_files_stat(self, *patterns: str) -> dict[str, str]:
+        """Get size, mtime and MD5 for many files (support masks) with one command.
+        Returns dict with filename and stat string. Missing files are skipped.
+        """
+        files = " ".join(i for i in patterns if i)
+        raw = await self.exec(
+            f"for f in {files}; do [ -f $f ] &&"
+            f' echo "$f $(stat -c "%s %Y" $f) $(md5sum $f)"; done',
+            timeout=30,
+        )
+        stat = {}
+        for line in raw.splitlines():
+            if " " in line:
+                name, value = line.split(" ", 1)
+                # md5sum output has filename, we don't need it twice
+                stat[name] = value.rsplit(" ", 1)[0].rstrip()
+        return stat
+
+    async def prefetch_files(self, *filenames: str):
+        """Read many files with one command. Next read_file calls for these files
+        return data from memory.
+        """
+        if self.gzip_ok is False:
+            return
+        ts = time.monotonic()
+        try:
+            files = await self.read_files_gzip(*filenames)
+        except Exception:
+            return
+        if files:
+            self.prefetched.update(files)
+            size = sum(len(i) for i in files.values())
+            log_transfer("prefetch_files", " ".join(files), size, ts)
+
     async def read_file(self, filename: str, as_base64=False, tail=None):
+        if tail is None and (raw := self.prefetched.pop(filename, None)) is not None:
+            return raw
+
+        if tail is None and self.gzip_ok is not False:
+            ts = time.monotonic()
+            # session closed on error, so pool will login again
+            raw = (await self.read_files_gzip(filename)).get(filename)
+            if raw is not None:
+                log_transfer("read_file", filename, len(raw), ts)
+                return raw
+            # no file or no gzip on gateway, so use old method
+
         command = f"tail -c {tail} {filename}" if tail else f"cat {filename}"
         if as_base64:
             command += " | base64"
@@ -35,23 +109,113 @@ class ShellBase:
             raw = await self.exec(command, as_bytes=True, timeout=60)
             # b"cat: can't open ..."
             return base64.b64decode(raw) if as_base64 else raw
-        except:
+        except Exception:
             return None
 
+    async def read_files_gzip(self, *filenames: str, timeout=60) -> dict[str, bytes]:
+        """Stream files as gzip+base64 lines and check MD5 of each result. Output
+        decoded chunk by chunk, so file size not limited by reader buffer.
+        Missing files and files with wrong MD5 are skipped. If no existing file
+        was decoded, gateway has no gzip and gzip_ok set to False.
+        """
+        command = (
+            f"for f in {' '.join(filenames)}; do [ -f $f ] &&"
+            f' echo "file=$f" && gzip -c $f | base64 && md5sum $f; done'
+        )
+        self.writer.write(command.encode() + b"\n")
+
+        files = {}
+        failed = 0  # existing files with wrong output
+        filename = None
+        unzip = data = None
+        buffer = b""
+        try:
+            while not buffer.endswith(b"# "):
+                coro = self.reader.read(0x10000)
+                chunk = await asyncio.wait_for(coro, timeout=timeout)
+                if not chunk:
+                    return {}  # connection closed
+
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                for line in lines:
+                    line = line.rstrip(b"\r")  # telnet sends CRLF line endings
+                    if line.startswith(b"file="):
+                        filename = line[5:].decode()
+                        unzip = zlib.decompressobj(wbits=31)  # gzip format
+                        data = bytearray()
+                    elif b" " in line:
+                        checksum = line.split(b" ", 1)[0].decode()
+                        if filename and checksum == hashlib.md5(data).hexdigest():
+                            files[filename] = bytes(data)
+                        elif filename:
+                            failed += 1
+                        filename = None
+                    elif filename:
+                        data += unzip.decompress(base64.b64decode(line))
+        except (ValueError, zlib.error):
+            # gzip or base64 output can't be decoded
+            self.gzip_ok = False
+            # output garbage may left in reader, so this session better be closed
+            self.writer.close()
+            raise
+        except asyncio.TimeoutError:
+            self.writer.close()
+            raise
+
+        if files:
+            self.gzip_ok = True
+        elif failed:
+            self.gzip_ok = False
+
+        return files
+
     async def write_file(self, filename: str, data: bytes):
+        ts = time.monotonic()
+
+        if self.gzip_ok is not False:
+            tmp = filename + ".b64"
+            raw = base64.b64encode(gzip.compress(data)).decode()
+
+            # start new file
+            await self.exec(f"> {tmp}")
+
+            size = 900  # total exec cmd should be lower than 1024 symbols
+            await self.exec_pipeline(
+                [
+                    f"echo -n {raw[i : i + size]} >> {tmp}"
+                    for i in range(0, len(raw), size)
+                ]
+            )
+
+            cmd = f"base64 -d {tmp}|gzip -dc > {filename}; rm {tmp}; md5sum {filename}"
+            if hashlib.md5(data).hexdigest() in await self.exec(cmd, timeout=60):
+                self.gzip_ok = True
+                log_transfer("write_file", filename, len(data), ts)
+                return
+            self.gzip_ok = False
+
         # start new file
         await self.exec(f"> {filename}")
 
         size = 700  # total exec cmd should be lower than 1024 symbols
-        for i in range(0, len(data), size):
-            b = base64.b64encode(data[i : i + size]).decode()
-            await self.exec(f"echo -n {b} | base64 -d >> {filename}")
+        await self.exec_pipeline(
+            [
+                f"echo -n {base64.b64encode(data[i : i + size]).decode()}"
+                f" | base64 -d >> {filename}"
+                for i in range(0, len(data), size)
+            ]
+        )
+        log_transfer("write_file", filename, len(data), ts)
 
     async def only_one(self) -> bool:
+        # pooled session may already run our dummy shell
+        if self.only_one_ok:
+            return True
         # run shell with dummy option, so we can check if second Hass connected
         # shell will close automatically when disconnected from telnet
         raw = await self.exec("(ps|grep -v grep|grep -q 'sh +o') || sh +o")
-        return "set -o errexit" in raw
+        self.only_one_ok = "set -o errexit" in raw
+        return self.only_one_ok
 
     async def get_running_ps(self) -> str:
         return await self.exec("ps")
@@ -73,3 +237,11 @@ class ShellBase:
         async with aiohttp.ClientSession(timeout=timeout) as session:
             async with session.get(url_or_path) as resp:
                 return await resp.read()
+
+
+def log_transfer(action: str, filename: str, size: int, ts: float):
+    if not _LOGGER.isEnabledFor(logging.DEBUG):
+        return
+    dt = time.monotonic() - ts
+    speed = size / dt / 1024 if dt else 0
+    _LOGGER.debug(f"{action} {filename}: {size} bytes in {dt:.2f}s ({speed:.0f} KB/s)")
@@ -43,3 +43,107 @@ class Session:
         await shell.prepare()
 
         return shell
+
+
+class SessionPool:
+    """One logged in telnet session per host, shared between all callers. Commands
+    from different callers are serialized. Session closes after idle timeout.
+
+    ```python
+    async with SessionPool.get(host) as sh:
+        await sh.exec("ps")
+    ```
+    """
+
+    pools: dict[str, "SessionPool"] = {}  # key is host
+
+    session: Session | None = None
+    shell: ShellMGW | ShellE1 | ShellMGW2 | None = None
+    idle_handle: asyncio.TimerHandle | None = None
+
+    def __init__(self, host: str, port: int = 23, idle_timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get(cls, host: str) -> "SessionPool":
+        if host not in cls.pools:
+            cls.pools[host] = cls(host)
+        return cls.pools[host]
+
+    async def __aenter__(self) -> ShellMGW | ShellE1 | ShellMGW2:
+        await self.lock.acquire()
+        try:
+            if self.idle_handle:
+                self.idle_handle.cancel()
+                self.idle_handle = None
+
+            if self.shell and await self.check():
+                self.hits += 1
+                return self.shell
+
+            await self.close()
+            self.misses += 1
+            self.session = Session(self.host, self.port)
+            await self.session.connect()
+            self.shell = await self.session.login()
+            return self.shell
+        except BaseException:
+            await self.close()
+            self.lock.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is not None:
+                # session state unknown after error, so better login again
+                await self.close()
+            elif self.session:
+                loop = asyncio.get_event_loop()
+                self.idle_handle = loop.call_later(self.idle_timeout, self.on_idle)
+        finally:
+            self.lock.release()
+
+    async def check(self) -> bool:
+        """Check that session alive and has no garbage from previous commands."""
+        if self.session.writer.is_closing():
+            return False
+        try:
+            raw = await self.shell.exec("echo pool_check", timeout=2)
+            return raw.strip() == "pool_check"
+        except Exception:
+            return False
+
+    def on_idle(self):
+        self.idle_handle = None
+        asyncio.create_task(self.close_idle())
+
+    async def close_idle(self):
+        # skip if session borrowed again after idle timeout
+        if self.idle_handle or self.lock.locked():
+            return
+        async with self.lock:
+            await self.close()
+
+    async def close(self):
+        if self.idle_handle:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+        if not self.session:
+            return
+        session, self.session, self.shell = self.session, None, None
+        try:
+            await session.close()
+        except Exception:
+            pass
+
+    def as_dict(self) -> dict:
+        return {
+            "connected": self.session is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -6,6 +6,8 @@ from .const import OPENMIIO_CMD, OPENMIIO_MD5_ARM, OPENMIIO_URL_ARM
 
 
 class ShellE1(ShellBase):
+    xiaomi_did_files = "/data/mha_master/*.json"
+
     async def login(self):
         self.writer.write(b"root\n")
         await asyncio.sleep(0.1)
@@ -44,7 +46,7 @@ class ShellE1(ShellBase):
         }
 
     async def read_xiaomi_did(self) -> dict[str, str]:
-        raw = await self.exec("cat /data/mha_master/*.json|grep xiaomi_did")
+        raw = await self.exec(f"cat {self.xiaomi_did_files}|grep xiaomi_did")
         m = re.findall(r"(lumi.[a-f0-9]+).+(\d{9,})", raw)
         return dict(m)
 
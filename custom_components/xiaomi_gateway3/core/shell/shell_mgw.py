@@ -14,6 +14,14 @@ BUSYBOX_MD5 = "099137899ece96f311ac5ab554ea6fec"
 
 
 class ShellMGW(ShellBase):
+    xiaomi_did_files = "/data/zigbee_gw/*.json"
+    db_bluetooth_file = "/data/miio/mible_local.db"
+    startup_files = (
+        "/data/miio/device.conf",
+        "/data/miio/device.token",
+        "/etc/rootfs_fw_info",
+    )
+
     async def login(self):
         self.writer.write(b"admin\n")
         raw = await asyncio.wait_for(self.reader.readuntil(b"\r\n# "), 3)
@@ -58,12 +66,12 @@ class ShellMGW(ShellBase):
 
     async def read_db_bluetooth(self) -> SQLite:
         if not self.db:
-            raw = await self.read_file("/data/miio/mible_local.db", as_base64=True)
+            raw = await self.read_file(self.db_bluetooth_file, as_base64=True)
             self.db = SQLite(raw)
         return self.db
 
     async def read_xiaomi_did(self) -> dict[str, str]:
-        raw = await self.exec("cat /data/zigbee_gw/*.json|grep xiaomi_did")
+        raw = await self.exec(f"cat {self.xiaomi_did_files}|grep xiaomi_did")
         m = re.findall(r"(lumi.[a-f0-9]+).+(\d{9,})", raw)
         return dict(m)
 
@@ -3,13 +3,12 @@ from ..unqlite import SQLite
 
 
 class ShellMGW2(ShellE1):
+    db_bluetooth_file = "/data/local/miio_bt/mible_local.db"
     db: SQLite = None
 
     async def read_db_bluetooth(self) -> SQLite:
         if not self.db:
-            raw = await self.read_file(
-                "/data/local/miio_bt/mible_local.db", as_base64=True
-            )
+            raw = await self.read_file(self.db_bluetooth_file, as_base64=True)
             self.db = SQLite(raw)
         return self.db
 
@@ -0,0 +1,94 @@
+"""
+Optional sampled timing of hot paths: event listeners, device listeners and MQTT
+topic handlers. Disabled by default. All calls are counted, but only each N-th call
+is measured, so overhead stays tiny.
+
+Enable with Integration config (GUI): Configure > Debug > Timing stats
+"""
+
+import time
+from collections import deque
+from typing import Callable
+
+
+class TimingStat:
+    __slots__ = ("count", "sampled", "total", "samples")
+
+    def __init__(self, size: int):
+        self.count = 0
+        self.sampled = 0
+        self.total = 0.0
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, dt: float):
+        self.sampled += 1
+        self.total += dt
+        self.samples.append(dt)
+
+    def as_dict(self) -> dict:
+        samples = sorted(self.samples)
+        size = len(samples)
+        return {
+            "count": self.count,
+            # estimated total time for all calls
+            "total_ms": round(self.total / self.sampled * self.count * 1000, 3),
+            "p50_ms": round(samples[size // 2] * 1000, 3),
+            "p99_ms": round(samples[min(size - 1, size * 99 // 100)] * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+
+
+class Timing:
+    enabled: bool = False
+
+    def __init__(self, sample: int = 16, size: int = 512):
+        self.sample = sample
+        self.size = size
+        self.stats: dict[str, TimingStat] = {}
+        # gateways with enabled timing, shared stats are cleared when last one stops
+        self.owners: set = set()
+
+    def enable(self, owner):
+        self.owners.add(owner)
+        self.enabled = True
+
+    def disable(self, owner):
+        if owner not in self.owners:
+            return
+        self.owners.remove(owner)
+        if not self.owners:
+            self.enabled = False
+            self.clear()
+
+    def call(self, key: str, handler: Callable, *args, **kwargs):
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = TimingStat(self.size)
+
+        stat.count += 1
+        # first call always measured, so each stat has at least one sample
+        if self.sample > 1 and stat.count % self.sample != 1:
+            return handler(*args, **kwargs)
+
+        ts = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            stat.add(time.perf_counter() - ts)
+
+    def clear(self):
+        self.stats.clear()
+
+    def as_dict(self, limit: int = None) -> dict:
+        """Stats sorted by total time, from the slowest."""
+        items = [(k, v.as_dict()) for k, v in self.stats.items()]
+        items.sort(key=lambda i: i[1]["total_ms"], reverse=True)
+        return dict(items[:limit])
+
+
+def handler_name(handler: Callable) -> str:
+    return getattr(handler, "__qualname__", None) or type(handler).__name__
+
+
+# shared for all gateways and devices
+TIMING = Timing()
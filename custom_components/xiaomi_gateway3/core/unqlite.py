@@ -2,204 +2,400 @@
 python sqlite3 library can't read DB from memory.
 """
 
+import re
+import struct
+from functools import cached_property
+from typing import Iterable, Iterator
+
 
-# noinspection PyUnusedLocal
 class Unqlite:
-    page_size = 0
-    pos = 0
+    """Reader for Unqlite linear hash KV store. Keys can be iterated without
+    decoding values, and one key can be found by its hash bucket without reading
+    other pages.
+
+    Docs: https://github.com/symisc/unqlite/blob/master/src/lhash_kv.c
+    """
 
     def __init__(self, raw: bytes):
+        assert raw[:7] == b"unqlite", "Wrong file signature"
+        assert raw[7:11] == b"\xdb\x7c\x27\x12", "Wrong DB magic"
+        # creation time (4 bytes) and sector size (4 bytes) are skipped
         self.raw = raw
-        self.read_db_header()
+        self.page_size = int.from_bytes(raw[19:23], "big")
+        assert raw[23:29] == b"\x00\x04hash", "Unsupported hash"
+
+        self.split_bucket = 0
+        self.max_split_bucket = 0
 
     @property
     def size(self):
         return len(self.raw)
 
-    def read(self, length: int):
-        self.pos += length
-        return self.raw[self.pos - length : self.pos]
-
-    def read_int(self, length: int):
-        return int.from_bytes(self.read(length), "big")
-
-    def read_db_header(self):
-        assert self.read(7) == b"unqlite", "Wrong file signature"
-        assert self.read(4) == b"\xDB\x7C\x27\x12", "Wrong DB magic"
-        creation_time = self.read_int(4)
-        sector_size = self.read_int(4)
-        self.page_size = self.read_int(4)
-        assert self.read(6) == b"\x00\x04hash", "Unsupported hash"
-
-    # def read_header2(self):
-    #     self.pos = self.page_size
-    #     magic_numb = self.read(4)
-    #     hash_func = self.read(4)
-    #     free_pages = self.read_int(8)
-    #     split_bucket = self.read_int(8)
-    #     max_split_bucket = self.read_int(8)
-    #     next_page = self.read_int(8)
-    #     num_rect = self.read_int(4)
-    #     for _ in range(num_rect):
-    #         logic_page = self.read_int(8)
-    #         real_page = self.read_int(8)
-
-    def read_cell(self):
-        key_hash = self.read(4)
-        key_len = self.read_int(4)
-        data_len = self.read_int(8)
-        next_offset = self.read_int(2)
-        overflow_page = self.read_int(8)
+    @cached_property
+    def buckets(self) -> dict[int, int] | None:
+        """Map of logical bucket number to real page number. None if DB uses
+        unknown hash function.
+        """
+        raw = self.raw
+        pos = self.page_size
+        if (
+            raw[pos : pos + 4] != b"\xfa\x78\x2d\xcb"
+            or int.from_bytes(raw[pos + 4 : pos + 8], "big") != LHASH_CHECK
+        ):
+            return None
+
+        # free pages list (8 bytes) is skipped
+        self.split_bucket = int.from_bytes(raw[pos + 16 : pos + 24], "big")
+        self.max_split_bucket = int.from_bytes(raw[pos + 24 : pos + 32], "big")
+
+        buckets = {}
+        pos += 32
+        # map can continue on next pages
+        while True:
+            next_page = int.from_bytes(raw[pos : pos + 8], "big")
+            records_num = int.from_bytes(raw[pos + 8 : pos + 12], "big")
+            for i in range(pos + 12, pos + 12 + 16 * records_num, 16):
+                logic_page = int.from_bytes(raw[i : i + 8], "big")
+                buckets[logic_page] = int.from_bytes(raw[i + 8 : i + 16], "big")
+            if not next_page:
+                return buckets
+            pos = next_page * self.page_size
+
+    def iter_pages(self) -> Iterator[int]:
+        """Yield offsets of all pages with cells."""
+        if self.buckets is None:
+            # data page without cells has zero first cell offset
+            yield from range(2 * self.page_size, self.size, self.page_size)
+            return
+
+        for page_num in sorted(self.buckets.values()):
+            yield from self.iter_slave_pages(page_num)
+
+    def iter_slave_pages(self, page_num: int) -> Iterator[int]:
+        """Yield offsets of bucket page and its slave pages."""
+        while page_num:
+            page_offset = page_num * self.page_size
+            yield page_offset
+            # first cell offset (2 bytes), first free block offset (2 bytes)
+            page_num = int.from_bytes(
+                self.raw[page_offset + 4 : page_offset + 12], "big"
+            )
+
+    def iter_cells(self, page_offset: int) -> Iterator[int]:
+        """Yield positions of all cells on page."""
+        raw = self.raw
+        next_offset = raw[page_offset] << 8 | raw[page_offset + 1]
+        while next_offset:
+            pos = page_offset + next_offset
+            yield pos
+            next_offset = raw[pos + 16] << 8 | raw[pos + 17]
+
+    def read_cell(self, pos: int, with_value: bool = True) -> tuple[bytes, bytes]:
+        """Cell: key hash (4 bytes), key length (4 bytes), value length (8 bytes),
+        next cell offset (2 bytes), overflow page (8 bytes), key, value.
+        """
+        raw = self.raw
+        key_len = int.from_bytes(raw[pos + 4 : pos + 8], "big")
+        data_len = int.from_bytes(raw[pos + 8 : pos + 16], "big")
+        overflow_page = int.from_bytes(raw[pos + 18 : pos + 26], "big")
         if overflow_page:
-            self.pos = overflow_page * 0x1000 + 8
-            data_page = self.read_int(8)
-            data_offset = self.read_int(2)
-            name = self.read(key_len)
-            self.pos = data_page * 0x1000 + data_offset
-            value = self.read(data_len)
-        else:
-            name = self.read(key_len)
-            value = self.read(data_len)
-        return name, value, next_offset
+            # key and link to value on overflow page
+            pos = overflow_page * self.page_size + 8
+            data_page = int.from_bytes(raw[pos : pos + 8], "big")
+            data_offset = int.from_bytes(raw[pos + 8 : pos + 10], "big")
+            key = raw[pos + 10 : pos + 10 + key_len]
+            if not with_value:
+                return key, b""
+            return key, self.read_overflow(data_page, data_offset, data_len)
+
+        pos += 26
+        key = raw[pos : pos + key_len]
+        if not with_value:
+            return key, b""
+        return key, raw[pos + key_len : pos + key_len + data_len]
+
+    def read_overflow(self, page_num: int, offset: int, length: int) -> bytes:
+        """Read value from chain of overflow pages. Each page starts with next
+        page number (8 bytes).
+        """
+        raw = self.raw
+        chunks = []
+        while page_num and length > 0:
+            pos = page_num * self.page_size
+            chunk = raw[pos + offset : pos + min(self.page_size, offset + length)]
+            chunks.append(chunk)
+            length -= len(chunk)
+            page_num = int.from_bytes(raw[pos : pos + 8], "big")
+            offset = 8
+        return b"".join(chunks)
+
+    def keys(self) -> Iterator[str]:
+        for page_offset in self.iter_pages():
+            for pos in self.iter_cells(page_offset):
+                key, _ = self.read_cell(pos, with_value=False)
+                # data sometimes corrupted: b'lumi.158d0004\xb4f9abb.prop'
+                yield key.decode(errors="replace")
+
+    def items(self, prefix: str = None) -> Iterator[tuple[str, str]]:
+        """Iterate keys and values. Values decoded only for keys with prefix."""
+        prefix = prefix.encode() if prefix else None
+        for page_offset in self.iter_pages():
+            for pos in self.iter_cells(page_offset):
+                key, _ = self.read_cell(pos, with_value=False)
+                if prefix and not key.startswith(prefix):
+                    continue
+                key, value = self.read_cell(pos)
+                yield key.decode(errors="replace"), value.decode(errors="replace")
+
+    def get(self, key: str) -> str | None:
+        """Read one key from its hash bucket pages."""
+        if self.buckets is None:
+            return next((v for k, v in self.items(key) if k == key), None)
+
+        raw = self.raw
+        key = key.encode()
+        key_hash = lhash(key)
+
+        bucket = key_hash & (self.max_split_bucket - 1)
+        if bucket < self.split_bucket:
+            bucket = key_hash & (self.max_split_bucket * 2 - 1)
+        if not (page_num := self.buckets.get(bucket)):
+            return None
+
+        for page_offset in self.iter_slave_pages(page_num):
+            for pos in self.iter_cells(page_offset):
+                if int.from_bytes(raw[pos : pos + 4], "big") != key_hash:
+                    continue
+                k, v = self.read_cell(pos)
+                if k == key:
+                    return v.decode(errors="replace")
+
+        return None
 
     def read_all(self) -> dict:
-        result = {}
-
-        page_offset = 2 * self.page_size
-        while page_offset < self.size:
-            self.pos = page_offset
-            next_offset = self.read_int(2)
-            while next_offset:
-                self.pos = page_offset + next_offset
-                k, v, next_offset = self.read_cell()
-                # data sometimes corrupted: b'lumi.158d0004\xb4f9abb.prop'
-                result[k.decode(errors="replace")] = v.decode(errors="replace")
-            page_offset += self.page_size
+        return dict(self.items())
 
-        return result
+
+def lhash(key: bytes) -> int:
+    """DJB hash, default for Unqlite."""
+    h = 5381
+    for i in key:
+        h = (h * 33 + i) & 0xFFFFFFFF
+    return h
+
+
+# hash function check from DB header
+LHASH_CHECK = lhash(b"chm@symisc")
 
 
-# noinspection PyUnusedLocal
 class SQLite:
-    page_size = 0
-    pos = 0
+    """Lazy reader: pages parsed only when table rows are iterated, and only
+    requested columns are decoded. Only cell payload is copied from raw data,
+    because bytes indexing much faster than memoryview.
+
+    Docs: https://www.sqlite.org/fileformat.html
+    """
 
     def __init__(self, raw: bytes):
+        assert raw[:16] == b"SQLite format 3\0", "Wrong file signature"
         self.raw = raw
-        self.read_db_header()
-        self.tables = self.read_page(0)
+        # value 1 means 65536
+        self.page_size = (
+            int.from_bytes(raw[16:18], "big") if raw[16:18] != b"\0\1" else 65536
+        )
+        self.usable_size = self.page_size - raw[20]  # minus reserved bytes
+        # max payload size stored in leaf cell of table B-tree
+        self.max_local = self.usable_size - 35
+        self.min_local = (self.usable_size - 12) * 32 // 255 - 23
 
     @property
     def size(self):
         return len(self.raw)
 
-    def read(self, length: int):
-        self.pos += length
-        return self.raw[self.pos - length : self.pos]
-
-    def read_int(self, length: int):
-        return int.from_bytes(self.read(length), "big")
-
-    def read_varint(self):
-        result = 0
-        while True:
-            i = self.read_int(1)
-            result += i & 0x7F
-            if i < 0x80:
-                break
-            result <<= 7
-
-        return result
-
-    def read_db_header(self):
-        assert self.read(16) == b"SQLite format 3\0", "Wrong file signature"
-        self.page_size = self.read_int(2)
-
-    def read_page(self, page_num: int):
-        self.pos = 100 if page_num == 0 else self.page_size * page_num
-
-        # B-tree Page Header Format
-        page_type = self.read(1)
-
-        if page_type == b"\x0D":
-            return self._read_leaf_table(page_num)
-        elif page_type == b"\x05":
-            return self._read_interior_table(page_num)
+    @cached_property
+    def tables(self) -> list[list]:
+        """Rows of sqlite_schema table: type, name, tbl_name, rootpage, sql."""
+        return list(self.iter_rows(1))
+
+    def iter_table(self, name: str, columns: Iterable[int] = None) -> Iterator[list]:
+        """Iterate table rows. Optional columns - list of column indexes."""
+        table = next(t for t in self.tables if t[0] == "table" and t[1] == name)
+        return self.iter_rows(table[3], columns, rowid_column(table[4]))
+
+    def read_table(self, name: str, columns: Iterable[int] = None) -> list[list]:
+        return list(self.iter_table(name, columns))
+
+    def iter_rows(
+        self, page_num: int, columns: Iterable[int] = None, rowid_col: int = None
+    ) -> Iterator[list]:
+        columns = tuple(columns) if columns is not None else None
+        for pos in self.iter_cells(page_num):
+            yield self.read_row(pos, columns, rowid_col)
+
+    def iter_cells(self, page_num: int) -> Iterator[int]:
+        """Yield positions of all leaf cells of table B-tree in rowid order."""
+        raw = self.raw
+        page_pos = (page_num - 1) * self.page_size
+        pos = page_pos + 100 if page_num == 1 else page_pos  # skip DB header
+
+        page_type = raw[pos]
+        cells_num = int.from_bytes(raw[pos + 3 : pos + 5], "big")
+        if page_type == 0x0D:
+            pos += 8
+            for i in range(pos, pos + 2 * cells_num, 2):
+                yield page_pos + (raw[i] << 8 | raw[i + 1])
+        elif page_type == 0x05:
+            last_page_num = int.from_bytes(raw[pos + 8 : pos + 12], "big")
+            pos += 12
+            for i in range(pos, pos + 2 * cells_num, 2):
+                cell_pos = page_pos + (raw[i] << 8 | raw[i + 1])
+                child_page_num = int.from_bytes(raw[cell_pos : cell_pos + 4], "big")
+                yield from self.iter_cells(child_page_num)
+            yield from self.iter_cells(last_page_num)
+        else:
+            raise NotImplementedError(f"Unsupported page type: {page_type}")
+
+    def read_row(
+        self, pos: int, columns: tuple[int, ...] = None, rowid_col: int = None
+    ) -> list:
+        """Read row from leaf cell. Optional rowid_col - index of INTEGER PRIMARY
+        KEY column, it stored as NULL and real value is rowid.
+        """
+        payload_len, pos = read_varint(self.raw, pos)
+        rowid, pos = read_varint(self.raw, pos)
+
+        if payload_len <= self.max_local:
+            payload = self.raw[pos : pos + payload_len]
         else:
-            raise NotImplemented
-
-    def _read_leaf_table(self, page_num: int):
-        first_block = self.read_int(2)
-        cells_num = self.read_int(2)
-        cells_pos = self.read_int(2)
-        fragmented_free_bytes = self.read_int(1)
-
-        cells_pos = [self.read_int(2) for _ in range(cells_num)]
-        rows = []
-
-        for cell_pos in cells_pos:
-            self.pos = self.page_size * page_num + cell_pos
-
-            payload_len = self.read_varint()
-            rowid = self.read_varint()
-
-            columns_type = []
-
-            payload_pos = self.pos
-            header_size = self.read_varint()
-            while self.pos < payload_pos + header_size:
-                column_type = self.read_varint()
-                columns_type.append(column_type)
-
-            cells = []
-
-            for column_type in columns_type:
-                if column_type == 0:
-                    data = rowid
-                elif 1 <= column_type <= 4:
-                    data = self.read_int(column_type)
-                elif column_type == 5:
-                    data = self.read_int(6)
-                elif column_type == 6:
-                    data = self.read_int(8)
-                elif column_type == 7:
-                    # TODO: float
-                    data = self.read(8)
-                elif column_type == 8:
-                    data = 0
-                elif column_type == 9:
-                    data = 1
-                elif column_type >= 12 and column_type % 2 == 0:
-                    length = int((column_type - 12) / 2)
-                    data = self.read(length)
+            payload = self.read_overflow(pos, payload_len)
+
+        # record header: header size and serial types of columns, columns after
+        # the last requested one are skipped
+        header_size, pos = read_varint(payload, 0)
+        last = max(columns, default=-1) + 1 if columns is not None else header_size
+        offsets = []
+        types = []
+        offset = header_size
+        while pos < header_size and len(types) < last:
+            column_type = payload[pos]
+            if column_type < 0x80:
+                pos += 1
+            else:
+                column_type, pos = read_varint(payload, pos)
+            offsets.append(offset)
+            types.append(column_type)
+            if column_type >= 12:
+                offset += (column_type - 12) >> 1
+            else:
+                offset += COLUMN_SIZES[column_type]
+
+        if columns is None:
+            columns = range(len(types))
+
+        row = []
+        for i in columns:
+            if i >= len(types):
+                # column added by ALTER TABLE after row was written
+                row.append(None)
+                continue
+
+            column_type = types[i]
+            offset = offsets[i]
+            if column_type >= 12:
+                size = (column_type - 12) >> 1
+                if column_type & 1:
+                    data = payload[offset : offset + size].decode()
                 else:
-                    length = int((column_type - 13) / 2)
-                    data = self.read(length).decode()
-
-                cells.append(data)
-
-            rows.append(cells)
-
-        return rows
-
-    def _read_interior_table(self, page_num: int):
-        first_block = self.read_int(2)
-        cells_num = self.read_int(2)
-        cells_pos = self.read_int(2)
-        fragmented_free_bytes = self.read_int(1)
-        last_page_num = self.read_int(4)
-
-        cells_pos = [self.read_int(2) for _ in range(cells_num)]
-        rows = []
-
-        for cell_pos in cells_pos:
-            self.pos = self.page_size * page_num + cell_pos
-            child_page_num = self.read_int(4)
-            rowid = self.read_varint()
-            rows += self.read_page(child_page_num - 1)
-
-        return rows + self.read_page(last_page_num - 1)
-
-    def read_table(self, name: str):
-        page = next(t[3] - 1 for t in self.tables if t[1] == name)
-        return self.read_page(page)
+                    data = payload[offset : offset + size]
+            elif column_type == 0:
+                data = rowid if i == rowid_col else None
+            elif column_type == 1:
+                data = payload[offset]
+                if data >= 0x80:
+                    data -= 0x100
+            elif column_type <= 6:
+                size = COLUMN_SIZES[column_type]
+                data = int.from_bytes(
+                    payload[offset : offset + size], "big", signed=True
+                )
+            elif column_type == 7:
+                data = FLOAT.unpack_from(payload, offset)[0]
+            else:
+                data = column_type - 8  # 8 - is zero, 9 - is one
+            row.append(data)
+
+        return row
+
+    def read_overflow(self, pos: int, payload_len: int) -> bytes:
+        """Collect payload from cell and from chain of overflow pages."""
+        raw = self.raw
+        local = self.min_local + (payload_len - self.min_local) % (self.usable_size - 4)
+        if local > self.max_local:
+            local = self.min_local
+
+        chunks = [raw[pos : pos + local]]
+        size = local
+        page_num = int.from_bytes(raw[pos + local : pos + local + 4], "big")
+        while page_num and size < payload_len:
+            # overflow page: next page number and content
+            pos = (page_num - 1) * self.page_size
+            page_num = int.from_bytes(raw[pos : pos + 4], "big")
+            chunk = raw[pos + 4 : pos + min(self.usable_size, 4 + payload_len - size)]
+            chunks.append(chunk)
+            size += len(chunk)
+
+        return b"".join(chunks)
+
+
+FLOAT = struct.Struct(">d")
+# serial type to column size in bytes, for types less than 12
+COLUMN_SIZES = (0, 1, 2, 3, 4, 6, 8, 8, 0, 0, 0, 0)
+# column definitions separated by commas outside of brackets
+RE_COLUMNS = re.compile(r"((?:[^,(]|\([^)]*\))+)")
+
+
+def read_varint(raw: bytes, pos: int) -> tuple[int, int]:
+    """Return varint value and position after it."""
+    i = raw[pos]
+    if i < 0x80:
+        return i, pos + 1
+
+    result = i & 0x7F
+    for pos in range(pos + 1, pos + 8):
+        i = raw[pos]
+        result = (result << 7) | (i & 0x7F)
+        if i < 0x80:
+            return result, pos + 1
+
+    # ninth byte uses all 8 bits
+    return (result << 8) | raw[pos + 1], pos + 2
+
+
+def rowid_column(sql: str) -> int | None:
+    """Return index of column which is alias for rowid, from CREATE TABLE sql.
+    Only column with type INTEGER PRIMARY KEY is an alias.
+    """
+    if not sql or "(" not in sql:
+        return None
+
+    sql = sql[sql.index("(") + 1 : sql.rindex(")")]
+    names = []
+    types = []
+    for column in RE_COLUMNS.findall(sql):
+        words = column.replace("(", " ( ").split()
+        if not words:
+            continue
+        if words[0].upper() in ("CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK", "FOREIGN"):
+            # table constraint: PRIMARY KEY (column)
+            m = re.search(r"PRIMARY\s+KEY\s*\(\s*([^\s,)]+)\s*\)", column, re.I)
+            if m:
+                name = m[1].strip("\"'`[]").lower()
+                if name in names and types[names.index(name)] == "INTEGER":
+                    return names.index(name)
+            continue
+        names.append(words[0].strip("\"'`[]").lower())
+        types.append(words[1].upper() if len(words) > 1 else "")
+        if types[-1] == "INTEGER" and re.search(r"\sPRIMARY\s+KEY\b", column, re.I):
+            return len(names) - 1
+
+    return None
@@ -3,7 +3,11 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceEntry
 
 from .core.const import DOMAIN, source_hash
+from .core.converters import silabs
 from .core.gate.base import XGateway
+from .core.gate.silabs import SilabsGateway
+from .core.shell.session import SessionPool
+from .core.timing import TIMING
 
 
 async def async_get_config_entry_diagnostics(
@@ -16,6 +20,20 @@ async def async_get_config_entry_diagnostics(
 
     info = await get_info(hass, config_entry)
     info["devices"] = devices
+
+    gw = hass.data[DOMAIN].get(config_entry.entry_id)
+    if isinstance(gw, XGateway):
+        info["mqtt"] = gw.mqtt.as_dict()
+        info["poll"] = gw.poll_queue.as_dict()
+        if pool := SessionPool.pools.get(gw.host):
+            info["telnet"] = pool.as_dict()
+    if isinstance(gw, SilabsGateway):
+        info["zigbee_send"] = gw.silabs_batch.as_dict()
+        info["zigbee_decode_cache"] = silabs.decode_stats()
+
+    if TIMING.enabled:
+        info["timing"] = TIMING.as_dict()
+
     return info
 
 
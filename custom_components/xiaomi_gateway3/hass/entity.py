@@ -68,7 +68,7 @@ class XEntity(Entity):
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, device.uid)},
             connections=connections,
-            manufacturer=device.extra.get("market_brand"),
+            manufacturer=device.market_brand,
             name=device.human_name,
             model=device.human_model,
             sw_version=sw_version,
@@ -1,4 +1,5 @@
 import logging
+import time
 from urllib.parse import urlencode
 
 import yaml
@@ -18,11 +19,13 @@ from homeassistant.helpers.storage import Store
 from .. import XDevice
 from ..core import core_utils
 from ..core.const import DOMAIN, SUPPORTED_MODELS, ZIGBEE
-from ..core.gate.base import XGateway
+from ..core.gate.base import EVENT_INVENTORY, EVENT_STALE_DEVICE, XGateway
 from ..core.xiaomi_cloud import MiCloud
 
 _LOGGER = logging.getLogger(__package__)
 
+STORE_DEVICE_TTL = 30 * 24 * 3600  # 30 days
+
 
 def fix_yaml_devices_config(value: dict):
     for uid, config in list(value.items()):
@@ -40,22 +43,14 @@ async def store_devices(hass: HomeAssistant):
     if data := await store.async_load():
         XDevice.restore = data
 
-    async def dump_state(*args):
-        if not XDevice.restore:
-            return
-
-        # update last_decode_ts for all devices in the store
-        for device in XGateway.devices.values():
-            store_device = XDevice.restore.setdefault(device.cloud_did, {})
-            store_device["uid"] = device.uid
-            if device.last_report_ts:
-                store_device["last_report_ts"] = device.last_report_ts
-            if device.last_seen:
-                store_device["last_seen"] = {
-                    gw.uid: last_seen for gw, last_seen in device.last_seen.items()
-                }
+    saved = False
 
-        await store.async_save(XDevice.restore)
+    async def dump_state(*args):
+        nonlocal saved
+        # first dump also saves cloud info and migrations after Hass start
+        if dump_devices_store(int(time.time())) or not saved:
+            await store.async_save(XDevice.restore)
+            saved = True
 
     # Dump states periodically
     cancel_interval = async_track_time_interval(hass, dump_state, STATE_DUMP_INTERVAL)
@@ -67,6 +62,81 @@ async def store_devices(hass: HomeAssistant):
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop)
 
 
+def dump_devices_store(ts: int) -> bool:
+    """Update store only for devices with new last_seen or last_report_ts and
+    remove old devices. Returns True if store changed.
+    """
+    changed = False
+
+    dirty, XDevice.dirty = XDevice.dirty, set()
+    for device in dirty:
+        store_device = XDevice.restore.setdefault(device.cloud_did, {})
+        # seconds are enough and shorter in JSON, None - remove old value
+        data = {
+            "uid": device.uid,
+            "last_report_ts": (
+                int(device.last_report_ts) if device.last_report_ts else None
+            ),
+            "last_seen": {
+                gw.uid: int(last_seen) for gw, last_seen in device.last_seen.items()
+            }
+            or None,
+        }
+        for k, v in data.items():
+            if store_device.get(k) == v:
+                continue
+            if v is not None:
+                store_device[k] = v
+            else:
+                store_device.pop(k)
+            changed = True
+
+    # remove devices, not seen for a long time and not loaded by any gateway,
+    # devices without timestamps (only cloud info) are kept
+    devices = {i.cloud_did for i in XGateway.devices.values()}
+    for did, store_device in list(XDevice.restore.items()):
+        if did in devices:
+            continue
+        last_ts = max(
+            store_device.get("last_report_ts", 0),
+            *store_device.get("last_seen", {}).values(),
+            0,
+        )
+        if 0 < last_ts < ts - STORE_DEVICE_TTL:
+            XDevice.restore.pop(did)
+            changed = True
+
+    return changed
+
+
+def inventory_store(hass: HomeAssistant, host: str) -> Store:
+    return Store(hass, 1, f"{DOMAIN}/inventory_{host}.json")
+
+
+async def store_inventory(hass: HomeAssistant, gw: XGateway):
+    """Restore parsed gateway files, so unchanged files won't be read again.
+    Devices from restored files, not found on the gateway, removed from Hass.
+    """
+    store = inventory_store(hass, gw.host)
+    if data := await store.async_load():
+        gw.inventory = data
+
+    def save(inventory: dict):
+        store.async_delay_save(lambda: inventory, 10)
+
+    gw.add_event_listener(EVENT_INVENTORY, save)
+
+    def remove_stale_device(device: XDevice):
+        remove_device(hass, device)
+
+    gw.add_event_listener(EVENT_STALE_DEVICE, remove_stale_device)
+
+
+async def remove_inventory(hass: HomeAssistant, config_entry: ConfigEntry):
+    if host := config_entry.options.get("host"):
+        await inventory_store(hass, host).async_remove()
+
+
 def get_cloud_gateways(hass: HomeAssistant) -> list[dict]:
     gateways = []
     for item in hass.data.get(DOMAIN, {}).values():
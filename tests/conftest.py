@@ -0,0 +1,20 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="run benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: wall-clock benchmark, run with --benchmark option"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="run with --benchmark option")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
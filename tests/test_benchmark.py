@@ -0,0 +1,638 @@
+import asyncio
+import json
+import pathlib
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+from custom_components.xiaomi_gateway3.core.const import GATEWAY, ZIGBEE
+from custom_components.xiaomi_gateway3.core.converters import silabs
+from custom_components.xiaomi_gateway3.core.converters.zigbee import ZConverter
+from custom_components.xiaomi_gateway3.core.device import XDevice, get_model_desc
+from custom_components.xiaomi_gateway3.core.devices import DEVICES
+from custom_components.xiaomi_gateway3.core.gate.base import XGateway
+from custom_components.xiaomi_gateway3.core.gateway import MultiGateway
+from custom_components.xiaomi_gateway3.core.mini_mqtt import (
+    MQTTMessage,
+    MiniMQTT,
+    RawMessage,
+)
+from custom_components.xiaomi_gateway3.core.mqtt_trace import replay
+from custom_components.xiaomi_gateway3.core.timing import TIMING
+from custom_components.xiaomi_gateway3.core.unqlite import SQLite
+from custom_components.xiaomi_gateway3.hass import hass_utils
+from test_conv_silabs import ZCL_VECTORS
+from test_misc import (
+    MQTT_TRACE,
+    FakeInventoryShell,
+    biggest_specs,
+    expiry_gateways,
+    hour_trace,
+    init_gateway,
+    linear_model_desc,
+    mqtt_message,
+    prepare_inventory,
+    synthetic_device,
+    timing_gateway,
+)
+
+# integration import time without Hass modules, in seconds (only with --benchmark)
+IMPORT_TIME_BUDGET = 0.45
+
+
+def bench(func, number: int) -> float:
+    """Return average time of one func call in microseconds."""
+    ts = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - ts) / number * 1_000_000
+
+
+@pytest.mark.benchmark
+def test_spec_index_benchmark():
+    for desc in biggest_specs(5):
+        model = next(k for k in desc if k not in ("spec", "support", "ttl"))
+        device = XDevice(model)
+        mis = [conv.mi for conv in device.converters if conv.mi is not None]
+
+        def linear():
+            for mi in mis:
+                _ = [conv for conv in device.converters if conv.mi == mi]
+
+        def indexed():
+            for mi in mis:
+                _ = device.index.mi.get(mi, ())
+
+        t1 = bench(linear, 1000)
+        t2 = bench(indexed, 1000)
+        print(f"{model}: {len(mis)} mi, linear {t1:.1f}us, index {t2:.1f}us")
+
+
+@pytest.mark.benchmark
+def test_spec_index_zigbee():
+    device = XDevice("TS011F")
+    clusters = {conv.cluster_id for conv in device.converters if conv.cluster_id}
+
+    def linear():
+        for cluster_id in clusters:
+            _ = [
+                conv
+                for conv in device.converters
+                if isinstance(conv, ZConverter)
+                and conv.cluster_id == cluster_id
+                and (conv.ep is None or conv.ep == 1)
+            ]
+
+    def indexed():
+        for cluster_id in clusters:
+            _ = device.index.get_zigbee(cluster_id, 1)
+
+    t1 = bench(linear, 1000)
+    t2 = bench(indexed, 1000)
+    print(f"TS011F: {len(clusters)} clusters, linear {t1:.1f}us, index {t2:.1f}us")
+
+
+@pytest.mark.benchmark
+def test_models_index_benchmark():
+    models = [k for i in DEVICES for k, v in i.items() if isinstance(v, list)]
+    models = [i for i in models if i != "spec"] + ["unknown", 123456789]
+    devices = [(models[i % len(models)], ZIGBEE) for i in range(1000)]
+
+    def linear():
+        for model, type in devices:
+            linear_model_desc(model, type)
+
+    def indexed():
+        for model, type in devices:
+            get_model_desc(model, type)
+
+    def startup():
+        for model, type in devices:
+            XDevice(model, type=type, did="lumi.1", ieee="00:00:00:00:00:00:00:01")
+
+    t1 = bench(linear, 3)
+    t2 = bench(indexed, 3)
+    t3 = bench(startup, 3)
+    print(
+        f"1000 devices: linear lookup {t1 / 1000:.1f}ms, index lookup {t2 / 1000:.1f}ms"
+        f", startup {t3 / 1000:.1f}ms"
+    )
+
+
+@pytest.mark.benchmark
+def test_mqtt_routing_benchmark():
+    async def main():
+        gw = init_gateway()
+
+        def new_messages() -> list[MQTTMessage]:
+            return [mqtt_message(*i) for _ in range(100) for i in MQTT_TRACE]
+
+        def fanout(msg: MQTTMessage):
+            # old logic: every mixin checks every message topic
+            for topic, listeners in gw.topic_listeners.items():
+                if topic.startswith("gw/+/"):
+                    if not msg.topic.endswith(topic[4:]):
+                        continue
+                elif msg.topic != topic:
+                    continue
+                for handler, key in listeners:
+                    if key is None or key in msg.payload:
+                        handler(msg)
+
+        def routed():
+            for msg in new_messages():
+                gw.on_mqtt_message(msg)
+
+        def fanned():
+            for msg in new_messages():
+                fanout(msg)
+
+        count = len(MQTT_TRACE) * 100
+        t1 = bench(fanned, 10) / count
+        t2 = bench(routed, 10) / count
+        print(f"MQTT: fan-out {1e6 / t1:.0f} msg/s, router {1e6 / t2:.0f} msg/s")
+
+    asyncio.run(main())
+
+
+class OldMiniMQTT(MiniMQTT):
+    """MiniMQTT reader before buffered frames parsing."""
+
+    async def read_varlen(self) -> int:
+        var = 0
+        for i in range(4):
+            b = await self.reader.read(1)
+            var += (b[0] & 0x7F) << (7 * i)
+            if (b[0] & 0x80) == 0:
+                break
+        return var
+
+    async def read(self) -> MQTTMessage | None:
+        raw = await self.reader.read(1)
+        if raw == b"":
+            return None
+
+        msg = RawMessage.read_header(raw[0])
+        varlen = await self.read_varlen()
+        raw = await self.reader.readexactly(varlen)
+        pr = RawMessage(raw)
+        msg.topic = pr.read_str()
+        msg.payload = pr.read_all()
+        return msg
+
+
+async def mqtt_broker(frames: list[bytes], rate: int = 0) -> asyncio.Server:
+    """Local stand-in broker, sends all frames with fixed rate (msg/s) or max speed."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.read(1024)  # CONNECT
+        writer.write(b"\x20\x02\x00\x00")  # CONNACK
+        batch = rate // 100 if rate else 1000
+        for i in range(0, len(frames), batch):
+            writer.write(b"".join(frames[i : i + batch]))
+            await writer.drain()
+            if rate:
+                await asyncio.sleep(0.01)
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+@pytest.mark.benchmark
+def test_mqtt_reader():
+    frames = [
+        RawMessage.publish(topic, payload.encode()) for topic, payload in MQTT_TRACE
+    ]
+
+    async def receive(mqtt: MiniMQTT, count: int, rate: int) -> tuple[float, float]:
+        server = await mqtt_broker(frames * (count // len(frames)), rate)
+        port = server.sockets[0].getsockname()[1]
+
+        ts, cpu = time.perf_counter(), time.process_time()
+        assert await mqtt.connect("127.0.0.1", port)
+        received = 0
+        async for _ in mqtt:
+            received += 1
+        ts, cpu = time.perf_counter() - ts, time.process_time() - cpu
+
+        await mqtt.close()
+        server.close()
+        assert received == count
+        return ts, cpu
+
+    async def main():
+        for rate, count in ((5000, 5000), (0, 20000)):
+            ts1, cpu1 = await receive(OldMiniMQTT(), count, rate)
+            ts2, cpu2 = await receive(MiniMQTT(), count, rate)
+            name = f"{rate} msg/s" if rate else "max speed"
+            print(
+                f"MQTT reader {name}: old {count / ts1:.0f} msg/s, cpu {cpu1:.2f}s"
+                f", new {count / ts2:.0f} msg/s, cpu {cpu2:.2f}s"
+            )
+
+    asyncio.run(main())
+
+
+def profile_handlers(gw: MultiGateway) -> dict[str, list]:
+    """Wrap all topic handlers, collect calls count and CPU time per handler."""
+    stats = {}
+    for listeners in gw.topic_listeners.values():
+        for i, (handler, key) in enumerate(listeners):
+            stat = stats.setdefault(handler.__name__, [0, 0.0])
+
+            def wrapper(msg, handler=handler, stat=stat):
+                ts = time.thread_time()
+                handler(msg)
+                stat[0] += 1
+                stat[1] += time.thread_time() - ts
+
+            listeners[i] = (wrapper, key)
+    return stats
+
+
+@pytest.mark.benchmark
+def test_mqtt_replay_benchmark(tmp_path):
+    records = hour_trace(str(tmp_path / "hour.trace"))
+
+    async def main():
+        # max speed replay
+        gw = init_gateway()
+        stats = profile_handlers(gw)
+
+        tracemalloc.start()
+        ts, cpu = time.perf_counter(), time.process_time()
+        count = await replay(gw.on_mqtt_message, records)
+        ts, cpu = time.perf_counter() - ts, time.process_time() - cpu
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert count == len(records)
+        print(
+            f"MQTT replay: {count} msg, {count / ts:.0f} msg/s, cpu {cpu:.2f}s"
+            f", peak memory {peak / 1024:.0f} KB"
+        )
+        for name, (calls, cpu) in sorted(stats.items(), key=lambda i: -i[1][1]):
+            if calls:
+                print(f"  {name}: {calls} calls, {cpu * 1000:.1f}ms")
+
+    asyncio.run(main())
+
+
+@pytest.mark.benchmark
+def test_timing_overhead():
+    gw, messages = timing_gateway()
+
+    def routed():
+        for msg in messages:
+            gw.on_mqtt_message(msg)
+
+    t1 = bench(routed, 10)
+    TIMING.enabled = True
+    try:
+        t2 = bench(routed, 10)
+    finally:
+        TIMING.enabled = False
+    TIMING.clear()
+
+    print(f"Timing: off {t1 / len(messages):.1f}us, on {t2 / len(messages):.1f}us")
+
+
+@pytest.mark.benchmark
+def test_zcl_decoder_benchmark():
+    vectors = [(cluster_id, bytes.fromhex(data)) for cluster_id, data in ZCL_VECTORS]
+
+    def zigpy():
+        for cluster_id, data in vectors:
+            silabs.zcl_deserialize(cluster_id, data)
+
+    def fast():
+        for cluster_id, data in vectors:
+            silabs.zcl_fast_deserialize(cluster_id, data)
+
+    payloads = [
+        {"clusterId": hex(cluster_id), "APSPlayload": "0x" + data.hex()}
+        for cluster_id, data in vectors
+    ]
+    # Xiaomi heartbeat, decoded with zigpy types
+    payloads.append(
+        {
+            "clusterId": "0x0000",
+            "APSPlayload": "0x1C5F119F0A01FF421B03282D05214B00082108210921020464200B962300000000",
+        }
+    )
+
+    def uncached():
+        silabs.DECODE_CACHE.clear()
+        for payload in payloads:
+            silabs.decode(payload)
+
+    def cached():
+        for payload in payloads:
+            silabs.decode(payload)
+
+    t1 = bench(zigpy, 1000) / len(vectors)
+    t2 = bench(fast, 1000) / len(vectors)
+    print(f"ZCL decode: zigpy {1e6 / t1:.0f} msg/s, fast {1e6 / t2:.0f} msg/s")
+
+    t1 = bench(uncached, 1000) / len(payloads)
+    t2 = bench(cached, 1000) / len(payloads)
+    print(f"Zigbee decode: uncached {1e6 / t1:.0f} msg/s, cached {1e6 / t2:.0f} msg/s")
+
+
+@pytest.mark.benchmark
+def test_devices_store_benchmark():
+    gw = XGateway("192.168.1.100")
+    gw.device = XDevice(
+        "lumi.gateway.mgl03", type=GATEWAY, did="123", mac="aa:bb:cc:dd:ee:ff"
+    )
+    devices = [synthetic_device(i) for i in range(2000)]
+    ts = 1_700_000_000
+
+    backup = XGateway.devices, XDevice.restore, XDevice.dirty
+    XGateway.devices = {i.did: i for i in devices}
+    XDevice.restore = {}
+    XDevice.dirty = set()  # devices from other tests
+    try:
+        for device in devices:
+            device.on_keep_alive(gw, ts)
+            device.last_report_ts = ts
+        t1 = bench(lambda: hass_utils.dump_devices_store(ts), 1)
+        # Hass Store writes JSON with indent
+        t2 = bench(lambda: json.dumps(XDevice.restore, indent=2), 1)
+        size = len(json.dumps(XDevice.restore, indent=2))
+
+        # few devices reported
+        ts += 60
+        for device in devices[:20]:
+            device.on_keep_alive(gw, ts)
+        t3 = bench(lambda: hass_utils.dump_devices_store(ts), 1)
+    finally:
+        XGateway.devices, XDevice.restore, XDevice.dirty = backup
+
+    print(
+        f"Devices store: update all devices {t1 / 1000:.1f}ms, 20 devices"
+        f" {t3 / 1000:.1f}ms, write JSON {t2 / 1000:.1f}ms, size {size // 1000}KB"
+    )
+
+
+@pytest.mark.benchmark
+def test_device_expiry_benchmark():
+    ts = int(time.time())
+    gateways = expiry_gateways(ts)
+
+    def full_scan():
+        for gw in gateways:
+            gw.update_devices(ts)
+
+    def expiry_queue():
+        for gw in gateways:
+            gw.update_expired(ts)
+
+    t1 = bench(full_scan, 10)
+    t2 = bench(expiry_queue, 10)
+    print(f"Devices update: full scan {t1:.0f}us, expiry queue {t2:.1f}us")
+
+
+@pytest.mark.benchmark
+def test_inventory_cache_benchmark():
+    async def main():
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        sh = FakeInventoryShell(300, slow=True)
+        t1 = await prepare_inventory(gw, sh)
+
+        # restore inventory from Hass storage after restart
+        gw.inventory = json.loads(json.dumps(gw.inventory))
+        gw.devices.clear()
+        t2 = await prepare_inventory(gw, sh)
+
+        print(f"Prepare gateway: read files {t1:.2f}s, not changed files {t2:.2f}s")
+
+    asyncio.run(main())
+
+
+@pytest.mark.benchmark
+def test_warm_start_benchmark():
+    async def main():
+        sh = FakeInventoryShell(300, slow=True)
+        added = []
+
+        def on_add_device(device: XDevice):
+            added.append(time.perf_counter())
+
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        gw.add_event_listener("add_device", on_add_device)
+
+        ts = time.perf_counter()
+        await prepare_inventory(gw, sh)
+        t1, t2 = added[0] - ts, added[-1] - ts
+        inventory = json.loads(json.dumps(gw.inventory))
+
+        # Hass restart
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        gw.inventory = inventory
+        gw.add_event_listener("add_device", on_add_device)
+        added.clear()
+
+        ts = time.perf_counter()
+        await gw.warm_start()
+        t3, t4 = added[0] - ts, added[-1] - ts
+
+        print(
+            f"Time to first and last device: cold {t1:.3f}s and {t2:.3f}s,"
+            f" warm {t3:.3f}s and {t4:.3f}s"
+        )
+
+    asyncio.run(main())
+
+
+def synthetic_db(filename: str, size: int) -> int:
+    """Bluetooth DB like on Multimode Gateway with many BLE and Mesh devices."""
+    rnd = random.Random(size)
+    con = sqlite3.connect(filename)
+    con.execute(
+        "CREATE TABLE gateway_authed_table (_id INTEGER PRIMARY KEY, mac TEXT,"
+        " product_id INTEGER, reserved INTEGER, did TEXT, beaconkey TEXT, token TEXT)"
+    )
+    con.execute(
+        "CREATE TABLE mesh_device_v3 (did TEXT, mac TEXT, pid INTEGER, token TEXT,"
+        " iv INTEGER, gid INTEGER, rssi REAL)"
+    )
+    count = 0
+    while count * 4096 < size:
+        for i in range(count, count + 500):
+            con.execute(
+                "INSERT INTO gateway_authed_table VALUES (?,?,?,?,?,?,?)",
+                (None, f"{i:012x}", 2038, 0, f"blt.3.{i}", rnd.randbytes(12).hex())
+                + (rnd.randbytes(200).hex(),),
+            )
+            con.execute(
+                "INSERT INTO mesh_device_v3 VALUES (?,?,?,?,?,?,?)",
+                (str(1000000 + i), f"AA:BB:CC:{i:06X}", 10441)
+                + (rnd.randbytes(300).hex(), i, 1, -rnd.random() * 90),
+            )
+        con.commit()
+        count = con.execute("PRAGMA page_count").fetchone()[0]
+    count = con.execute("SELECT COUNT(*) FROM mesh_device_v3").fetchone()[0]
+    con.close()
+    return count
+
+
+class OldSQLite:
+    """Previous eager reader, decodes all rows of all columns, for comparison."""
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self.pos = 16
+        self.page_size = self.read_int(2)
+        self.tables = self.read_page(0)
+
+    def read(self, length: int):
+        self.pos += length
+        return self.raw[self.pos - length : self.pos]
+
+    def read_int(self, length: int):
+        return int.from_bytes(self.read(length), "big")
+
+    def read_varint(self):
+        result = 0
+        while True:
+            i = self.read_int(1)
+            result += i & 0x7F
+            if i < 0x80:
+                return result
+            result <<= 7
+
+    def read_table(self, name: str):
+        return self.read_page(next(t[3] - 1 for t in self.tables if t[1] == name))
+
+    def read_page(self, page_num: int):
+        self.pos = 100 if page_num == 0 else self.page_size * page_num
+        page_type = self.read(1)
+        self.pos += 2
+        cells_num = self.read_int(2)
+        self.pos += 3
+        if page_type == b"\x05":
+            last_page_num = self.read_int(4)
+        cells_pos = [self.read_int(2) for _ in range(cells_num)]
+        rows = []
+        for cell_pos in cells_pos:
+            self.pos = self.page_size * page_num + cell_pos
+            if page_type == b"\x05":
+                child_page_num = self.read_int(4)
+                rows += self.read_page(child_page_num - 1)
+                continue
+
+            self.read_varint()  # payload_len
+            rowid = self.read_varint()
+            payload_pos = self.pos
+            header_size = self.read_varint()
+            columns_type = []
+            while self.pos < payload_pos + header_size:
+                columns_type.append(self.read_varint())
+
+            cells = []
+            for column_type in columns_type:
+                if column_type == 0:
+                    data = rowid
+                elif 1 <= column_type <= 4:
+                    data = self.read_int(column_type)
+                elif column_type == 5:
+                    data = self.read_int(6)
+                elif column_type in (6, 7):
+                    data = self.read_int(8)
+                elif column_type in (8, 9):
+                    data = column_type - 8
+                elif column_type % 2 == 0:
+                    data = self.read((column_type - 12) // 2)
+                else:
+                    data = self.read((column_type - 13) // 2).decode()
+                cells.append(data)
+            rows.append(cells)
+
+        if page_type == b"\x05":
+            rows += self.read_page(last_page_num - 1)
+        return rows
+
+
+@pytest.mark.benchmark
+def test_sqlite_reader(tmp_path):
+    filename = str(tmp_path / "mible_local.db")
+    count = synthetic_db(filename, 5_000_000)
+    with open(filename, "rb") as f:
+        raw = f.read()
+
+    def read_all():
+        db = SQLite(raw)
+        assert len(db.read_table("gateway_authed_table")) == count
+        assert len(db.read_table("mesh_device_v3")) == count
+
+    def read_columns():
+        # same columns as BLE and Mesh inventory
+        db = SQLite(raw)
+        assert len(db.read_table("gateway_authed_table", (4, 1, 2))) == count
+        assert len(db.read_table("mesh_device_v3", (0, 1, 2, 5))) == count
+
+    def read_old():
+        db = OldSQLite(raw)
+        assert len(db.read_table("gateway_authed_table")) == count
+        assert len(db.read_table("mesh_device_v3")) == count
+
+    t0 = bench(read_old, 3) / 1000
+    t1 = bench(read_all, 3) / 1000
+    t2 = bench(read_columns, 3) / 1000
+    assert t1 < t0
+    assert t2 < t1
+    print(
+        f"SQLite {len(raw) // 1_000_000}MB, {count * 2} rows: old {t0:.0f}ms,"
+        f" all columns {t1:.0f}ms, 3-4 columns {t2:.0f}ms"
+    )
+
+
+@pytest.mark.benchmark
+def test_import_time():
+    root = pathlib.Path(__file__).parent.parent
+
+    # Hass modules already loaded on Hass start, so exclude them from measure
+    hass_modules = set()
+    for path in root.glob("custom_components/xiaomi_gateway3/**/*.py"):
+        hass_modules.update(
+            re.findall(
+                r"^(?:from|import) (homeassistant[\w.]*)", path.read_text(), re.M
+            )
+        )
+
+    code = f"""import sys, time
+for name in {sorted(hass_modules)!r}:
+    __import__(name)
+ts = time.perf_counter()
+import custom_components.xiaomi_gateway3.core.gateway
+t1 = time.perf_counter() - ts
+loaded = any(i.startswith("zigpy") for i in sys.modules)
+ts = time.perf_counter()
+import zigpy.zcl, zigpy.zdo
+t2 = time.perf_counter() - ts
+print(t1, t2, loaded)"""
+
+    results = []
+    for _ in range(3):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=root,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.split()
+        results.append((float(out[0]), float(out[1])))
+
+    t1, t2 = min(results)
+    print(f"Import: integration {t1 * 1000:.0f}ms, zigpy {t2 * 1000:.0f}ms")
+    assert t1 < IMPORT_TIME_BUDGET
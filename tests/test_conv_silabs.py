@@ -1,3 +1,10 @@
+import os
+import random
+import re
+import subprocess
+import sys
+
+from zigpy.zcl import Cluster
 from zigpy.zcl.clusters.general import OnOff
 
 from custom_components.xiaomi_gateway3.core.converters import silabs
@@ -268,3 +275,149 @@ def test_zdo():
 def test_general_4():
     p = silabs.decode({"clusterId": "0x0000", "APSPlayload": "0x1C5F11760400"})
     assert p == {"cluster": "basic", "general_command_id": 4, None: 0}
+
+
+def test_fast_deserialize():
+    # all ZCL vectors from Silabs and Zigbee converters tests
+    vectors = []
+    for name in ("test_conv_silabs.py", "test_conv_zigbee.py"):
+        with open(os.path.join(os.path.dirname(__file__), name)) as f:
+            vectors += re.findall(
+                r'"clusterId": "(0x\w+)",\s*(?:"sourceEndpoint": "(0x\w+)",\s*)?'
+                r'"APSPlayload": "0x(\w+)"',
+                f.read(),
+            )
+    assert len(vectors) > 30
+
+    fast = 0
+    for cluster_id, ep, data in vectors:
+        if ep == "0x00":
+            continue  # ZDO
+        cluster_id, data = int(cluster_id, 0), bytes.fromhex(data)
+        if (p := silabs.zcl_fast_deserialize(cluster_id, data)) is not None:
+            assert repr(p) == repr(silabs.zcl_deserialize(cluster_id, data))
+            fast += 1
+    assert fast > 15
+
+    # random values for all supported data types, Report and Read response
+    rnd = random.Random(0)
+    types = [*silabs.ZCL_UINTS, *silabs.ZCL_SINTS, *silabs.ZCL_FLOATS]
+    types += [*silabs.ZCL_STRINGS, 0x48, 0xF0]  # array and IEEE via zigpy
+    for _ in range(2000):
+        type_id = rnd.choice(types)
+        if type_id in silabs.ZCL_STRINGS:
+            value = bytes([rnd.randint(0, 4)]) + rnd.randbytes(4)
+            if type_id in (0x43, 0x44):
+                value = value[:1] + b"\x00" + value[1:]
+        else:
+            value = rnd.randbytes(rnd.choice((1, 2, 4, 8)))
+
+        attr = rnd.randbytes(2)
+        cmd, record = rnd.choice(
+            ((0x0A, attr + bytes([type_id])), (0x01, attr + b"\x00" + bytes([type_id])))
+        )
+        for data in (
+            bytes([0x18, 0x01, cmd]) + record + value,
+            bytes([0x1C, 0x5F, 0x11, 0x01, cmd]) + attr + b"\x86",
+        ):
+            if (p := silabs.zcl_fast_deserialize(0x0006, data)) is not None:
+                # compare repr because of NaN values
+                assert repr(p) == repr(silabs.zcl_deserialize(0x0006, data)), data.hex()
+
+    # invalid char string and invalid long char string
+    for data in ("18010A000042FF", "18010A000044FFFF", "18010A000044FFFF6162"):
+        data = bytes.fromhex(data)
+        p = silabs.zcl_fast_deserialize(0x0006, data) or silabs.zcl_deserialize(
+            0x0006, data
+        )
+        assert p == silabs.zcl_deserialize(0x0006, data), data.hex()
+
+
+def test_fast_clusters():
+    for cluster_id, name in silabs.ZCL_CLUSTERS.items():
+        assert Cluster.from_id(None, cluster_id).ep_attribute == name
+
+    # unknown cluster decoded with zigpy
+    assert silabs.zcl_fast_deserialize(0xFCC0, bytes.fromhex("18010A00001001")) is None
+
+    # integration load and fast decode should not import zigpy
+    code = """import sys
+import custom_components.xiaomi_gateway3.core.gateway
+from custom_components.xiaomi_gateway3.core.converters import silabs
+p = silabs.decode({"clusterId": "0x0402", "APSPlayload": "0x18DC0A0000291F08"})
+assert p == {"cluster": "temperature", "general_command_id": 10, 0: 2079}, p
+print(any(i.startswith("zigpy") for i in sys.modules))"""
+    root = os.path.dirname(os.path.dirname(__file__))
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True
+    )
+    assert out.stdout.strip() == "False", out.stderr
+
+
+def test_decode_cache():
+    silabs.DECODE_CACHE.clear()
+    hits = silabs.DECODE_STATS["hits"]
+
+    p1 = silabs.decode({"clusterId": "0x0402", "APSPlayload": "0x18DC0A0000291F08"})
+    # same frame with another sequence number
+    p2 = silabs.decode({"clusterId": "0x0402", "APSPlayload": "0x18DD0A0000291F08"})
+    assert p1 == p2 == {"cluster": "temperature", "general_command_id": 10, 0: 2079}
+    assert silabs.DECODE_STATS["hits"] == hits + 1
+
+    # each call returns new dict
+    p2[0] = 0
+    p2["decode"] = True
+    p3 = silabs.decode({"clusterId": "0x0402", "APSPlayload": "0x18DE0A0000291F08"})
+    assert p3 == p1
+
+    # nested Xiaomi attributes
+    data = {
+        "clusterId": "0x0000",
+        "APSPlayload": "0x1C5F119F0A01FF421B03282D05214B00082108210921020464200B962300000000",
+    }
+    p1 = silabs.decode(data)
+    p1[0xFF01][100] = 1
+    assert silabs.decode(data)[0xFF01][100] == 11
+
+    # other endpoint is another key
+    p1 = silabs.decode(
+        {
+            "clusterId": "0x0402",
+            "sourceEndpoint": "0x02",
+            "APSPlayload": "0x18DF0A0000291F08",
+        }
+    )
+    assert len(silabs.DECODE_CACHE) == 3
+
+    # ZDO and lists not cached
+    silabs.decode({"clusterId": "0x000A", "APSPlayload": "0x102D000000"})
+    assert len(silabs.DECODE_CACHE) == 3
+
+
+def test_zigpy_names():
+    from custom_components.xiaomi_gateway3.core.converters import zigbee
+    from custom_components.xiaomi_gateway3.core.converters.zigbee import IasZone
+
+    assert zigbee.OnOff is OnOff
+    assert zigbee.Cluster is Cluster
+    assert silabs.DATA_TYPES[0x10][0] == "Boolean"
+    assert IasZone.cluster_id == 0x0500
+
+
+ZCL_VECTORS = [
+    (0x0006, "18000A00001001"),  # on_off bool
+    (0x0402, "18DC0A0000291F08"),  # temperature int16
+    (0x0405, "18DD0A000021480D"),  # humidity uint16
+    (0x0403, "18DE0A000029E003140028FF100029C526"),  # pressure 3 attrs
+    (0x0702, "18010A000025010000000000"),  # metering uint48
+    (0x0B04, "1802010B0500210100"),  # Read_Attributes_rsp
+    (0x0000, "18030104000042044C554D49"),  # Read_Attributes_rsp string
+]
+
+
+def test_zcl_decoder():
+    for cluster_id, data in ZCL_VECTORS:
+        data = bytes.fromhex(data)
+        p1 = silabs.zcl_fast_deserialize(cluster_id, data)
+        p2 = silabs.zcl_deserialize(cluster_id, data)
+        assert p1 is not None and p1 == p2
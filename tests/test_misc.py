@@ -1,11 +1,47 @@
+import asyncio
 import copy
+import json
+import time
+import tracemalloc
 from dataclasses import dataclass
 
 from bellows.uart import Gateway
 from homeassistant.components.binary_sensor import BinarySensorDeviceClass
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry, entity_registry
 
+from custom_components.xiaomi_gateway3.core.const import (
+    BLE,
+    DOMAIN,
+    GATEWAY,
+    MATTER,
+    MESH,
+    ZIGBEE,
+)
 from custom_components.xiaomi_gateway3.core.converters.base import BaseConv
+from custom_components.xiaomi_gateway3.core.device import XDevice, get_model_desc
 from custom_components.xiaomi_gateway3.core.devices import DEVICES
+from custom_components.xiaomi_gateway3.core.gate.base import (
+    EVENT_MQTT_PUBLISH,
+    XGateway,
+)
+from custom_components.xiaomi_gateway3.core.gate.silabs import CommandsBatch
+from custom_components.xiaomi_gateway3.core.gateway import MultiGateway
+from custom_components.xiaomi_gateway3.core.mini_mqtt import (
+    SUBSCRIBE,
+    MQTTMessage,
+    MiniMQTT,
+    RawMessage,
+)
+from custom_components.xiaomi_gateway3.core.mqtt_trace import (
+    MQTTRecorder,
+    read_trace,
+    replay,
+)
+from custom_components.xiaomi_gateway3.core.scheduler import ExpiryQueue, PollQueue
+from custom_components.xiaomi_gateway3.core.timing import TIMING, Timing
+from custom_components.xiaomi_gateway3.hass import hass_utils
 
 
 def test_bellows():
@@ -70,3 +106,1079 @@ def test_unique_models():
                 continue
             assert model not in models, model
             models.add(model)
+
+
+def biggest_specs(count: int) -> list[dict]:
+    specs = [i for i in DEVICES if "default" not in i]
+    return sorted(specs, key=lambda i: len(i["spec"]), reverse=True)[:count]
+
+
+def test_spec_index():
+    for desc in biggest_specs(5):
+        model = next(k for k in desc if k not in ("spec", "support", "ttl"))
+        device1 = XDevice(model)
+        device2 = XDevice(model)
+        # index shared between all devices with same spec
+        assert device1.index is device2.index
+
+        mis = [conv.mi for conv in device1.converters if conv.mi is not None]
+        for mi in mis:
+            assert device1.index.mi[mi] == [
+                conv for conv in device1.converters if conv.mi == mi
+            ]
+
+
+def linear_model_desc(model, type: str) -> tuple[list | None, dict | None]:
+    """Old XDevice.init_converters logic."""
+    for desc in DEVICES:
+        if info := desc.get(model):
+            return info, desc
+        if type == desc.get("default"):
+            return None, desc
+    return None, None
+
+
+def test_models_index():
+    models = [k for i in DEVICES for k, v in i.items() if isinstance(v, list)]
+    models = [i for i in models if i != "spec"] + ["unknown", 123456789]
+
+    for model in models:
+        for type in (GATEWAY, ZIGBEE, BLE, MESH, MATTER, "none"):
+            assert get_model_desc(model, type) == linear_model_desc(model, type)
+
+
+def test_mqtt_json():
+    msg = MQTTMessage()
+    msg.payload = b'{"id":123,"result":["ok"]}'
+
+    count = MQTTMessage.json_decodes
+    assert msg.json == {"id": 123, "result": ["ok"]}
+    assert msg.json is msg.json
+    assert MQTTMessage.json_decodes == count + 1
+
+    msg = MQTTMessage()
+    msg.payload = b'{"value":NaN}'
+    assert msg.json["value"] != msg.json["value"]
+
+
+def test_mqtt_frames():
+    raw = (
+        RawMessage.publish("zigbee/send", b'{"cmd":"report"}')
+        + bytes.fromhex("d000")  # PINGRESP
+        + RawMessage.publish("log/miio", b"x" * 300)  # two bytes length
+        + bytes.fromhex("9003000100")  # SUBACK
+    )
+
+    # feed data in small chunks, like slow network
+    for chunk_size in (1, 2, 7, len(raw)):
+        mqtt = MiniMQTT()
+        for i in range(0, len(raw), chunk_size):
+            mqtt.recv_buffer += raw[i : i + chunk_size]
+            mqtt.read_frames()
+
+        assert not mqtt.recv_buffer
+        msgs = list(mqtt.recv_messages)
+        assert [i.type for i in msgs] == [3, 13, 3, 9]
+        assert msgs[0].topic == "zigbee/send"
+        assert msgs[0].payload == b'{"cmd":"report"}'
+        assert msgs[2].topic == "log/miio"
+        assert msgs[2].payload == b"x" * 300
+
+
+class FakeTransport:
+    def get_write_buffer_size(self):
+        return 0
+
+
+class FakeWriter:
+    transport = FakeTransport()
+
+    def __init__(self):
+        self.calls = []
+
+    def write(self, data: bytes):
+        self.calls.append(data)
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def test_mqtt_publish():
+    async def main():
+        mqtt = MiniMQTT()
+        mqtt.writer = writer = FakeWriter()
+        mqtt.connected = True
+
+        for i in range(30):
+            await mqtt.publish("zigbee/recv", {"cmd": "write", "value": i})
+        assert mqtt.send_queue == 30
+        assert writer.calls == []
+
+        await asyncio.sleep(0)  # next loop tick
+        assert mqtt.send_queue == 0
+        assert len(writer.calls) == 1
+        assert writer.calls[0].count(b"zigbee/recv") == 30
+
+        await mqtt.publish("zigbee/recv", b"123", flush=True)
+        assert len(writer.calls) == 2
+        assert mqtt.send_stats["frames"] == 31
+
+    asyncio.run(main())
+
+
+def test_mqtt_buffer():
+    async def main():
+        mqtt = MiniMQTT(buffer_size=3, buffer_rate=20)
+
+        # offline: bounded buffer drops oldest messages
+        for i in range(5):
+            await mqtt.publish("miio/command", {"id": i})
+        assert [i[2]["id"] for i in mqtt.pub_buffer] == [2, 3, 4]
+        assert mqtt.send_stats["dropped"] == 2
+
+        # expired message is dropped on replay
+        ts, topic, payload, retain = mqtt.pub_buffer[0]
+        mqtt.pub_buffer[0] = (ts - 120, topic, payload, retain)
+
+        mqtt.writer = writer = FakeWriter()
+        mqtt.connected = True
+
+        # new messages wait for the buffer to keep order
+        await mqtt.publish("miio/command", {"id": 5})
+        assert mqtt.send_stats["dropped"] == 3
+
+        # rate limit: 2 messages per 0.1 second
+        task = asyncio.create_task(mqtt.empty_buffer())
+        await asyncio.sleep(0)
+        assert len(writer.calls) == 1
+        assert writer.calls[0].count(b"miio/command") == 2
+        await task
+        assert len(writer.calls) == 2
+        assert b'{"id":5}' in writer.calls[1]
+        assert mqtt.send_stats["replayed"] == 3
+
+    asyncio.run(main())
+
+
+IEEE1 = "00:15:8d:00:00:00:00:01"
+IEEE2 = "00:15:8d:00:00:00:00:02"
+
+
+def init_gateway() -> MultiGateway:
+    gw = MultiGateway("127.0.0.1")
+    gw.device = gw.init_device(
+        "lumi.gateway.mgl03",
+        did="123456789",
+        type=GATEWAY,
+        mac="aa:bb:cc:dd:ee:ff",
+        fw_ver="1.5.0_0000",
+    )
+    gw.add_device(gw.device)
+    for model, extra in (
+        (
+            "lumi.sensor_ht",
+            {"type": ZIGBEE, "did": "lumi.158d0000000001", "ieee": IEEE1},
+        ),
+        ("TS0121", {"type": ZIGBEE, "did": "lumi.158d0000000002", "ieee": IEEE2}),
+        (10441, {"type": MESH, "did": "1234", "mac": "aa:bb:cc:dd:ee:01"}),
+        (2038, {"type": BLE, "did": "blt.3.abc", "mac": "aa:bb:cc:dd:ee:02"}),
+    ):
+        gw.add_device(gw.init_device(model, **extra))
+
+    gw.lumi_add_topic_listeners()
+    gw.miot_add_topic_listeners()
+    gw.openmiio_add_topic_listeners()
+    gw.silabs_add_topic_listeners()
+    gw.ble_add_topic_listeners()
+    gw.mesh_add_topic_listeners()
+    gw.matter_add_topic_listeners()
+    return gw
+
+
+def mqtt_message(topic: str, payload: str) -> MQTTMessage:
+    msg = MQTTMessage()
+    msg.topic = topic
+    msg.payload = payload.encode()
+    return msg
+
+
+MQTT_TRACE = [
+    (
+        "zigbee/send",
+        '{"cmd":"report","did":"lumi.158d0000000001","params":[{"res_name":"0.1.85","value":2384}]}',
+    ),
+    (
+        "miio/report",
+        '{"method":"properties_changed","params":[{"did":"1234","siid":3,"piid":2,"value":5}]}',
+    ),
+    (
+        "miio/report",
+        '{"method":"_async.ble_event","params":{"dev":{"did":"blt.3.abc","mac":"AA:BB:CC:DD:EE:02","pdid":2038},"evt":[{"eid":4106,"edata":"64"}],"frmCnt":1,"gwts":1}}',
+    ),
+    (
+        "miio/report",
+        '{"method":"_sync.ble_mesh_keep_alive","params":[{"did":"1234","rssi":-52,"hops":0,"ts":1}]}',
+    ),
+    (
+        "gw/00158D0000000000/MessageReceived",
+        '{"sourceAddress":"0x1234","eui64":"0x00158D0000000002","sourceEndpoint":"0x01","clusterId":"0x0006","APSPlayload":"0x18000A00001001","linkQuality":255,"rssi":-50,"APSCounter":"0x01"}',
+    ),
+    ("gw/00158D0000000000/MessagePreSentCallback", '{"eui64":"0x00158D0000000002"}'),
+    ("gw/00158D0000000000/heartbeat", '{"networkPanId":"0x1234"}'),
+    ("openmiio/report", '{"uptime":"1h"}'),
+    ("log/miio", "some log line"),
+    ("broker/ping", "1"),
+]
+
+
+def test_mqtt_routing():
+    async def main():
+        gw = init_gateway()
+        messages = [mqtt_message(*i) for _ in range(100) for i in MQTT_TRACE]
+
+        calls = {}
+
+        # check each message reaches only its real consumers
+        for topic, listeners in gw.topic_listeners.items():
+            for i, (handler, key) in enumerate(listeners):
+
+                def wrapper(msg, handler=handler):
+                    calls[msg.topic] = calls.get(msg.topic, 0) + 1
+                    handler(msg)
+
+                listeners[i] = (wrapper, key)
+
+        for msg in messages[: len(MQTT_TRACE)]:
+            gw.on_mqtt_message(msg)
+        assert calls == {
+            "zigbee/send": 1,
+            "miio/report": 9,  # BLE, MIoT and Mesh check each report
+            "gw/00158D0000000000/MessageReceived": 1,
+            "gw/00158D0000000000/heartbeat": 1,
+            "openmiio/report": 1,
+        }
+
+        # each message payload decoded only once, only if it has a handler
+        messages = [mqtt_message(*i) for _ in range(100) for i in MQTT_TRACE]
+        count = MQTTMessage.json_decodes
+        for msg in messages:
+            gw.on_mqtt_message(msg)
+        decoded = [msg for msg in messages if "json" in msg.__dict__]
+        assert MQTTMessage.json_decodes - count == len(decoded)
+
+    asyncio.run(main())
+
+
+# approximate hourly traffic of the gateway with ~20 Zigbee and ~10 BLE devices
+MQTT_HOUR_TRACE = MQTT_TRACE + [
+    ("log/miio", "[MIIO] " + "x" * 200),
+    ("log/ble", "[BLE] " + "x" * 120),
+    ("log/z3", "[Z3] " + "x" * 150),
+    ("zigbee/recv", '{"cmd":"write","did":"lumi.158d0000000002","params":[]}'),
+    ("miio/command", '{"id":123,"method":"get_properties","params":[]}'),
+]
+
+
+MQTT_HOUR_RATES = [
+    600, 600, 1200, 120, 2400, 60, 60, 60, 1800, 3600,  # MQTT_TRACE
+    3600, 1200, 1800, 60, 60,
+]  # fmt: skip
+
+
+def topic_match(topic_filter: str, topic: str) -> bool:
+    """MQTT topic filter with `+` and `#` wildcards."""
+    filters = topic_filter.split("/")
+    topics = topic.split("/")
+    for i, f in enumerate(filters):
+        if f == "#":
+            return True
+        if i >= len(topics) or (f != "+" and f != topics[i]):
+            return False
+    return len(filters) == len(topics)
+
+
+async def mqtt_filter_broker(frames: list[tuple[str, bytes]]) -> asyncio.Server:
+    """Local stand-in broker, sends only frames matching client subscription."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.read(1024)  # CONNECT
+        writer.write(b"\x20\x02\x00\x00")  # CONNACK
+
+        raw = await reader.read(0x10000)  # SUBSCRIBE
+        assert raw[0] >> 4 == SUBSCRIBE
+        pr = RawMessage(raw[2 if raw[1] < 0x80 else 3 :])
+        msg_id = pr.read_int(2)
+        filters = []
+        while pr.pos < pr.size:
+            filters.append(pr.read_str())
+            pr.read_int(1)  # QoS
+        writer.write(b"\x90\x03" + msg_id.to_bytes(2, "big") + b"\x00")  # SUBACK
+
+        frames_ = [i for t, i in frames if any(topic_match(f, t) for f in filters)]
+        for i in range(0, len(frames_), 1000):
+            writer.write(b"".join(frames_[i : i + 1000]))
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_mqtt_subscribe():
+    assert topic_match("#", "log/miio")
+    assert topic_match("gw/+/heartbeat", "gw/00158D0000000000/heartbeat")
+    assert not topic_match("gw/+/heartbeat", "gw/00158D0000000000/MessageReceived")
+    assert not topic_match("miio/report", "miio/report_ack")
+
+    gw = init_gateway()
+    topics = gw.mqtt_topics()
+    assert "#" not in topics
+
+    # only messages with listeners pass the subscription filter
+    for topic, _ in MQTT_HOUR_TRACE:
+        listeners = gw.topic_listeners.get(topic) or gw.topic_listeners.get(
+            "gw/+/" + topic.split("/", 2)[-1]
+        )
+        assert any(topic_match(f, topic) for f in topics) == bool(listeners)
+
+    frames = [
+        (topic, RawMessage.publish(topic, payload.encode()))
+        for (topic, payload), rate in zip(MQTT_HOUR_TRACE, MQTT_HOUR_RATES)
+        for _ in range(rate)
+    ]
+
+    async def receive(topics: list[str]) -> tuple[int, int]:
+        server = await mqtt_filter_broker(frames)
+        port = server.sockets[0].getsockname()[1]
+
+        mqtt = MiniMQTT()
+        assert await mqtt.connect("127.0.0.1", port)
+        await mqtt.subscribe(*topics)
+        received = 0
+        async for _ in mqtt:
+            received += 1
+
+        await mqtt.close()
+        server.close()
+        return received, mqtt.recv_bytes
+
+    async def main():
+        count1, size1 = await receive(["#"])
+        count2, size2 = await receive(topics)
+        assert count1 == len(frames)
+        assert count2 < count1
+        assert size2 < size1
+
+    asyncio.run(main())
+
+
+def hour_trace(filename: str) -> list[tuple[float, MQTTMessage]]:
+    """Hourly trace with fixed timestamps."""
+    recorder = MQTTRecorder(filename)
+    ts = 1_700_000_000.0
+    for (topic, payload), rate in zip(MQTT_HOUR_TRACE, MQTT_HOUR_RATES):
+        for i in range(rate):
+            recorder.write(ts + 3600 * i / rate, mqtt_message(topic, payload))
+    recorder.close()
+
+    return sorted(read_trace(filename), key=lambda i: i[0])
+
+
+def test_mqtt_replay(tmp_path):
+    filename = str(tmp_path / "mqtt.trace")
+
+    # record trace from real gateway listener
+    gw = init_gateway()
+    recorder = MQTTRecorder(filename)
+    gw.add_event_listener(EVENT_MQTT_PUBLISH, recorder)
+    assert gw.mqtt_topics() == ["#"]
+    for topic, payload in MQTT_HOUR_TRACE:
+        gw.on_mqtt_message(mqtt_message(topic, payload))
+    recorder.close()
+
+    records = list(read_trace(filename))
+    assert len(records) == recorder.count == len(MQTT_HOUR_TRACE) - 1  # broker/ping
+    assert [(i.topic, i.payload) for _, i in records] == [
+        (topic, payload.encode())
+        for topic, payload in MQTT_HOUR_TRACE
+        if topic != "broker/ping"
+    ]
+
+    records = hour_trace(str(tmp_path / "hour.trace"))
+
+    async def main():
+        # real speed (x1000) replay keeps the trace timing
+        gw = init_gateway()
+        ts = time.monotonic()
+        count = await replay(gw.on_mqtt_message, records[:50], speed=1000)
+        assert count == 50
+        assert time.monotonic() - ts >= (records[49][0] - records[0][0]) / 1000
+
+    asyncio.run(main())
+
+
+def test_timing():
+    timing = Timing(sample=4)
+    for i in range(10):
+        assert timing.call("key", lambda x: x * 2, i) == i * 2
+
+    stat = timing.stats["key"]
+    assert stat.count == 10
+    assert stat.sampled == 3  # calls 1, 5, 9
+
+    info = timing.as_dict()["key"]
+    assert info["count"] == 10
+    assert info["p50_ms"] <= info["p99_ms"] <= info["max_ms"]
+
+    device = XDevice("lumi.sensor_magnet")
+    device.add_listener(lambda data: None)
+
+    TIMING.enabled = True
+    try:
+        device.dispatch({"contact": True})
+    finally:
+        TIMING.enabled = False
+
+    assert TIMING.stats.pop("device.test_timing.<locals>.<lambda>").count == 1
+
+    # timing enabled while any gateway with timing option is running
+    gw1 = MultiGateway("192.168.1.1", debug=["timing"])
+    gw2 = MultiGateway("192.168.1.2", debug=["timing"])
+    assert TIMING.enabled
+    device.dispatch({"contact": True})
+
+    asyncio.run(gw1.stop())
+    assert TIMING.enabled and TIMING.stats
+
+    asyncio.run(gw2.stop())
+    assert not TIMING.enabled and not TIMING.stats
+
+
+def timing_gateway() -> tuple[MultiGateway, list[MQTTMessage]]:
+    gw = init_gateway()
+    for device in gw.devices.values():
+        device.add_listener(lambda data: None)
+    return gw, [mqtt_message(*i) for _ in range(100) for i in MQTT_TRACE]
+
+
+def test_timing_stats():
+    gw, messages = timing_gateway()
+
+    TIMING.enabled = True
+    try:
+        for msg in messages:
+            gw.on_mqtt_message(msg)
+    finally:
+        TIMING.enabled = False
+    stats = TIMING.as_dict()
+    TIMING.clear()
+
+    assert stats["topic.zigbee/send"]["count"] == 100
+    assert any(k.startswith("device.") for k in stats)
+
+
+def test_expiry_queue():
+    queue = ExpiryQueue()
+    queue.schedule("a", 10)
+    queue.schedule("b", 5)
+    queue.schedule("a", 20)  # later deadline skipped
+    assert queue.next_deadline() == 5
+
+    queue.schedule("a", 3)  # earlier deadline rescheduled
+    assert queue.pop_expired(4) == ["a"]
+    assert queue.pop_expired(9) == ["b"]
+    assert queue.pop_expired(100) == []
+    assert len(queue) == 0
+
+    for i in range(1000):
+        queue.schedule("c", 1000 - i)
+    assert len(queue.heap) < 200  # stale entries removed
+    assert queue.pop_expired(1) == ["c"]
+
+
+def test_device_expiry():
+    gw = XGateway("127.0.0.1")
+    gw.device = XDevice(
+        "lumi.gateway.mgl03", type=GATEWAY, did="123", mac="aa:bb:cc:dd:ee:ff"
+    )
+    gw.device.available = True
+
+    device = XDevice(2038, type=BLE, did="blt.3.abc", mac="aa:bb:cc:dd:ee:02")
+    assert device.available_timeout == 65 * 60
+
+    ts = 1_000_000
+    device.on_keep_alive(gw, ts)
+    assert device in gw.expiry
+    assert device.available is False
+
+    gw.update_expired(ts)
+    assert device.available is True
+    assert gw.expiry.deadlines[device] == ts + 65 * 60
+
+    # keep alive doesn't touch queue, device wakes up early and reschedules
+    device.on_keep_alive(gw, ts + 60)
+    gw.update_expired(ts + 65 * 60)
+    assert device.available is True
+    assert gw.expiry.deadlines[device] == ts + 60 + 65 * 60
+
+    gw.update_expired(ts + 60 + 65 * 60)
+    assert device.available is False
+    assert device not in gw.expiry
+
+
+def synthetic_device(i: int) -> XDevice:
+    if i % 3 == 0:
+        mac = f"{i:08x}"
+        ieee = f"00:15:8d:00:{mac[:2]}:{mac[2:4]}:{mac[4:6]}:{mac[6:]}"
+        return XDevice(
+            "lumi.sensor_ht",
+            type=ZIGBEE,
+            did="lumi.158d00" + mac,
+            ieee=ieee,
+            nwk="0x1234",
+            fw_ver=30,
+            hw_ver=1,
+        )
+
+    mac = f"{i:06x}"
+    mac = f"aa:bb:cc:{mac[:2]}:{mac[2:4]}:{mac[4:]}"
+    if i % 3 == 1:
+        return XDevice(2038, type=BLE, did=f"blt.3.{i}", mac=mac)
+    return XDevice(10441, type=MESH, did=str(100000 + i), mac=mac)
+
+
+# memory for one device (with its extra) after the first report, in bytes
+DEVICE_MEMORY_BUDGET = 1200
+
+
+def test_device_memory():
+    device = synthetic_device(0)
+    assert not hasattr(device, "__dict__")
+    assert device.market_name == "Xiaomi TH Sensor"
+    assert device.human_model == "Zigbee: WSDCGQ01LM, lumi.sensor_ht"
+    # market info shared between all devices with same model
+    assert device.market is synthetic_device(3).market
+
+    tracemalloc.start()
+    devices = [synthetic_device(i) for i in range(1000)]
+    for device in devices:
+        device.params.update({"temperature": 22.5})
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert size // len(devices) < DEVICE_MEMORY_BUDGET
+
+
+def test_devices_store():
+    gw = XGateway("192.168.1.100")
+    gw.device = XDevice(
+        "lumi.gateway.mgl03", type=GATEWAY, did="123", mac="aa:bb:cc:dd:ee:ff"
+    )
+    devices = [synthetic_device(i) for i in range(2000)]
+    ts = 1_700_000_000
+
+    # 500 removed devices, seen two months ago, and one with only cloud info
+    restore = {
+        f"blt.3.old{i}": {
+            "uid": f"aabbcc{i:06x}",
+            "last_report_ts": ts - 60 * 24 * 3600 + 0.123456,
+            "last_seen": {gw.device.uid: ts - 60 * 24 * 3600 + 0.123456},
+        }
+        for i in range(500)
+    }
+    restore["123456"] = {"cloud_name": "Vacuum"}
+
+    backup = XGateway.devices, XDevice.restore, XDevice.dirty
+    XGateway.devices = {i.did: i for i in devices}
+    XDevice.restore = restore
+    XDevice.dirty = set()  # devices from other tests
+    try:
+        for device in devices:
+            device.on_keep_alive(gw, ts)
+            device.last_report_ts = ts
+        assert hass_utils.dump_devices_store(ts)
+        assert len(XDevice.restore) == 2001
+
+        # nothing changed, nothing to save
+        assert not hass_utils.dump_devices_store(ts)
+
+        # few devices reported
+        ts += 60
+        for device in devices[:20]:
+            device.on_keep_alive(gw, ts)
+        assert hass_utils.dump_devices_store(ts)
+        assert XDevice.restore["blt.3.1"]["last_seen"] == {"aabbccddeeff": ts}
+        assert XDevice.restore["blt.3.4"]["last_seen"] == {"aabbccddeeff": ts}
+        assert XDevice.restore["blt.3.22"]["last_seen"] == {"aabbccddeeff": ts - 60}
+
+        # device not seen by any gateway and without reports
+        devices[1].last_seen.clear()
+        devices[1].last_report_ts = 0
+        XDevice.dirty.add(devices[1])
+        assert hass_utils.dump_devices_store(ts)
+        assert XDevice.restore["blt.3.1"] == {"uid": devices[1].uid}
+        assert not hass_utils.dump_devices_store(ts)
+    finally:
+        XGateway.devices, XDevice.restore, XDevice.dirty = backup
+
+
+def expiry_gateways(ts: int) -> list[XGateway]:
+    """Three gateways with shared expiry queue and 3000 devices."""
+    devices = {}
+    gateways = []
+    for i in range(3):
+        gw = XGateway(f"192.168.1.{i}")
+        gw.devices = devices
+        gw.expiry = gateways[0].expiry if gateways else ExpiryQueue()
+        gw.device = XDevice(
+            "lumi.gateway.mgl03",
+            type=GATEWAY,
+            did=str(i),
+            mac=f"aa:bb:cc:dd:ee:{i:02x}",
+        )
+        gw.device.available = True
+        gateways.append(gw)
+
+    for i in range(3000):
+        device = synthetic_device(i)
+        devices[device.did] = device
+        for gw in gateways:
+            device.on_keep_alive(gw, ts - i % 600)
+        # don't poll anything in benchmark
+        device.last_report_ts = ts
+
+    return gateways
+
+
+def test_shared_expiry():
+    ts = int(time.time())
+    gateways = expiry_gateways(ts)
+    devices = gateways[0].devices
+
+    for gw in gateways:
+        gw.update_expired(ts)
+    assert all(device.available for device in devices.values())
+
+    assert len(gateways[0].expiry) == len(devices)
+    # all keep alives expired, any gateway timer can process shared queue
+    gateways[0].update_expired(ts + 3 * 3600)
+    assert not any(device.available for device in devices.values())
+
+
+class FakePollDevice:
+    def __init__(self, last_report_ts: int = 0):
+        self.last_report_ts = last_report_ts
+        self.poll_timeout = 600
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+
+
+def test_poll_queue():
+    ts = 1_000_000
+    queue = PollQueue(rate=5, concurrency=4, jitter=30)
+    queue.tokens_ts = ts
+
+    # all devices expired together, like after gateway reconnect
+    devices = [FakePollDevice() for _ in range(100)]
+    for device in devices:
+        queue.add(device, ts)
+        queue.add(device, ts)  # already in queue
+    assert len(queue.queue) == 100
+
+    # device reported while waited in queue
+    devices[0].last_report_ts = ts
+
+    polled = []
+    for i in range(60):
+        queue.process(ts + i)
+        polled.append(sum(device.reads for device in devices))
+
+    assert polled[-1] == 99
+    assert queue.skipped == 1
+    # no more than 5 commands per second
+    assert all(b - a <= 5 for a, b in zip(polled, polled[1:]))
+    # polls spread with jitter
+    assert polled[15] < 99
+
+    info = queue.as_dict()
+    assert info["queue"] == 0 and info["polled"] == 99
+
+
+def test_commands_batch():
+    async def main():
+        published = []
+
+        async def publish(commands: list):
+            published.append(commands)
+
+        batch = CommandsBatch(publish, window=0.01, limit=5)
+
+        def device_commands(nwk: str) -> list[dict]:
+            return [
+                {"commandcli": "zcl global read 6 0"},
+                {"commandcli": f"send {nwk} 1 1"},
+            ]
+
+        await asyncio.gather(
+            *[batch.send(device_commands(f"0x000{i}")) for i in range(5)]
+        )
+
+        # commands of one device never split between messages
+        assert [len(i) for i in published] == [4, 4, 2]
+        assert published[2][1] == {"commandcli": "send 0x0004 1 1"}
+
+        info = batch.as_dict()
+        assert info["publishes"] == 3 and info["commands"] == 10
+        assert info["latency_max_ms"] >= 10
+
+        # next batch
+        await batch.send(device_commands("0x0005"))
+        assert len(published) == 4
+
+        # publish error and cancel resolve all waiting devices
+        for error in (ConnectionError, asyncio.CancelledError):
+
+            async def publish(commands: list):
+                raise error
+
+            batch.publish = publish
+            results = await asyncio.gather(
+                batch.send(device_commands("0x0001")),
+                batch.send(device_commands("0x0002")),
+                return_exceptions=True,
+            )
+            assert all(isinstance(i, error) for i in results), results
+
+    asyncio.run(main())
+
+
+def test_silabs_leave():
+    async def main():
+        gw = MultiGateway("127.0.0.1")
+        gw.ieee = "0000000000000000"
+        gw.new_sdk = False
+
+        published = []
+
+        async def publish(topic: str, payload: dict):
+            published.append(payload["commands"])
+
+        gw.mqtt.publish = publish
+
+        device = XDevice("lumi.sensor_switch", nwk="0x1234")
+        await asyncio.gather(
+            gw.silabs_send(device, {"commands": [{"commandcli": "zdo bind 1"}]}),
+            gw.silabs_leave(device),
+        )
+
+        # leave sent in one batch with previous commands and after them
+        assert published == [
+            [{"commandcli": "zdo bind 1"}, {"commandcli": "zdo leave 0x1234 0 0"}]
+        ]
+
+    asyncio.run(main())
+
+
+def test_dispatch_topic():
+    gw = MultiGateway("127.0.0.1")
+    gw.miot_add_topic_listeners()
+    gw.ble_add_topic_listeners()
+    gw.mesh_add_topic_listeners()
+
+    calls = []
+    gw.miot_process_properties = lambda *args, **kwargs: calls.append("properties")
+    gw.miot_process_event = lambda *args: calls.append("event")
+    gw.ble_process_keepalive = lambda *args: calls.append("ble_keepalive")
+    gw.mesh_process_keepalive = lambda *args: calls.append("mesh_keepalive")
+
+    # payload with many method names, only first one from each mixin is processed
+    msg = MQTTMessage()
+    msg.topic = "miio/report"
+    msg.payload = (
+        b'{"method":"properties_changed","params":[{"did":"1","siid":2,"piid":1,'
+        b'"value":{"event_occured":1,"_sync.ble_keep_alive":2}}]}'
+    )
+    gw.dispatch_topic(msg)
+    assert calls == ["properties", "ble_keepalive"]
+
+    # error in one handler doesn't stop other handlers
+    def error(msg: MQTTMessage):
+        raise Exception
+
+    calls.clear()
+    gw.topic_listeners["miio/report"].insert(0, (error, None))
+    gw.dispatch_topic(msg)
+    assert calls == ["properties", "ble_keepalive"]
+
+
+def test_command_ack_decode():
+    gw = MultiGateway("127.0.0.1")
+    gw.miot_add_topic_listeners()
+    gw.openmiio_add_topic_listeners()
+
+    calls = []
+    gw.miot_process_properties = lambda *args, **kwargs: calls.append("properties")
+
+    async def main():
+        fut = gw.miio_ack[123] = asyncio.get_running_loop().create_future()
+
+        # command response processed by two handlers, but decoded only once
+        msg = MQTTMessage()
+        msg.topic = "miio/command_ack"
+        msg.payload = b'{"id":123,"result":[{"did":"1","siid":2,"piid":1,"value":1}]}'
+        count = MQTTMessage.json_decodes
+        gw.dispatch_topic(msg)
+        assert MQTTMessage.json_decodes == count + 1
+        assert calls == ["properties"]
+        assert fut.result() is msg.json
+
+    try:
+        asyncio.run(main())
+    finally:
+        gw.miio_ack.pop(123, None)
+
+
+class FakeInventoryShell:
+    """Gateway shell with optional slow file transfer: 50 ms for each command,
+    100 KB/s.
+    """
+
+    xiaomi_did_files = "/data/zigbee_gw/*.json"
+    db_bluetooth_file = "/data/miio/mible_local.db"
+    db = None
+
+    def __init__(self, count: int, slow: bool = False):
+        self.slow = slow
+        self.transfers = 0
+        self.files = {
+            "/data/zigbee/device.info": json.dumps(
+                {
+                    "devInfo": [
+                        {
+                            "did": f"lumi.158d00{i:08x}",
+                            "mac": f"0x158d00{i:08x}",
+                            "shortId": f"0x{i:04x}",
+                            "model": "lumi.sensor_ht",
+                            "appVer": 30,
+                            "hardVer": 1,
+                        }
+                        for i in range(count)
+                    ]
+                }
+            ).encode(),
+            "/data/zigbee/coordinator.info": b'{"mac":"0x00158d0000000001","hostVer":"3.14"}',
+        }
+        self.tables = {
+            "gateway_authed_table": [
+                [i, f"{i:06x}aabbcc", 2038, 0, f"blt.3.{i}"] for i in range(count)
+            ],
+            "mesh_device_v3": [
+                [str(1000 + i), f"AA:BB:CC:00:{i // 256:02X}:{i % 256:02X}", 10441]
+                + [0, 0, 1]
+                for i in range(count)
+            ],
+            "mesh_group_v3": [["1234567890123456789", 1, 10441]],
+        }
+
+    async def transfer(self, size: int):
+        self.transfers += 1
+        if self.slow:
+            await asyncio.sleep(0.05 + size / 100_000)
+
+    async def get_files_stat(self, *patterns: str) -> dict[str, str]:
+        await self.transfer(0)
+        stat = {k: f"{len(v)} 1700000000 md5" for k, v in self.files.items()}
+        stat["/data/zigbee_gw/device.json"] = "100 1700000000 md5"
+        stat[self.db_bluetooth_file] = f"{len(str(self.tables))} 1700000000 md5"
+        return stat
+
+    async def read_file(self, filename: str, **kwargs) -> bytes:
+        await self.transfer(len(self.files[filename]))
+        return self.files[filename]
+
+    async def read_xiaomi_did(self) -> dict[str, str]:
+        await self.transfer(100)
+        return {}
+
+    async def read_db_bluetooth(self):
+        if not self.db:
+            await self.transfer(200_000)
+            self.db = self
+        return self.db
+
+    def read_table(self, name: str, columns: tuple[int, ...]) -> list:
+        return [[row[i] for i in columns] for row in self.tables[name]]
+
+
+async def prepare_inventory(gw: MultiGateway, sh: FakeInventoryShell) -> float:
+    """Same inventory steps as prepare_gateway."""
+    ts = time.perf_counter()
+    gw.inventory_stat = await sh.get_files_stat()
+    sh.db = None
+    await gw.base_read_device(
+        {
+            "did": "123456789",
+            "mac": "AA:BB:CC:DD:EE:FF",
+            "model": "lumi.gateway.mgl03",
+            "version": "1.5.6_0043",
+            "token": "secret",
+        }
+    )
+    await gw.lumi_read_devices(sh)
+    await gw.silabs_read_device(sh)
+    await gw.ble_read_devices(sh)
+    await gw.mesh_read_devices(sh)
+    gw.remove_stale_devices()
+    return time.perf_counter() - ts
+
+
+def test_inventory_cache():
+    async def main():
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        sh = FakeInventoryShell(300)
+        saved = []
+        gw.add_event_listener("inventory", saved.append)
+
+        await prepare_inventory(gw, sh)
+        assert sh.transfers == 5
+        assert len(gw.devices) == 300 * 3 + 2
+        assert saved and set(gw.inventory) == {
+            "gateway",
+            "lumi",
+            "coordinator",
+            "ble",
+            "mesh",
+        }
+        assert "token" not in gw.inventory["gateway"]["data"]
+
+        # restore inventory from Hass storage after restart
+        gw.inventory = json.loads(json.dumps(gw.inventory))
+        gw.devices.clear()
+        sh.transfers = 0
+
+        await prepare_inventory(gw, sh)
+        assert sh.transfers == 1  # only files stat
+        assert len(gw.devices) == 300 * 3 + 2
+        assert gw.ieee == "00158D0000000001"
+        childs = [str(1000 + i) for i in range(300)]
+        assert gw.devices["group.1234567890123456789"].extra["childs"] == childs
+
+        # changed file read again
+        sh.files["/data/zigbee/coordinator.info"] += b" "
+        sh.transfers = 0
+        await prepare_inventory(gw, sh)
+        assert sh.transfers == 2
+
+    asyncio.run(main())
+
+
+def test_warm_start():
+    async def main():
+        sh = FakeInventoryShell(300)
+        added = []
+
+        def on_add_device(device: XDevice):
+            added.append(device)
+
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        gw.add_event_listener("add_device", on_add_device)
+
+        await prepare_inventory(gw, sh)
+        inventory = json.loads(json.dumps(gw.inventory))
+
+        # Hass restart, BLE device removed while Hass was stopped
+        sh.tables["gateway_authed_table"].pop(0)
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        gw.inventory = inventory
+        gw.add_event_listener("add_device", on_add_device)
+        added.clear()
+
+        await gw.warm_start()
+        assert len(added) == 300 * 3 + 2
+        assert len(gw.warm_dids) == 300 * 3 + 2
+
+        # gateway read confirms all devices, except removed one
+        await prepare_inventory(gw, sh)
+        assert len(added) == 300 * 3 + 2
+        assert not gw.warm_dids
+        assert gw not in gw.devices["blt.3.0"].gateways
+        assert gw in gw.devices["blt.3.1"].gateways
+
+        # failed mesh read doesn't remove mesh devices from inventory cache
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        gw.inventory = inventory
+        await gw.warm_start()
+        sh.tables.pop("mesh_device_v3")
+        await prepare_inventory(gw, sh)
+        assert gw in gw.devices["1000"].gateways
+        assert gw in gw.devices["group.1234567890123456789"].gateways
+
+    asyncio.run(main())
+
+
+def test_warm_start_stale_entities(tmp_path):
+    async def main():
+        hass = HomeAssistant(str(tmp_path))
+        await device_registry.async_load(hass)
+        await entity_registry.async_load(hass)
+        hass.config_entries = ConfigEntries(hass, {})
+        entry = ConfigEntry(
+            version=4,
+            minor_version=1,
+            domain=DOMAIN,
+            title="Gateway",
+            data={},
+            source="user",
+            options={"host": "192.168.1.100"},
+        )
+        hass.config_entries._entries[entry.entry_id] = entry
+
+        sh = FakeInventoryShell(3)
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        await prepare_inventory(gw, sh)
+        inventory = json.loads(json.dumps(gw.inventory))
+
+        # entities of BLE devices from previous Hass run
+        dr = device_registry.async_get(hass)
+        er = entity_registry.async_get(hass)
+        for did in ("blt.3.0", "blt.3.1"):
+            uid = gw.devices[did].uid
+            device_entry = dr.async_get_or_create(
+                config_entry_id=entry.entry_id, identifiers={(DOMAIN, uid)}
+            )
+            er.async_get_or_create(
+                "sensor",
+                DOMAIN,
+                f"{uid}_rssi",
+                config_entry=entry,
+                device_id=device_entry.id,
+            )
+
+        # Hass restart, BLE device removed while Hass was stopped
+        sh.tables["gateway_authed_table"].pop(0)
+        gw = MultiGateway("192.168.1.100")
+        gw.devices = {}
+        await hass_utils.store_inventory(hass, gw)
+        gw.inventory = inventory
+        await gw.warm_start()
+        await prepare_inventory(gw, sh)
+        await hass.async_block_till_done()
+
+        uid = gw.devices["blt.3.0"].uid
+        assert dr.async_get_device({(DOMAIN, uid)}) is None
+        assert er.async_get_entity_id("sensor", DOMAIN, f"{uid}_rssi") is None
+        uid = gw.devices["blt.3.1"].uid
+        assert er.async_get_entity_id("sensor", DOMAIN, f"{uid}_rssi")
+
+        await hass.async_stop(force=True)
+
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+import asyncio
+import os
+import random
+import subprocess
+import time
+import zlib
+
+import pytest
+
+from custom_components.xiaomi_gateway3.core.gateway import MultiGateway
+from custom_components.xiaomi_gateway3.core.shell.session import SessionPool
+
+
+class FakeTelnet:
+    """Local telnet server with Multimode Gateway login. Each command runs with
+    local shell in working dir, so files commands work like on real gateway.
+    """
+
+    def __init__(
+        self,
+        cwd: str = None,
+        latency: float = 0,
+        bandwidth: float = 0,
+        no_gzip: bool = False,
+        broken_gzip: bool = False,
+    ):
+        self.cwd = cwd
+        self.latency = latency  # seconds for each command
+        self.bandwidth = bandwidth  # output bytes per second
+        self.no_gzip = no_gzip
+        self.broken_gzip = broken_gzip  # gzip output not in gzip format
+        self.logins = 0
+        self.commands: list[str] = []
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            writer.write(b"rlxlinux login: ")
+            await reader.readline()
+            writer.write(b"\r\n# ")
+            self.logins += 1
+
+            while line := await reader.readline():
+                cmd = line.decode().rstrip("\n")
+                self.commands.append(cmd)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if cmd != "stty -echo":
+                    if self.no_gzip:
+                        cmd = cmd.replace("gzip", "nogzip")  # command not found
+                    elif self.broken_gzip:
+                        cmd = cmd.replace("gzip -c", "cat")
+                    proc = await asyncio.create_subprocess_shell(
+                        cmd,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL,
+                        cwd=self.cwd,
+                    )
+                    raw = await proc.stdout.read()
+                    await proc.wait()
+                    # terminal on real gateway sends CRLF line endings
+                    raw = raw.replace(b"\n", b"\r\n")
+                    if self.bandwidth:
+                        await asyncio.sleep(len(raw) / self.bandwidth)
+                    writer.write(raw)
+                writer.write(b"# ")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def test_session_pool():
+    async def main():
+        server = FakeTelnet()
+        port = await server.start()
+
+        pool = SessionPool("127.0.0.1", port, idle_timeout=0.1)
+        for _ in range(3):
+            async with pool as sh:
+                assert await sh.exec("echo 123") == "123\r\n"
+        assert server.logins == 1
+        assert pool.as_dict() == {"connected": True, "hits": 2, "misses": 1}
+
+        # serialized commands from many callers
+        async def borrow(i: int) -> str:
+            async with pool as sh:
+                return await sh.exec(f"sleep 0.01; echo {i}")
+
+        results = await asyncio.gather(*[borrow(i) for i in range(5)])
+        assert results == [f"{i}\r\n" for i in range(5)]
+        assert server.logins == 1
+
+        # session closed after error inside borrow
+        try:
+            async with pool as sh:
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert pool.session is None
+
+        async with pool as sh:
+            await sh.exec("true")
+        assert server.logins == 2
+
+        # session closed after idle timeout
+        await asyncio.sleep(0.2)
+        assert pool.session is None
+
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def test_session_pool_stop():
+    async def main():
+        server = FakeTelnet()
+        port = await server.start()
+
+        gw = MultiGateway("127.0.0.1")
+        pool = SessionPool.pools[gw.host] = SessionPool(gw.host, port)
+        async with pool as sh:
+            await sh.exec("true")
+        assert pool.idle_handle
+
+        # gateway stop closes its session pool
+        gw.main_task = asyncio.create_task(asyncio.sleep(10))
+        await gw.stop()
+        assert gw.host not in SessionPool.pools
+        assert pool.session is None and pool.idle_handle is None
+
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def sample_file(size: int) -> bytes:
+    # like SQLite file: many similar records and some random data
+    rnd = random.Random(size)
+    data = bytearray()
+    while len(data) < size:
+        data += b"\x00" * rnd.randint(0, 64)
+        data += (
+            f'{{"did":"blt.3.{rnd.randint(0, 9999)}","value":{rnd.random()}}}'.encode()
+        )
+        data += rnd.randbytes(rnd.randint(0, 16))
+    return bytes(data[:size])
+
+
+def test_file_transfer(tmp_path):
+    async def main():
+        data = sample_file(100_000)
+        filename = str(tmp_path / "file.bin")
+
+        for no_gzip in (False, True):
+            server = FakeTelnet(no_gzip=no_gzip)
+            pool = SessionPool("127.0.0.1", await server.start())
+            async with pool as sh:
+                await sh.write_file(filename, data)
+                assert sh.gzip_ok is not no_gzip
+                assert await sh.read_file(filename, as_base64=True) == data
+
+                # missing file doesn't disable gzip
+                assert not await sh.read_file(filename + "2")
+                assert sh.gzip_ok is not no_gzip
+            await pool.close()
+            await server.stop()
+
+            with open(filename, "rb") as f:
+                assert f.read() == data
+            os.remove(filename)
+
+    asyncio.run(main())
+
+
+def test_read_file_no_gzip(tmp_path):
+    async def main():
+        (tmp_path / "file.bin").write_bytes(b"data")
+
+        server = FakeTelnet(str(tmp_path), no_gzip=True)
+        pool = SessionPool("127.0.0.1", await server.start())
+        async with pool as sh:
+            # first read detects gateway without gzip and uses cat
+            assert await sh.read_file("file.bin") == b"data"
+            assert sh.gzip_ok is False
+
+            server.commands.clear()
+            assert await sh.read_file("file.bin") == b"data"
+            assert server.commands == ["cat file.bin"]
+
+        await pool.close()
+        await server.stop()
+
+        # broken gzip output closes session, so pool will login again
+        server = FakeTelnet(str(tmp_path), broken_gzip=True)
+        pool = SessionPool("127.0.0.1", await server.start())
+        with pytest.raises(zlib.error):
+            async with pool as sh:
+                await sh.read_file("file.bin")
+        assert sh.gzip_ok is False
+        assert pool.session is None
+
+        await pool.close()
+        await server.stop()
+
+    asyncio.run(main())
+
+
+@pytest.mark.benchmark
+def test_file_transfer_benchmark(tmp_path):
+    async def main():
+        data = sample_file(256_000)
+        filename = str(tmp_path / "file.bin")
+
+        # slow gateway: 5 ms for each command and 1 MB/s output
+        server = FakeTelnet(latency=0.005, bandwidth=1_000_000)
+        pool = SessionPool("127.0.0.1", await server.start())
+
+        async with pool as sh:
+            for gzip_ok in (False, None):
+                sh.gzip_ok = gzip_ok
+
+                ts = time.monotonic()
+                await sh.write_file(filename, data)
+                t1 = time.monotonic() - ts
+
+                ts = time.monotonic()
+                assert await sh.read_file(filename, as_base64=True) == data
+                t2 = time.monotonic() - ts
+
+                name = "gzip" if gzip_ok is None else "plain"
+                print(
+                    f"Transfer {name}: write {len(data) / t1 / 1024:.0f} KB/s,"
+                    f" read {len(data) / t2 / 1024:.0f} KB/s"
+                )
+
+        await pool.close()
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def test_prefetch_files(tmp_path):
+    async def main():
+        # like files read on gateway start: small configs, devices list and DB
+        files = {
+            "device.conf": b"did=123456789\nmodel=lumi.gateway.mgl03\n",
+            "device.token": b"\x01" * 16,
+            "rootfs_fw_info": b"version=1.5.6_0043\n",
+            "device.info": sample_file(20_000),
+            "mible_local.db": sample_file(100_000),
+        }
+        for name, data in files.items():
+            (tmp_path / name).write_bytes(data)
+
+        # slow gateway: 50 ms for each command and 1 MB/s output
+        server = FakeTelnet(str(tmp_path), latency=0.05, bandwidth=1_000_000)
+        pool = SessionPool("127.0.0.1", await server.start())
+
+        async with pool as sh:
+            ts = time.monotonic()
+            for name, data in files.items():
+                assert await sh.read_file(name) == data
+            t1 = time.monotonic() - ts
+
+            ts = time.monotonic()
+            server.commands.clear()
+            await sh.prefetch_files(*files, "missing.file")
+            assert sh.prefetched == files
+            for name, data in files.items():
+                assert await sh.read_file(name) == data
+            t2 = time.monotonic() - ts
+
+            # all files read with one command
+            assert len(server.commands) == 1
+            assert server.commands[0].startswith("for f in device.conf ")
+
+            # prefetched file used only once
+            assert not sh.prefetched
+
+        await pool.close()
+        await server.stop()
+
+        assert t2 < t1
+        print(f"Read {len(files)} files: one by one {t1:.2f}s, prefetch {t2:.2f}s")
+
+    asyncio.run(main())
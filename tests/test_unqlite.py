@@ -0,0 +1,248 @@
+import sqlite3
+import time
+
+import pytest
+
+from custom_components.xiaomi_gateway3.core.unqlite import SQLite, Unqlite, lhash
+
+
+def unqlite_db(
+    items: list[tuple[bytes, bytes]],
+    max_split_bucket: int = 4,
+    split_bucket: int = 0,
+    page_size: int = 512,
+    corrupted: dict[bytes, bytes] = None,
+) -> bytes:
+    """Build Unqlite file with linear hash. Bucket pages overflow to slave pages.
+    Values bigger than page stored with overflow pages. Corrupted keys saved
+    with hash of original key, like on real gateways.
+    """
+    pages: list[bytearray] = [bytearray(page_size), bytearray(page_size)]
+
+    def new_page() -> int:
+        pages.append(bytearray(page_size))
+        return len(pages) - 1
+
+    buckets: dict[int, int] = {}  # logical bucket to first page
+    tails: dict[int, tuple[int, int]] = {}  # logical bucket to last page and pos
+
+    for key, value in items:
+        key_hash = lhash(key)
+        if corrupted and key in corrupted:
+            key = corrupted[key]
+
+        bucket = key_hash & (max_split_bucket - 1)
+        if bucket < split_bucket:
+            bucket = key_hash & (max_split_bucket * 2 - 1)
+
+        overflow_page = 0
+        if 26 + len(key) + len(value) > page_size - 12:
+            overflow_page = new_page()
+            data_page = new_page()
+            link = data_page.to_bytes(8, "big") + b"\0\x08"
+            pages[overflow_page][8:18] = link
+            pages[overflow_page][18 : 18 + len(key)] = key
+            # value on chain of pages
+            for i in range(0, len(value), page_size - 8):
+                if i:
+                    next_page = new_page()
+                    pages[data_page][:8] = next_page.to_bytes(8, "big")
+                    data_page = next_page
+                chunk = value[i : i + page_size - 8]
+                pages[data_page][8 : 8 + len(chunk)] = chunk
+            payload = b""
+        else:
+            payload = key + value
+
+        if bucket not in buckets:
+            buckets[bucket] = page_num = new_page()
+            tails[bucket] = (page_num, 12)
+        page_num, pos = tails[bucket]
+        if pos + 26 + len(payload) > page_size:
+            # link new slave page
+            slave = new_page()
+            pages[page_num][4:12] = slave.to_bytes(8, "big")
+            page_num, pos = slave, 12
+
+        page = pages[page_num]
+        # link previous cell on page to this cell
+        prev = int.from_bytes(page[0:2], "big")
+        if prev:
+            while nxt := int.from_bytes(page[prev + 16 : prev + 18], "big"):
+                prev = nxt
+            page[prev + 16 : prev + 18] = pos.to_bytes(2, "big")
+        else:
+            page[0:2] = pos.to_bytes(2, "big")
+
+        page[pos : pos + 26] = (
+            key_hash.to_bytes(4, "big")
+            + len(key).to_bytes(4, "big")
+            + len(value).to_bytes(8, "big")
+            + b"\0\0"
+            + overflow_page.to_bytes(8, "big")
+        )
+        page[pos + 26 : pos + 26 + len(payload)] = payload
+        tails[bucket] = (page_num, pos + 26 + len(payload))
+
+    pages[0][:29] = (
+        b"unqlite\xdb\x7c\x27\x12"
+        + bytes(8)  # creation time and sector size
+        + page_size.to_bytes(4, "big")
+        + b"\x00\x04hash"
+    )
+    header = (
+        b"\xfa\x78\x2d\xcb"
+        + lhash(b"chm@symisc").to_bytes(4, "big")
+        + bytes(8)  # free pages list
+        + split_bucket.to_bytes(8, "big")
+        + max_split_bucket.to_bytes(8, "big")
+        + bytes(8)  # next map page
+        + len(buckets).to_bytes(4, "big")
+    )
+    for logic_page, real_page in buckets.items():
+        header += logic_page.to_bytes(8, "big") + real_page.to_bytes(8, "big")
+    pages[1][: len(header)] = header
+
+    return b"".join(pages)
+
+
+def test_unqlite():
+    items = [
+        (f"lumi.158d000{i:07x}.prop".encode(), f'{{"temperature":{i}}}'.encode())
+        for i in range(200)
+    ]
+    items.append((b"dev_list", b'["lumi.158d0000000001"]'))
+    items.append((b"lumi.158d0000000001.model", b"x" * 2000))
+    corrupted = {b"lumi.158d0000000004.prop": b"lumi.158d0004\xb4f9abb.prop"}
+
+    for split_bucket in (0, 2):
+        db = Unqlite(unqlite_db(items, 4, split_bucket, corrupted=corrupted))
+        assert db.buckets
+
+        data = db.read_all()
+        assert len(data) == len(items)
+        assert data["dev_list"] == '["lumi.158d0000000001"]'
+        assert data["lumi.158d0000000001.model"] == "x" * 2000
+        assert data["lumi.158d0004\ufffdf9abb.prop"] == '{"temperature":4}'
+        assert list(db.keys()) == list(data.keys())
+
+        assert db.get("dev_list") == '["lumi.158d0000000001"]'
+        assert db.get("lumi.158d0000000001.model") == "x" * 2000
+        assert db.get("lumi.158d0000000005.prop") == '{"temperature":5}'
+        # corrupted key can't be found
+        assert db.get("lumi.158d0000000004.prop") is None
+        assert db.get("unknown") is None
+
+        assert dict(db.items("lumi.158d0000000001")) == {
+            "lumi.158d0000000001.prop": '{"temperature":1}',
+            "lumi.158d0000000001.model": "x" * 2000,
+        }
+
+    # unknown hash function, fallback to scan all pages
+    raw = bytearray(unqlite_db(items, corrupted=corrupted))
+    raw[512 + 4 : 512 + 8] = b"\0\0\0\0"
+    db = Unqlite(bytes(raw))
+    assert db.buckets is None
+    assert db.get("lumi.158d0000000005.prop") == '{"temperature":5}'
+    assert db.get("lumi.158d0000000004.prop") is None
+    assert len(db.read_all()) == len(items)
+
+
+def test_sqlite(tmp_path):
+    filename = str(tmp_path / "mible_local.db")
+    con = sqlite3.connect(filename)
+    con.execute(
+        "CREATE TABLE gateway_authed_table (_id INTEGER PRIMARY KEY, mac TEXT,"
+        " product_id INTEGER, reserved INTEGER, did TEXT, beaconkey BLOB)"
+    )
+    rows = [
+        (None, "aabbccddeeff", 2038, 0, "blt.3.1", b"\x01\x02"),
+        # negative and big integers, float, NULL, zero and one
+        (None, "112233445566", -1, -70000, None, 1.5),
+        (None, "000000000000", 2**40, 1, "blt.3.2", -2.25),
+        # overflow pages for text and blob
+        (None, "x" * 10_000, 0, 2**63 - 1, "blt.3.3", bytes(range(256)) * 100),
+    ]
+    # many rows for interior B-tree pages
+    rows += [(None, f"{i:012x}", i, i % 2, f"blt.3.{i}", None) for i in range(2000)]
+    con.executemany("INSERT INTO gateway_authed_table VALUES (?,?,?,?,?,?)", rows)
+    con.commit()
+    # old rows don't have new column
+    con.execute("ALTER TABLE gateway_authed_table ADD COLUMN token TEXT")
+    con.execute("INSERT INTO gateway_authed_table (mac, token) VALUES ('mac', 'tok')")
+    con.commit()
+
+    with open(filename, "rb") as f:
+        db = SQLite(f.read())
+
+    sql = "SELECT * FROM gateway_authed_table ORDER BY _id"
+    assert db.read_table("gateway_authed_table", range(7)) == [
+        list(i) for i in con.execute(sql)
+    ]
+
+    # columns projection in custom order
+    sql = "SELECT did, mac, product_id FROM gateway_authed_table ORDER BY _id"
+    assert db.read_table("gateway_authed_table", (4, 1, 2)) == [
+        list(i) for i in con.execute(sql)
+    ]
+
+    # rows decoded only on iteration
+    rows = db.iter_table("gateway_authed_table", [1])
+    assert next(rows) == ["aabbccddeeff"]
+
+    con.close()
+
+
+def test_sqlite_rowid(tmp_path):
+    filename = str(tmp_path / "mible_local.db")
+    con = sqlite3.connect(filename)
+    # first column is not rowid alias
+    con.execute(
+        "CREATE TABLE mesh_device_v3 (did TEXT, mac TEXT, pid INTEGER, token TEXT)"
+    )
+    con.execute("INSERT INTO mesh_device_v3 VALUES (NULL, 'AA:BB', 10441, NULL)")
+    con.execute("INSERT INTO mesh_device_v3 VALUES ('123', NULL, NULL, 'tok')")
+    # rowid alias in table constraint and not first
+    con.execute(
+        "CREATE TABLE mesh_group_v3 (name TEXT, size DECIMAL(10, 2), gid INTEGER,"
+        " PRIMARY KEY (gid))"
+    )
+    con.execute("INSERT INTO mesh_group_v3 VALUES (NULL, NULL, 5)")
+    con.commit()
+
+    with open(filename, "rb") as f:
+        db = SQLite(f.read())
+
+    assert db.read_table("mesh_device_v3") == [
+        [None, "AA:BB", 10441, None],
+        ["123", None, None, "tok"],
+    ]
+    assert db.read_table("mesh_group_v3") == [[None, None, 5]]
+
+    con.close()
+
+
+@pytest.mark.benchmark
+def test_unqlite_benchmark():
+    # long-lived gateway with many stale device props
+    items = [
+        (f"lumi.158d000{i:07x}.prop".encode(), b'{"temperature":2150}' * 5)
+        for i in range(20_000)
+    ]
+    items.append((b"dev_list", b'["lumi.158d0000000001"]'))
+    db = Unqlite(unqlite_db(items, 128, 50, 4096))
+
+    def bench(func) -> float:
+        ts = time.perf_counter()
+        for _ in range(10):
+            func()
+        return (time.perf_counter() - ts) / 10 * 1000
+
+    t1 = bench(lambda: Unqlite(db.raw).read_all()["dev_list"])
+    t2 = bench(lambda: Unqlite(db.raw).get("dev_list"))
+    t3 = bench(lambda: list(Unqlite(db.raw).keys()))
+    assert t2 < t1
+    print(
+        f"Unqlite {len(db.raw) // 1000}KB: read_all {t1:.1f}ms, get {t2:.2f}ms,"
+        f" keys {t3:.1f}ms"
+    )